@@ -1,4 +1,6 @@
+import asyncio
 import os
+import uuid
 from dotenv import load_dotenv
 import gradio as gr
 
@@ -6,55 +8,108 @@ import gradio as gr
 # Suporta execução tanto via "python techadvisor/agente_gui.py" (import local)
 # quanto via "python -m techadvisor.agente_gui" (import por pacote)
 try:
-    from techadvisor_agent import app
+    from techadvisor_agent import aapagar_sessao, aestado_da_sessao, aexecutar_turno
+    from sessao import ASSISTENTE, USUARIO
 except ImportError:
-    from techadvisor.techadvisor_agent import app
+    from techadvisor.techadvisor_agent import aapagar_sessao, aestado_da_sessao, aexecutar_turno
+    from techadvisor.sessao import ASSISTENTE, USUARIO
 
 
 load_dotenv()
 
 
-def init_chat():
-    state = {}
-    result = app.invoke(state)
-    state.update(result)
-    history = []
-    history.append([None, state.get("resposta", "Olá! Eu sou o TechAdvisor. Como posso te chamar?")])
-    return history, state
+SAUDACAO = "Olá! Eu sou o TechAdvisor. Como posso te chamar?"
+
+
+# Turno em andamento de cada sessão: uma mensagem nova cancela o anterior
+_em_andamento: dict = {}
+
+
+async def turno_exclusivo(thread_id: str, text: str = None) -> dict:
+    """Roda o turno da sessão cancelando o que ainda estiver em andamento nela.
+
+    Raises:
+        asyncio.CancelledError: se este turno for substituído por uma mensagem mais nova.
+    """
+    anterior = _em_andamento.get(thread_id)
+    if anterior is not None and not anterior.done():
+        anterior.cancel()
+    tarefa = asyncio.ensure_future(aexecutar_turno(thread_id, text))
+    _em_andamento[thread_id] = tarefa
+    try:
+        return await tarefa
+    finally:
+        if _em_andamento.get(thread_id) is tarefa:
+            del _em_andamento[thread_id]
+
 
+async def nova_conversa(thread_id: str):
+    anterior = _em_andamento.pop(thread_id, None)
+    if anterior is not None:
+        anterior.cancel()
+    await aapagar_sessao(thread_id)
+    state = await aexecutar_turno(thread_id)
+    return [[None, state.get("resposta", SAUDACAO)]]
 
-def chat_turn(user_message: str, history: list, state: dict):
-    state = state or {}
+
+def historico_do_chat(state: dict) -> list:
+    """Reconstrói as mensagens do Chatbot a partir da sessão salva."""
+    history = []
+    if state.get("resumo"):
+        history.append([None, f"📝 Resumo da conversa até aqui: {state['resumo']}"])
+    for papel, texto in state.get("historico") or []:
+        if papel == USUARIO:
+            history.append([texto, None])
+        elif papel == ASSISTENTE and history and history[-1][1] is None and history[-1][0] is not None:
+            history[-1][1] = texto
+        else:
+            history.append([None, texto])
+    return history or [[None, state.get("resposta", SAUDACAO)]]
+
+
+async def init_chat(thread_id: str):
+    # O navegador guarda só o id da sessão; o estado fica no checkpointer
+    thread_id = thread_id or uuid.uuid4().hex
+    state = await aestado_da_sessao(thread_id)
+    if state.get("etapa") in (None, "fim"):
+        return await nova_conversa(thread_id), thread_id
+    return historico_do_chat(state), thread_id
+
+
+async def chat_turn(user_message: str, history: list, thread_id: str):
+    # Handler assíncrono: enquanto o Gemini responde, o servidor atende as outras sessões
+    thread_id = thread_id or uuid.uuid4().hex
     text = (user_message or "").strip()
 
     if text.lower() in ["/reset", "sair", "exit", "quit"]:
         # Reinicia a conversa e envia nova saudação
-        state = {}
-        result = app.invoke(state)
-        state.update(result)
-        history = []
-        history.append([None, state.get("resposta", "Olá! Eu sou o TechAdvisor. Como posso te chamar?")])
-        return history, state
+        return await nova_conversa(thread_id), thread_id
 
-    state["mensagem_usuario"] = text
-    result = app.invoke(state)
-    state.update(result)
+    try:
+        state = await turno_exclusivo(thread_id, text)
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise  # o próprio evento foi cancelado (ex.: aba fechada)
+        # Substituída por uma mensagem mais nova: a resposta dela atualiza o chat
+        return history + [[user_message, "⏹️ Cancelada: você enviou outra mensagem."]], thread_id
 
     reply = state.get("resposta", "Desculpe, não consegui responder agora.")
     history = history + [[user_message, reply]]
-    return history, state
+    return history, thread_id
 
 
 with gr.Blocks(title="TechAdvisor - Chat") as demo:
     gr.Markdown("## 🤖 TechAdvisor – Chat sobre tecnologia")
     chatbot = gr.Chatbot(height=420)
-    state = gr.State({})
+    # Id da sessão no navegador (localStorage): a conversa continua após recarregar a página
+    # ou reiniciar o servidor. Versões antigas do Gradio não têm BrowserState: o id vale por aba.
+    sessao = gr.BrowserState("") if hasattr(gr, "BrowserState") else gr.State("")
     msg = gr.Textbox(label="Mensagem", placeholder="Diga 'tchau' para encerrar ou '/reset' para recomeçar")
     send = gr.Button("Enviar")
 
-    demo.load(fn=init_chat, outputs=[chatbot, state])
-    send.click(fn=chat_turn, inputs=[msg, chatbot, state], outputs=[chatbot, state])
-    msg.submit(fn=chat_turn, inputs=[msg, chatbot, state], outputs=[chatbot, state])
+    demo.load(fn=init_chat, inputs=[sessao], outputs=[chatbot, sessao])
+    send.click(fn=chat_turn, inputs=[msg, chatbot, sessao], outputs=[chatbot, sessao])
+    msg.submit(fn=chat_turn, inputs=[msg, chatbot, sessao], outputs=[chatbot, sessao])
 
     def _clear_input():
         return ""
@@ -63,8 +118,15 @@ with gr.Blocks(title="TechAdvisor - Chat") as demo:
     msg.submit(fn=_clear_input, outputs=msg)
 
 
+# Fila explícita: até TECHADVISOR_CONCORRENCIA turnos simultâneos (handlers
+# assíncronos, sem uma thread por conversa) e no máximo TECHADVISOR_FILA_MAX
+# pedidos esperando; acima disso o Gradio recusa com "fila cheia".
+demo.queue(
+    default_concurrency_limit=int(os.getenv("TECHADVISOR_CONCORRENCIA", "32")),
+    max_size=int(os.getenv("TECHADVISOR_FILA_MAX", "200")),
+)
+
+
 if __name__ == "__main__":
     # servidor local padrão; para compartilhar publicamente, use share=True
     demo.launch()
-
-
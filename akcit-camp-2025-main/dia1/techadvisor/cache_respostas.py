@@ -0,0 +1,189 @@
+# ============================================================
+# TechAdvisor – Cache de respostas para perguntas frequentes
+# ============================================================
+# Boa parte das perguntas se repete ("qual linguagem aprender?", "o que é
+# Docker?") e cada uma custava uma chamada inteira ao Gemini. Este cache fica
+# na frente da `qa_chain`:
+# - busca exata pela pergunta normalizada (minúsculas, sem acentos nem
+#   pontuação): "O que é Docker?" e "o que e docker" são a mesma chave;
+# - busca semântica opcional: a pergunta vira um embedding (modelo local,
+#   `sentence-transformers`) comparado por similaridade de cosseno com as
+#   perguntas já respondidas (força bruta com NumPy); acima do limiar, a
+#   resposta é reaproveitada ("como aprender docker" ~ "o que é Docker").
+#
+# Só entram no cache respostas geradas sem contexto de conversa (sem
+# histórico nem resumo): elas não dependem de quem perguntou e valem para
+# qualquer sessão; por isso a busca também só é feita em perguntas sem
+# contexto. O nome do usuário é guardado como um marcador (`NOME`) e trocado
+# pelo de quem pergunta ao servir a resposta.
+#
+# O cache fica na memória do processo (LRU com validade).
+#
+# Variáveis de ambiente:
+#   TECHADVISOR_CACHE=1                   0 desliga o cache
+#   TECHADVISOR_CACHE_MAX=1000            perguntas guardadas (as menos usadas saem primeiro)
+#   TECHADVISOR_CACHE_TTL_MIN=1440        validade de cada resposta (minutos)
+#   TECHADVISOR_CACHE_SEMANTICO=0         1 liga a busca por similaridade (requer sentence-transformers)
+#   TECHADVISOR_CACHE_LIMIAR=0.9          similaridade mínima (cosseno) para reaproveitar
+#   TECHADVISOR_EMBEDDINGS_MODELO=sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Marcador do nome do usuário nas respostas guardadas: caracteres de uso
+# privado do Unicode, que não aparecem em texto normal (ao contrário de
+# `{nome}`, comum em exemplos de código com f-strings)
+NOME = "\ue000nome\ue001"
+
+_lock = threading.Lock()
+# pergunta normalizada -> (expira_em, resposta com o marcador `NOME`), da menos para a mais usada
+_respostas: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+# pergunta normalizada -> embedding (só com a busca semântica ligada)
+_vetores: dict = {}
+# (chaves, matriz de embeddings), refeito quando o cache muda
+_indice = None
+_semantico_indisponivel = False
+
+
+def ativo() -> bool:
+    return os.getenv("TECHADVISOR_CACHE", "1") != "0"
+
+
+def semantico() -> bool:
+    return os.getenv("TECHADVISOR_CACHE_SEMANTICO", "0") == "1" and not _semantico_indisponivel
+
+
+def normalizar(pergunta: str) -> str:
+    """Chave da pergunta: minúsculas, sem acentos e só com as palavras."""
+    texto = unicodedata.normalize("NFKD", (pergunta or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", texto))
+
+
+# ============================================================
+# 1. Embeddings (opcional)
+# ============================================================
+@lru_cache(maxsize=1)
+def _modelo():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(
+        os.getenv("TECHADVISOR_EMBEDDINGS_MODELO", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    )
+
+
+@lru_cache(maxsize=256)
+def _embedding(chave: str):
+    """Embedding normalizado (norma 1) da pergunta; None se não houver modelo."""
+    global _semantico_indisponivel
+    try:
+        return _modelo().encode(chave, normalize_embeddings=True)
+    except Exception as exc:
+        # Cache opcional: sem o pacote, sem rede para baixar o modelo ou com um
+        # modelo inválido, segue só com a busca exata em vez de quebrar o turno
+        _semantico_indisponivel = True
+        logging.warning(f"Busca semântica indisponível ({exc}); usando só a busca exata.")
+        return None
+
+
+def _mais_parecida(vetor) -> Optional[str]:
+    """Chave da pergunta mais parecida acima do limiar (chamar com `_lock`)."""
+    global _indice
+    import numpy as np
+
+    if _indice is None:
+        chaves = [c for c in _respostas if c in _vetores]
+        _indice = (chaves, np.stack([_vetores[c] for c in chaves]) if chaves else None)
+    chaves, matriz = _indice
+    if matriz is None:
+        return None
+    similaridades = matriz @ vetor
+    melhor = int(similaridades.argmax())
+    if similaridades[melhor] < float(os.getenv("TECHADVISOR_CACHE_LIMIAR", "0.9")):
+        return None
+    return chaves[melhor]
+
+
+# ============================================================
+# 2. Buscar e guardar
+# ============================================================
+def _ler(chave: str) -> Optional[str]:
+    """Resposta válida da chave, marcando-a como usada (chamar com `_lock`)."""
+    item = _respostas.get(chave)
+    if item is None:
+        return None
+    if item[0] < time.monotonic():
+        _remover(chave)
+        return None
+    _respostas.move_to_end(chave)
+    return item[1]
+
+
+def _remover(chave: str) -> None:
+    global _indice
+    _respostas.pop(chave, None)
+    _vetores.pop(chave, None)
+    _indice = None
+
+
+def buscar(pergunta: str, nome: str) -> Optional[str]:
+    """Resposta já dada a esta pergunta (ou a uma parecida), com o `nome` de quem pergunta."""
+    chave = normalizar(pergunta)
+    if not ativo() or not chave:
+        return None
+    with _lock:
+        resposta = _ler(chave)
+    if resposta is None and semantico():
+        vetor = _embedding(chave)
+        if vetor is not None:
+            with _lock:
+                parecida = _mais_parecida(vetor)
+                resposta = _ler(parecida) if parecida else None
+    return resposta.replace(NOME, nome) if resposta is not None else None
+
+
+def guardar(pergunta: str, resposta: str, nome: str) -> None:
+    """Guarda a resposta (gerada sem contexto de conversa) trocando o nome pelo marcador `NOME`."""
+    global _indice
+    chave = normalizar(pergunta)
+    if not ativo() or not chave or not resposta:
+        return
+    texto = re.sub(rf"\b{re.escape(nome)}\b", NOME, resposta) if nome else resposta
+    vetor = _embedding(chave) if semantico() else None
+    validade = time.monotonic() + int(os.getenv("TECHADVISOR_CACHE_TTL_MIN", "1440")) * 60
+    with _lock:
+        _respostas[chave] = (validade, texto)
+        _respostas.move_to_end(chave)
+        if vetor is not None:
+            _vetores[chave] = vetor
+        _indice = None
+        maximo = int(os.getenv("TECHADVISOR_CACHE_MAX", "1000"))
+        while len(_respostas) > maximo:
+            _remover(next(iter(_respostas)))
+
+
+def limpar() -> None:
+    with _lock:
+        for chave in list(_respostas):
+            _remover(chave)
+
+
+# O embedding é CPU pesada: no servidor assíncrono ele roda fora do event loop
+async def abuscar(pergunta: str, nome: str) -> Optional[str]:
+    if semantico():
+        return await asyncio.to_thread(buscar, pergunta, nome)
+    return buscar(pergunta, nome)
+
+
+async def aguardar(pergunta: str, resposta: str, nome: str) -> None:
+    if semantico():
+        await asyncio.to_thread(guardar, pergunta, resposta, nome)
+    else:
+        guardar(pergunta, resposta, nome)
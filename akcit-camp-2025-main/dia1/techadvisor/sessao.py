@@ -0,0 +1,239 @@
+# ============================================================
+# TechAdvisor – Sessões de conversa persistentes (checkpointer do LangGraph)
+# ============================================================
+# Antes, o estado de cada conversa era um `dict` solto: na CLI, uma variável;
+# no Gradio, um `gr.State` por aba do navegador. Reiniciar o servidor perdia
+# todas as conversas e o `historico` crescia sem limite.
+#
+# Aqui o estado passa a ser guardado pelo próprio LangGraph, por sessão
+# (`thread_id`), em um checkpointer:
+# - SQLite (padrão, desenvolvimento local): um arquivo `.db`;
+# - Redis (produção): várias instâncias do app compartilham as sessões,
+#   que expiram sozinhas após `TECHADVISOR_SESSAO_TTL_MIN` minutos sem uso;
+# - memória (testes): some ao encerrar o processo.
+# A interface web, assíncrona, usa as versões async dos mesmos backends
+# (`criar_checkpointer_async`), no mesmo arquivo/Redis.
+#
+# Para o uso de memória ser previsível, cada sessão guarda no máximo
+# `TECHADVISOR_HISTORICO_MAX` mensagens e `TECHADVISOR_HISTORICO_TOKENS`
+# tokens (estimados): as mais antigas são condensadas em um resumo
+# (`resumo`) que vai sendo atualizado. O mesmo limite define a janela de
+# histórico enviada ao LLM, então o tamanho do prompt (e a latência) não
+# cresce com a conversa. As mensagens ficam em pares
+# compactos `[papel, texto]` ("u" = usuário, "a" = assistente), e só o
+# checkpoint mais recente de cada sessão é mantido (`podar_sessao`).
+#
+# Variáveis de ambiente:
+#   TECHADVISOR_CHECKPOINTER=sqlite        sqlite | redis | memory
+#   TECHADVISOR_SQLITE_PATH=techadvisor_sessoes.db
+#   REDIS_URL=redis://localhost:6379       usado com TECHADVISOR_CHECKPOINTER=redis
+#   TECHADVISOR_SESSAO_TTL_MIN=10080       validade das sessões no Redis (minutos, 7 dias)
+#   TECHADVISOR_HISTORICO_MAX=12           mensagens mantidas por sessão antes de resumir
+#   TECHADVISOR_HISTORICO_TOKENS=1500      tokens (estimados) de histórico enviados ao LLM
+#   TECHADVISOR_MENSAGEM_MAX_CHARS=4000    tamanho máximo de cada mensagem guardada
+
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+USUARIO, ASSISTENTE = "u", "a"
+
+
+# ============================================================
+# 1. Escolher o checkpointer
+# ============================================================
+def criar_checkpointer():
+    """Cria o checkpointer configurado em `TECHADVISOR_CHECKPOINTER`."""
+    tipo = os.getenv("TECHADVISOR_CHECKPOINTER", "sqlite").lower()
+
+    if tipo == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+
+    if tipo == "redis":
+        # Requer `langgraph-checkpoint-redis` e um Redis com RedisJSON/RediSearch (ex.: Redis Stack)
+        from langgraph.checkpoint.redis import RedisSaver
+        saver = RedisSaver(redis_url=_redis_url(), ttl=_ttl_redis())
+        saver.setup()
+        return saver
+
+    if tipo == "sqlite":
+        from langgraph.checkpoint.sqlite import SqliteSaver
+        # Uma conexão compartilhada pelas threads do servidor (o SqliteSaver serializa o acesso)
+        conn = sqlite3.connect(_sqlite_path(), check_same_thread=False)
+        return SqliteSaver(conn)
+
+    raise _tipo_invalido(tipo)
+
+
+async def criar_checkpointer_async():
+    """Versão assíncrona de `criar_checkpointer` (para `app.ainvoke`); chame dentro do event loop."""
+    tipo = os.getenv("TECHADVISOR_CHECKPOINTER", "sqlite").lower()
+
+    if tipo == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+
+    if tipo == "redis":
+        from langgraph.checkpoint.redis.aio import AsyncRedisSaver
+        saver = AsyncRedisSaver(redis_url=_redis_url(), ttl=_ttl_redis())
+        await saver.asetup()
+        return saver
+
+    if tipo == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        conn = aiosqlite.connect(_sqlite_path())
+        if isinstance(conn, threading.Thread):
+            # A conexão fica aberta até o fim do processo: sem isso, a thread
+            # do aiosqlite impediria o servidor de encerrar (Ctrl+C)
+            conn.daemon = True
+        return AsyncSqliteSaver(conn)
+
+    raise _tipo_invalido(tipo)
+
+
+def _redis_url() -> str:
+    return os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+def _ttl_redis() -> dict:
+    return {"default_ttl": int(os.getenv("TECHADVISOR_SESSAO_TTL_MIN", "10080")), "refresh_on_read": True}
+
+
+def _sqlite_path() -> str:
+    return os.getenv("TECHADVISOR_SQLITE_PATH", "techadvisor_sessoes.db")
+
+
+def _tipo_invalido(tipo: str) -> ValueError:
+    return ValueError(f"TECHADVISOR_CHECKPOINTER '{tipo}' não suportado. Use 'sqlite', 'redis' ou 'memory'.")
+
+
+def config_sessao(thread_id: str) -> dict:
+    """Configuração do `app.invoke` para a sessão `thread_id`."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+# ============================================================
+# 2. Manter só o checkpoint mais recente de cada sessão
+# ============================================================
+# O SqliteSaver não implementa `prune`: apagamos direto nas tabelas dele
+_SQL_PODAR = (
+    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < "
+    "(SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?)",
+    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN "
+    "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?)",
+)
+
+
+def podar_sessao(checkpointer, thread_id: str) -> None:
+    """Apaga os checkpoints antigos da sessão (o LangGraph grava um por passo)."""
+    try:
+        checkpointer.prune([thread_id], strategy="keep_latest")
+        return
+    except NotImplementedError:
+        pass
+
+    conn = getattr(checkpointer, "conn", None)
+    if not isinstance(conn, sqlite3.Connection):
+        return  # memória: a sessão some com o processo
+    with checkpointer.lock, conn:
+        for sql in _SQL_PODAR:
+            conn.execute(sql, (thread_id, thread_id))
+
+
+async def apodar_sessao(checkpointer, thread_id: str) -> None:
+    """Versão assíncrona de `podar_sessao`."""
+    try:
+        await checkpointer.aprune([thread_id], strategy="keep_latest")
+        return
+    except NotImplementedError:
+        pass
+
+    try:
+        import aiosqlite
+    except ImportError:
+        return
+    conn = getattr(checkpointer, "conn", None)
+    if not isinstance(conn, aiosqlite.Connection):
+        return
+    async with checkpointer.lock:
+        for sql in _SQL_PODAR:
+            await conn.execute(sql, (thread_id, thread_id))
+        await conn.commit()
+
+
+def apagar_sessao(checkpointer, thread_id: str) -> None:
+    """Remove a sessão inteira (ex.: comando `/reset`)."""
+    checkpointer.delete_thread(thread_id)
+
+
+# ============================================================
+# 3. Histórico limitado com resumo
+# ============================================================
+def _limite(nome: str, padrao: int) -> int:
+    return int(os.getenv(nome, str(padrao)))
+
+
+def compactar_mensagem(papel: str, texto: str) -> List[str]:
+    """Par compacto `[papel, texto]`, com o texto limitado em tamanho."""
+    return [papel, texto[:_limite("TECHADVISOR_MENSAGEM_MAX_CHARS", 4000)]]
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token), sem chamar a API."""
+    return len(texto) // 4 + 1
+
+
+def _comeca_no_usuario(mensagens: List[List[str]]) -> List[List[str]]:
+    inicio = 0
+    while inicio < len(mensagens) and mensagens[inicio][0] != USUARIO:
+        inicio += 1
+    return mensagens[inicio:]
+
+
+def janela_de_tokens(historico: List[List[str]], orcamento: Optional[int] = None) -> List[List[str]]:
+    """Mensagens mais recentes que cabem em `orcamento` tokens, começando em uma pergunta."""
+    orcamento = orcamento if orcamento is not None else _limite("TECHADVISOR_HISTORICO_TOKENS", 1500)
+    total, inicio = 0, len(historico)
+    while inicio > 0:
+        custo = estimar_tokens(historico[inicio - 1][1])
+        if total + custo > orcamento:
+            break
+        total += custo
+        inicio -= 1
+    return _comeca_no_usuario(historico[inicio:])
+
+
+def para_mensagens(historico: List[List[str]]) -> List[Tuple[str, str]]:
+    """Pares compactos -> mensagens do LangChain (`("human", ...)`, `("ai", ...)`)."""
+    return [("human" if papel == USUARIO else "ai", texto) for papel, texto in historico]
+
+
+def formatar_mensagens(historico: List[List[str]]) -> str:
+    rotulos = {USUARIO: "Usuário", ASSISTENTE: "TechAdvisor"}
+    return "\n".join(f"{rotulos.get(papel, papel)}: {texto}" for papel, texto in historico)
+
+
+def dividir_historico(
+    historico: List[List[str]],
+    max_mensagens: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> Tuple[List[List[str]], List[List[str]]]:
+    """Separa `(antigas, recentes)` quando o histórico passa do limite.
+
+    Ao estourar `max_mensagens` ou `max_tokens`, ficam só as trocas mais
+    recentes que cabem na metade dos limites; as demais (`antigas`) devem
+    ir para o resumo.  Dentro dos limites, `antigas` vem vazia.  Assim o
+    resumo é refeito a cada poucas trocas, e não a cada turno, e tudo o que
+    ficou fora do histórico está no resumo.
+    """
+    max_mensagens = max_mensagens or _limite("TECHADVISOR_HISTORICO_MAX", 12)
+    max_tokens = max_tokens or _limite("TECHADVISOR_HISTORICO_TOKENS", 1500)
+    if len(historico) <= max_mensagens and sum(estimar_tokens(t) for _, t in historico) <= max_tokens:
+        return [], historico
+    recentes = janela_de_tokens(historico, max_tokens // 2)
+    recentes = _comeca_no_usuario(recentes[-max(max_mensagens // 2, 1):])
+    return historico[:len(historico) - len(recentes)], recentes
+
@@ -6,15 +6,38 @@
 # - Ensinar a criar um `PromptTemplate` e compor uma pipeline com LCEL: `prompt | llm | parser`.
 # - Demonstrar a orquestração de um fluxo com múltiplos nós no LangGraph (`StateGraph`).
 # - Rodar de forma interativa no terminal, guiando o usuário por boas‑vindas, coleta de nome e Q&A.
+# - Guardar cada conversa (sessão) em um checkpointer do LangGraph, que sobrevive a reinícios.
+# - Oferecer o mesmo grafo em versão assíncrona (`aexecutar_turno`) para servidores web.
 
+import asyncio
 import os
 import re
+import sys
+from typing import List, TypedDict
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 
+# Suporta execução como script ("python techadvisor/techadvisor_agent.py")
+# e como pacote ("python -m techadvisor.techadvisor_agent")
+try:
+    import cache_respostas
+    from sessao import (
+        ASSISTENTE, USUARIO, apagar_sessao, apodar_sessao, compactar_mensagem, config_sessao, criar_checkpointer,
+        criar_checkpointer_async, dividir_historico, formatar_mensagens, janela_de_tokens, para_mensagens,
+        podar_sessao,
+    )
+except ImportError:
+    from techadvisor import cache_respostas
+    from techadvisor.sessao import (
+        ASSISTENTE, USUARIO, apagar_sessao, apodar_sessao, compactar_mensagem, config_sessao, criar_checkpointer,
+        criar_checkpointer_async, dividir_historico, formatar_mensagens, janela_de_tokens, para_mensagens,
+        podar_sessao,
+    )
+
 # ============================================================
 # 1. Carregar variáveis de ambiente
 # ============================================================
@@ -39,33 +62,59 @@ llm = ChatGoogleGenerativeAI(
 )
 
 # ============================================================
-# 3. Definir o PromptTemplate (para Q&A após conhecer o nome)
+# 3. Definir o prompt de chat (para Q&A após conhecer o nome)
 # ============================================================
-# O PromptTemplate permite parametrizar trechos do prompt, como `{interesse}`.
-# No momento de executar, substituiremos esse placeholder pelo valor fornecido
-# pelo usuário no estado do LangGraph.
+# O ChatPromptTemplate monta a lista de mensagens enviada ao modelo:
+# - system: quem é o agente, o `{nome}` do usuário e o `{contexto}` (resumo
+#   das trocas antigas, quando houver);
+# - MessagesPlaceholder: as trocas recentes da conversa (`historico`), já
+#   limitadas a um orçamento de tokens (ver `sessao.py`);
+# - human: a `{pergunta}` atual.
+# Assim o modelo lembra do que foi conversado, mas o prompt não cresce sem limite.
 template_text = (
     "Você é o TechAdvisor, um especialista amigável em tecnologia e programação.\n"
     "Converse de forma objetiva, em português, com o usuário {nome}.\n"
-    "Pergunta do usuário: {pergunta}\n\n"
+    "{contexto}"
     "Responda de forma curta e útil. Quando adequado, recomende tecnologias, frameworks, "
     "boas práticas ou próximos passos de estudo."
 )
-prompt = PromptTemplate(
-    input_variables=["nome", "pergunta"],
-    template=template_text
-)
+prompt = ChatPromptTemplate.from_messages([
+    ("system", template_text),
+    MessagesPlaceholder("historico"),
+    ("human", "{pergunta}"),
+])
 
 # ============================================================
 # 4. Criar uma pipeline LCEL (Prompt -> Modelo -> Parser) para Q&A
 # ============================================================
 # LCEL (LangChain Expression Language) permite compor etapas como um pipeline.
 # Aqui encadeamos:
-#   1) prompt: recebe `{interesse}` e gera a string final de instrução
+#   1) prompt: recebe `{nome}`, `{contexto}`, `historico` e `{pergunta}` e monta as mensagens
 #   2) llm: chama o modelo de chat do Gemini com esse prompt
 #   3) StrOutputParser(): converte a resposta para uma string simples
 qa_chain = prompt | llm | StrOutputParser()
 
+# Pipeline auxiliar: condensa mensagens antigas no resumo da conversa
+# (chamada só quando o histórico passa do limite, ver `sessao.py`)
+resumo_prompt = PromptTemplate(
+    input_variables=["resumo", "mensagens"],
+    template=(
+        "Resumo atual da conversa (pode estar vazio):\n{resumo}\n\n"
+        "Mensagens a incorporar:\n{mensagens}\n\n"
+        "Atualize o resumo em até 5 frases, em português, mantendo o que importa para as próximas "
+        "respostas: interesses, nível e objetivos do usuário e recomendações já feitas."
+    ),
+)
+resumo_chain = resumo_prompt | llm | StrOutputParser()
+
+
+def resumir(resumo: str, mensagens: str) -> str:
+    return resumo_chain.invoke({"resumo": resumo or "(vazio)", "mensagens": mensagens})
+
+
+async def aresumir(resumo: str, mensagens: str) -> str:
+    return await resumo_chain.ainvoke({"resumo": resumo or "(vazio)", "mensagens": mensagens})
+
 # ============================================================
 # 5. Integrar a pipeline dentro de um fluxo com LangGraph (múltiplos nós)
 # ============================================================
@@ -74,7 +123,17 @@ qa_chain = prompt | llm | StrOutputParser()
 # - mensagem_usuario: última entrada do usuário
 # - nome: nome do usuário, quando capturado
 # - resposta: última resposta do agente (saída para UI/CLI)
-# - historico: lista opcional de trocas (para futura expansão)
+# - historico: últimas trocas em pares compactos [papel, texto] (limitado, ver `sessao.py`)
+# - resumo: resumo das trocas mais antigas, que saíram do histórico
+class EstadoConversa(TypedDict, total=False):
+    etapa: str
+    mensagem_usuario: str
+    nome: str
+    resposta: str
+    historico: List[List[str]]
+    resumo: str
+    encerrar: bool
+
 
 def extrair_nome(texto: str) -> str:
     """Heurística simples: usa a frase inteira como nome, limpando espaços e pontuação leve."""
@@ -114,34 +173,90 @@ def aguardar_nome_node(state: dict) -> dict:
     return state
 
 
-def responder_perguntas_node(state: dict) -> dict:
-    mensagem = (state.get("mensagem_usuario") or "").strip()
-    nome = state.get("nome", "usuário")
-
+def _despedida(state: dict, mensagem: str) -> bool:
     if mensagem.lower() == "tchau" or "tchau" in mensagem.lower():
-        state["resposta"] = f"Até logo, {nome}! 👋"
+        state["resposta"] = f"Até logo, {state.get('nome', 'usuário')}! 👋"
         state["etapa"] = "fim"
         state["encerrar"] = True
-        return state
+        return True
+    return False
 
-    # Gera resposta via LLM
-    resposta = qa_chain.invoke({
-        "nome": nome,
+
+def _entrada_qa(state: dict, mensagem: str) -> dict:
+    # Resumo e janela recente da conversa, dentro do orçamento de tokens
+    resumo = state.get("resumo", "")
+    return {
+        "nome": state.get("nome", "usuário"),
+        "contexto": f"Resumo da conversa até aqui: {resumo}\n" if resumo else "",
+        "historico": para_mensagens(janela_de_tokens(state.get("historico") or [])),
         "pergunta": mensagem or "Me diga algo legal sobre tecnologia."
-    })
+    }
+
+
+def _sem_contexto(entrada: dict) -> bool:
+    # Só respostas que não dependem da conversa podem servir a (ou vir de) outras sessões
+    return not entrada["historico"] and not entrada["contexto"]
 
-    # Atualiza histórico simples
-    historico = state.setdefault("historico", [])
+
+def _novo_historico(state: dict, mensagem: str, resposta: str) -> list:
+    historico = list(state.get("historico") or [])
     if mensagem:
-        historico.append({"role": "user", "content": mensagem})
-    historico.append({"role": "assistant", "content": resposta})
+        historico.append(compactar_mensagem(USUARIO, mensagem))
+    historico.append(compactar_mensagem(ASSISTENTE, resposta))
+    return historico
+
 
+def _concluir_resposta(state: dict, historico: list, resumo: str, resposta: str) -> dict:
+    state["historico"], state["resumo"] = historico, resumo
     state["resposta"] = resposta
     state["etapa"] = "responder_perguntas"
     state["encerrar"] = False
     return state
 
 
+def responder_perguntas_node(state: dict) -> dict:
+    mensagem = (state.get("mensagem_usuario") or "").strip()
+    if _despedida(state, mensagem):
+        return state
+
+    # Perguntas frequentes (sem contexto de conversa) vêm do cache; as demais geram resposta via LLM
+    entrada = _entrada_qa(state, mensagem)
+    sem_contexto = _sem_contexto(entrada)
+    resposta = cache_respostas.buscar(mensagem, entrada["nome"]) if sem_contexto else None
+    if resposta is None:
+        resposta = qa_chain.invoke(entrada)
+        if sem_contexto:
+            cache_respostas.guardar(mensagem, resposta, entrada["nome"])
+
+    # Atualiza o histórico; acima do limite, as trocas antigas viram resumo
+    resumo = state.get("resumo", "")
+    antigas, recentes = dividir_historico(_novo_historico(state, mensagem, resposta))
+    if antigas:
+        resumo = resumir(resumo, formatar_mensagens(antigas))
+    return _concluir_resposta(state, recentes, resumo, resposta)
+
+
+async def aresponder_perguntas_node(state: dict) -> dict:
+    """Mesmo nó, com o cliente assíncrono do Gemini (usado por `app.ainvoke`)."""
+    mensagem = (state.get("mensagem_usuario") or "").strip()
+    if _despedida(state, mensagem):
+        return state
+
+    entrada = _entrada_qa(state, mensagem)
+    sem_contexto = _sem_contexto(entrada)
+    resposta = await cache_respostas.abuscar(mensagem, entrada["nome"]) if sem_contexto else None
+    if resposta is None:
+        resposta = await qa_chain.ainvoke(entrada)
+        if sem_contexto:
+            await cache_respostas.aguardar(mensagem, resposta, entrada["nome"])
+
+    resumo = state.get("resumo", "")
+    antigas, recentes = dividir_historico(_novo_historico(state, mensagem, resposta))
+    if antigas:
+        resumo = await aresumir(resumo, formatar_mensagens(antigas))
+    return _concluir_resposta(state, recentes, resumo, resposta)
+
+
 def roteador_node(state: dict) -> dict:
     # Nó "inócuo" apenas para permitir arestas condicionais
     return state
@@ -161,12 +276,13 @@ def proxima_parada(state: dict) -> str:
 
 
 # Criar o grafo do agente com múltiplos nós
-graph = StateGraph(dict)
+graph = StateGraph(EstadoConversa)
 
 graph.add_node("roteador", roteador_node)
 graph.add_node("boas_vindas", boas_vindas_node)
 graph.add_node("aguardar_nome", aguardar_nome_node)
-graph.add_node("responder_perguntas", responder_perguntas_node)
+# Nó com as duas versões: `invoke` usa a síncrona, `ainvoke` a assíncrona
+graph.add_node("responder_perguntas", RunnableLambda(responder_perguntas_node, afunc=aresponder_perguntas_node))
 
 # Configura o roteamento dinâmico entre os nós do grafo
 # - O nó "roteador" consulta a função proxima_parada() para decidir o próximo destino
@@ -194,8 +310,60 @@ graph.add_edge("responder_perguntas", END)
 
 graph.set_entry_point("roteador")
 
-# Compila o grafo em um executor (cria um app pronto para .invoke)
-app = graph.compile()
+# Compila o grafo em um executor (cria um app pronto para .invoke).
+# O checkpointer guarda o estado de cada sessão (`thread_id`): a cada turno
+# basta enviar a nova mensagem, o restante do estado vem da sessão.
+checkpointer = criar_checkpointer()
+app = graph.compile(checkpointer=checkpointer)
+
+
+def executar_turno(thread_id: str, mensagem_usuario: str = None) -> dict:
+    """Roda um turno da conversa `thread_id` e devolve o estado atualizado.
+
+    Sem `mensagem_usuario` (sessão nova), o grafo envia a saudação.
+    """
+    entrada = {} if mensagem_usuario is None else {"mensagem_usuario": mensagem_usuario}
+    estado = app.invoke(entrada, config_sessao(thread_id))
+    podar_sessao(checkpointer, thread_id)
+    return estado
+
+
+def estado_da_sessao(thread_id: str) -> dict:
+    """Estado salvo da sessão (vazio se ela não existir)."""
+    return dict(app.get_state(config_sessao(thread_id)).values)
+
+
+# Versão assíncrona do app (servidores web): o mesmo grafo com um checkpointer
+# assíncrono, criado no event loop do servidor na primeira chamada.
+_app_async = None
+_app_async_lock = asyncio.Lock()
+
+
+async def obter_app_async():
+    global _app_async
+    async with _app_async_lock:
+        if _app_async is None:
+            _app_async = graph.compile(checkpointer=await criar_checkpointer_async())
+    return _app_async
+
+
+async def aexecutar_turno(thread_id: str, mensagem_usuario: str = None) -> dict:
+    """Como `executar_turno`, sem bloquear o event loop durante a chamada ao LLM."""
+    app_async = await obter_app_async()
+    entrada = {} if mensagem_usuario is None else {"mensagem_usuario": mensagem_usuario}
+    estado = await app_async.ainvoke(entrada, config_sessao(thread_id))
+    await apodar_sessao(app_async.checkpointer, thread_id)
+    return estado
+
+
+async def aestado_da_sessao(thread_id: str) -> dict:
+    app_async = await obter_app_async()
+    return dict((await app_async.aget_state(config_sessao(thread_id))).values)
+
+
+async def aapagar_sessao(thread_id: str) -> None:
+    app_async = await obter_app_async()
+    await app_async.checkpointer.adelete_thread(thread_id)
 
 
 # Imprimir o Grafo
@@ -215,18 +383,22 @@ except Exception as e:
 # 6. Execução interativa (simulação de uso)
 # ============================================================
 # Loop de CLI simples para interagir com o agente.
-# A cada entrada do usuário, invocamos o grafo passando um estado inicial
-# com a chave "interesse" e depois exibimos a chave "resposta".
+# A cada entrada do usuário, invocamos o grafo com a mensagem e exibimos a
+# chave "resposta". A sessão é retomada se o mesmo id for usado de novo:
+#   python techadvisor/techadvisor_agent.py maria
 if __name__ == "__main__":
     print("🤖 TechAdvisor - Agente conversacional sobre tecnologia\n")
 
-    # Estado de conversa persistente entre rodadas
-    state: dict = {}
+    thread_id = sys.argv[1] if len(sys.argv) > 1 else "cli"
+    state = estado_da_sessao(thread_id)
 
-    # Primeira saudação
-    result = app.invoke(state)
-    state.update(result)
-    print(state.get("resposta", "Olá!"))
+    if state.get("etapa") in (None, "fim"):
+        # Sessão nova (ou encerrada): recomeça com a saudação
+        apagar_sessao(checkpointer, thread_id)
+        state = executar_turno(thread_id)
+        print(state.get("resposta", "Olá!"))
+    else:
+        print(f"Retomando a conversa '{thread_id}'. {state.get('resposta', '')}")
 
     while True:
         try:
@@ -239,10 +411,8 @@ if __name__ == "__main__":
             print("Encerrando o agente. Até logo!")
             break
 
-        # Preenche a última mensagem e invoca 1 passo do grafo
-        state["mensagem_usuario"] = mensagem
-        result = app.invoke(state)
-        state.update(result)
+        # Envia a mensagem e invoca 1 passo do grafo na sessão
+        state = executar_turno(thread_id, mensagem)
 
         print(f"\n🔎 Agente: {state.get('resposta', '')}")
 
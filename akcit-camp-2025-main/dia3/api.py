@@ -0,0 +1,171 @@
+"""
+API HTTP do Finance Advisor (FastAPI)
+
+Expõe o motor de análise para outros serviços, sem carregar o Streamlit:
+
+    POST /analyze            análise completa de um ticker (job, 202 + polling)
+    POST /analyze/multi      comparação de tickers com PDF (job, 202 + polling);
+                             `mode: "aggregate"` usa uma única chamada ao LLM
+    GET  /jobs/{job_id}      estado, progresso e resultado de um job
+    GET  /reports/{digest}   bytes do PDF (`report:<sha256>` ou só o sha256)
+    GET  /metrics/{ticker}   métricas de dividendos, sem LLM
+    GET  /rank               ranking por métrica (subconjunto ou top-N), sem LLM
+
+As análises viram jobs (`core/jobs.py`): pedidos idênticos caem no mesmo
+job, inclusive entre workers (trava no Redis), e o número de análises
+simultâneas por provedor de LLM é limitado.  Um job já concluído responde
+200 com o resultado; senão a resposta é 202 com `Location: /jobs/{id}`.
+
+As métricas vêm de `core/metrics.py` (cache -> dados brutos -> brapi,
+sem LLM), com buscas idênticas em andamento coalescidas no processo.
+Respostas acima de 1 KB vão comprimidas (gzip).
+
+Uso:
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+    python api.py                      # mesmo efeito, com API_WORKERS/API_PORT
+
+Os workers compartilham o Redis (dados, métricas, jobs e PDFs); com
+`FAKE_CACHE=1` o cache é por processo, então use um único worker.
+
+Variáveis de ambiente:
+
+    API_HOST=0.0.0.0  API_PORT=8000  API_WORKERS=4
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from core import jobs
+from core.orchestrator import AGGREGATE_MODE, init_observability, multi_ticker_mode
+from core.metrics import get_metrics_many
+from core.ranking_index import METRIC_INDEXES, rank_subset, top_n
+from core.reports import get_report
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Langfuse, traces e métricas uma vez por worker
+    init_observability()
+    yield
+
+
+app = FastAPI(title="Finance Advisor API", description="Análise de dividendos com IA multi-agente",
+              lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Provedores de LLM aceitos: outros valores dão 422 em vez de um job fadado a falhar
+LLMProvider = Literal["gemini", "openai"]
+
+
+class AnalyzeRequest(BaseModel):
+    ticker: str = Field(..., min_length=4, max_length=8, examples=["PETR4"])
+    periodo: str = "1y"
+    question: Optional[str] = None
+    user_id: str = "api"
+    llm_provider: LLMProvider = "gemini"
+    force: bool = False
+
+
+class AnalyzeMultiRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=2, max_length=10, examples=[["PETR4", "VALE3"]])
+    periodo: str = "1y"
+    question: Optional[str] = None
+    user_id: str = "api"
+    llm_provider: LLMProvider = "gemini"
+    force: bool = False
+    # "crew": Crew completa; "aggregate": uma chamada ao LLM (padrão em MULTI_TICKER_MODE)
+    mode: Optional[Literal["crew", "aggregate"]] = None
+
+
+def _job_response(jid: str) -> JSONResponse:
+    estado = jobs.status(jid)
+    if estado["state"] == "unknown":
+        raise HTTPException(404, f"Job {jid} não encontrado")
+    body = {"job_id": jid, "status_url": f"/jobs/{jid}", **estado}
+    if estado["state"] in (jobs.DONE, jobs.ERROR):
+        return JSONResponse(body)
+    return JSONResponse(body, status_code=202, headers={"Location": f"/jobs/{jid}", "Retry-After": "2"})
+
+
+@app.post("/analyze")
+async def analyze(req: AnalyzeRequest) -> JSONResponse:
+    jid = await asyncio.to_thread(
+        jobs.submit, [req.ticker], req.periodo, req.llm_provider, req.user_id,
+        req.force, jobs.SINGLE, req.question,
+    )
+    return await asyncio.to_thread(_job_response, jid)
+
+
+@app.post("/analyze/multi")
+async def analyze_multi(req: AnalyzeMultiRequest) -> JSONResponse:
+    tickers = list(dict.fromkeys(t.upper() for t in req.tickers))
+    if len(tickers) < 2:
+        raise HTTPException(422, "Informe pelo menos 2 tickers distintos")
+    kind = jobs.AGGREGATE if multi_ticker_mode(req.mode) == AGGREGATE_MODE else jobs.MULTI
+    jid = await asyncio.to_thread(
+        jobs.submit, tickers, req.periodo, req.llm_provider, req.user_id,
+        req.force, kind, req.question,
+    )
+    return await asyncio.to_thread(_job_response, jid)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> JSONResponse:
+    return await asyncio.to_thread(_job_response, job_id)
+
+
+@app.get("/reports/{digest}")
+async def report(digest: str) -> Response:
+    try:
+        pdf = await asyncio.to_thread(get_report, digest)
+    except (KeyError, ValueError):
+        raise HTTPException(404, "Relatório não encontrado ou expirado")
+    return Response(pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": f'inline; filename="{digest[-64:]}.pdf"'})
+
+
+@app.get("/metrics/{ticker}")
+async def metrics(ticker: str, periodo: str = "1y") -> Dict[str, Any]:
+    ticker = ticker.upper()
+    found = await asyncio.to_thread(get_metrics_many, [ticker], periodo)
+    if ticker not in found:
+        raise HTTPException(502, f"Não foi possível obter dados de {ticker}")
+    return {"ticker": ticker, "periodo": periodo, "metrics": found[ticker]}
+
+
+@app.get("/rank")
+async def rank(tickers: Optional[str] = Query(None, description="lista separada por vírgulas; vazio = top-N do índice"),
+               periodo: str = "1y", metric: str = "dividend_yield", n: int = Query(10, ge=1, le=500)) -> Dict[str, Any]:
+    if metric not in METRIC_INDEXES:
+        raise HTTPException(422, f"Métrica inválida: {metric} (use {', '.join(METRIC_INDEXES)})")
+    if not tickers:
+        ranked = await asyncio.to_thread(top_n, periodo, n, metric)
+        return {"periodo": periodo, "metric": metric, "ranking": [{"ticker": t, metric: s} for t, s in ranked]}
+
+    requested = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    # Garante as métricas (e a entrada no índice) dos tickers pedidos
+    found = await asyncio.to_thread(get_metrics_many, requested, periodo)
+    ranked = await asyncio.to_thread(rank_subset, list(found), periodo, metric)
+    return {
+        "periodo": periodo,
+        "metric": metric,
+        "ranking": [{"ticker": t, metric: s} for t, s in ranked],
+        "missing": [t for t in requested if t not in found],
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "api:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "4")),
+    )
@@ -3,11 +3,25 @@
 Análise comparativa de dividendos com IA multi-agente
 """
 import streamlit as st
+import logging
 import os
+import time
 from pathlib import Path
 
 # Import do orquestrador
-from core.orchestrator import analyze_multi_tickers
+from core import jobs
+from core.metrics import get_metrics_many
+from core.orchestrator import init_observability
+from core.prewarm import start_prewarm_scheduler
+from core.reports import get_report
+from core.screener import FALLBACK_UNIVERSE, last_refresh, load_universe, refresh_universe, screen, start_refresh_scheduler
+
+# Langfuse, traces e métricas: idempotente, não repete a cada rerun
+init_observability()
+
+# Pré-aquecimento do cache antes da abertura e após o fechamento do pregão
+if os.getenv("PREWARM_ENABLED") == "1":
+    start_prewarm_scheduler()
 
 # Configuração da página
 st.set_page_config(
@@ -21,23 +35,61 @@ st.title("💰 Dividend Analyst")
 st.markdown("### Análise comparativa de dividendos com IA multi-agente")
 st.divider()
 
-# Lista de ações disponíveis (principais da B3)
+# Lista de ações disponíveis (principais da B3), usada se o universo não carregar
 ACOES_DISPONIVEIS = [
     "PETR4", "VALE3", "ITUB4", "MGLU3"
 ]
 
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def carregar_universo():
+    try:
+        return sorted(set(load_universe()) | set(ACOES_DISPONIVEIS))
+    except Exception:
+        return sorted(set(FALLBACK_UNIVERSE) | set(ACOES_DISPONIVEIS))
+
+
+TIPOS_ANALISE = {
+    jobs.MULTI: "🤖 Agentes por ação",
+    jobs.AGGREGATE: "⚡ Agregada (1 chamada ao LLM)",
+}
+
+
+def escolher_tipo_analise():
+    """Crew completa (tarefas por ticker) ou uma única chamada ao LLM com a tabela de métricas."""
+    return st.radio(
+        "Análise:",
+        options=list(TIPOS_ANALISE),
+        index=1 if os.getenv("MULTI_TICKER_MODE") == "aggregate" else 0,
+        format_func=TIPOS_ANALISE.get
+    )
+
+
 # Sidebar - Configurações
 with st.sidebar:
     st.header("⚙️ Configurações")
-    
-    # Seleção de ações
-    st.subheader("📊 Ações para Analisar")
-    tickers_selecionados = st.multiselect(
-        "Escolha de 2 a 6 ações:",
-        options=sorted(ACOES_DISPONIVEIS),
-        default=["PETR4", "VALE3", "ITUB4"],
-        max_selections=6
+
+    modo = st.radio(
+        "Modo:",
+        options=["comparar", "screener"],
+        index=0,
+        format_func=lambda x: {
+            "comparar": "📊 Comparar ações",
+            "screener": "🔎 Screener de mercado"
+        }[x]
     )
+
+    if modo == "comparar":
+        # Seleção de ações
+        st.subheader("📊 Ações para Analisar")
+        tickers_selecionados = st.multiselect(
+            "Escolha de 2 a 6 ações:",
+            options=carregar_universo(),
+            default=["PETR4", "VALE3", "ITUB4"],
+            max_selections=6
+        )
+
+        tipo_analise = escolher_tipo_analise()
     
     # Período de análise
     st.subheader("📅 Período")
@@ -81,84 +133,303 @@ with st.sidebar:
         4. Gera relatório PDF profissional
         """)
 
-# Área principal
-col1, col2 = st.columns([2, 1])
-
-with col1:
-    st.subheader("🎯 Ações Selecionadas")
-    if len(tickers_selecionados) >= 2:
-        # Mostra as ações selecionadas
-        cols = st.columns(min(len(tickers_selecionados), 4))
-        for idx, ticker in enumerate(tickers_selecionados):
-            with cols[idx % 4]:
-                st.info(f"**{ticker}**")
-    elif len(tickers_selecionados) == 1:
-        st.warning("⚠️ Selecione pelo menos 2 ações para comparação")
-    else:
-        st.info("👈 Selecione as ações no menu lateral")
+@st.cache_data(max_entries=32, show_spinner=False)
+def carregar_pdf(report_key):
+    # Bytes do relatório vindos do Redis; cada relatório é lido uma vez por processo
+    return get_report(report_key)
+
+
+def iniciar_analise(tickers_selecionados, forcar=False):
+    """Dispara a análise em segundo plano (ou reaproveita o resultado em cache)."""
+    job = jobs.submit(tickers_selecionados, periodo, llm_provider, user_id="streamlit_user", force=forcar,
+                      kind=tipo_analise)
+    st.session_state["analise"] = {"job_id": job, "tickers": list(tickers_selecionados), "kind": tipo_analise}
+
+
+def job_da_selecao(tickers_selecionados):
+    """Job da seleção atual, se já existir (em andamento ou em cache)."""
+    if len(tickers_selecionados) < 2:
+        return None
+    job = jobs.job_id(tickers_selecionados, periodo, llm_provider, tipo_analise)
+    return job if jobs.status(job)["state"] != "unknown" else None
+
+
+ETAPAS = {
+    "dados": "📥 Dados",
+    "metricas": "🧮 Métricas",
+    "insights": "💡 Insights",
+    "recomendacao": "🎯 Recomendação",
+    "ranking": "🏆 Ranking",
+    "relatorio": "📄 Relatório",
+    "comparativo": "🧠 Comparativo",
+}
+SIMBOLOS = {"running": "🔄", "done": "✅"}
+ETAPAS_GERAIS = ("ranking", "relatorio", "comparativo")  # uma vez para todos os tickers
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def carregar_metricas(tickers, periodo):
+    # Cache -> dados brutos -> brapi, sem LLM: os números aparecem antes da narrativa
+    return get_metrics_many(tickers, periodo)
+
+
+def mostrar_metricas(tickers_selecionados):
+    """Tabela com as métricas calculadas, disponível enquanto os agentes trabalham."""
+    metricas = carregar_metricas(tuple(tickers_selecionados), periodo)
+    if not metricas:
+        return
+    st.subheader("📊 Métricas")
+    st.dataframe(
+        [
+            {
+                "Ticker": ticker,
+                "DY (%)": m.get("dividend_yield"),
+                "Dividendos 12m (R$)": m.get("dividendos_12m"),
+                "Pagamentos": int(m.get("quantidade_pagamentos", 0)),
+                "Preço (R$)": m.get("preco_atual"),
+                "Volatilidade (%)": m.get("volatilidade"),
+            }
+            for ticker, m in sorted(metricas.items(), key=lambda item: -item[1].get("dividend_yield", 0))
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+def mostrar_progresso(estado, tickers_selecionados):
+    """Progresso real da Crew: tarefas concluídas, tarefa atual e etapa de cada ticker."""
+    progresso = estado.get("progress") or {}
+    total = progresso.get("total_tasks") or 0
+    feitas = progresso.get("tasks_done", 0)
+    atual = progresso.get("current") or {}
+
+    texto = f"🔄 Analisando {', '.join(tickers_selecionados)}... ({estado.get('elapsed_s', 0):.0f}s)"
+    if estado.get("queued"):
+        texto = f"⏳ Na fila: aguardando vaga no provedor de IA ({estado.get('elapsed_s', 0):.0f}s)"
+    elif atual:
+        texto += f" — {atual['agent']}"
+    st.progress(feitas / total if total else 0.0, text=texto)
+    st.caption(
+        f"{feitas}/{total or '?'} tarefas · {progresso.get('tokens', 0)} tokens — "
+        "você pode continuar usando a página."
+    )
 
-with col2:
-    st.subheader("🚀 Executar")
+    etapas = progresso.get("stages") or {}
+    if any(etapas.values()):
+        st.dataframe(
+            [
+                {"Ticker": ticker, **{
+                    rotulo: SIMBOLOS.get(status.get(etapa), "⏳")
+                    if (ticker == "todos") == (etapa in ETAPAS_GERAIS) else "—"
+                    for etapa, rotulo in ETAPAS.items()
+                    if any(etapa in s for s in etapas.values())
+                }}
+                for ticker, status in etapas.items()
+                if status or ticker != "todos"
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+
+@st.fragment(run_every=2)
+def acompanhar_analise(job, tickers_selecionados):
+    """Progresso do job; só este trecho é reexecutado durante a espera."""
+    estado = jobs.status(job)
+    if estado["state"] != "running":
+        # Terminou (ou falhou): um rerun completo mostra o resultado e encerra a consulta periódica
+        st.rerun()
+    mostrar_progresso(estado, tickers_selecionados)
+    mostrar_metricas(tickers_selecionados)
+
+
+def mostrar_analise(job, tickers_selecionados, kind=jobs.MULTI):
+    """Estado e resultado do job (acompanhado a cada 2s só enquanto roda)."""
+    estado = jobs.status(job)
+
+    if estado["state"] == "running":
+        acompanhar_analise(job, tickers_selecionados)
+        return
+    if estado["state"] == "error":
+        st.error(f"❌ Erro na análise: {estado.get('error')}")
+        with st.expander("🔍 Detalhes do erro"):
+            st.code(estado.get("error"))
+        return
+    if estado["state"] != "done":
+        return
+
+    resultado = estado["result"]
+    st.success("✅ Análise concluída com sucesso!")
     
-    # Validação
-    pode_executar = len(tickers_selecionados) >= 2
+    if resultado["ranking"]:
+        st.subheader("🏆 Ranking por Dividend Yield")
+        st.dataframe(resultado["ranking"], hide_index=True, use_container_width=True)
+
+    if kind == jobs.AGGREGATE:
+        # Na análise agregada, a resposta é a narrativa comparativa do analista
+        st.subheader("🧠 Análise Comparativa")
+        st.markdown(resultado["resposta"])
     
-    if st.button(
-        "▶️ Analisar Dividendos",
-        type="primary",
-        disabled=not pode_executar,
-        use_container_width=True
-    ):
-        # Executa a análise
-        with st.spinner(f"🔄 Analisando {len(tickers_selecionados)} ações..."):
-            try:
-                # Placeholder para progresso
-                progress_text = st.empty()
-                progress_bar = st.progress(0)
-                
-                progress_text.text("📊 Buscando dados das ações...")
-                progress_bar.progress(20)
-                
-                # Executa análise
-                resultado = analyze_multi_tickers(
-                    tickers=tickers_selecionados,
-                    periodo=periodo,
-                    user_question=f"Análise comparativa de {', '.join(tickers_selecionados)}",
-                    user_id="streamlit_user",
-                    llm_provider=llm_provider
-                )
-                
-                progress_bar.progress(100)
-                progress_text.empty()
-                progress_bar.empty()
-                
-                # Sucesso!
-                st.success("✅ Análise concluída com sucesso!")
-                
-                # Extrai o caminho do PDF
-                pdf_path = resultado.strip()
-                
-                # Mostra informações
-                st.subheader("📄 Relatório Gerado")
-                st.code(pdf_path, language=None)
-                
-                # Botão para baixar o PDF
-                if os.path.exists(pdf_path):
-                    with open(pdf_path, "rb") as pdf_file:
-                        pdf_bytes = pdf_file.read()
-                        
-                    st.download_button(
-                        label="📥 Baixar Relatório PDF",
-                        data=pdf_bytes,
-                        file_name=f"analise_dividendos_{'_'.join(tickers_selecionados)}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                
-            except Exception as e:
-                st.error(f"❌ Erro na análise: {str(e)}")
-                with st.expander("🔍 Detalhes do erro"):
-                    st.code(str(e))
+    # Mostra informações
+    st.subheader("📄 Relatório Gerado")
+    pdf = None
+    if resultado["report_key"]:
+        # Bytes vindos do Redis: nenhuma leitura de arquivo
+        try:
+            pdf = carregar_pdf(resultado["report_key"])
+        except Exception as exc:
+            logging.error(f"Falha ao gerar o PDF {resultado['report_key']}: {exc}")
+    if pdf:
+        st.download_button(
+            label="📥 Baixar Relatório PDF",
+            data=pdf,
+            file_name=f"analise_dividendos_{'_'.join(tickers_selecionados)}.pdf",
+            mime="application/pdf",
+            use_container_width=True
+        )
+    else:
+        st.warning("⚠️ A análise não gerou relatório PDF.")
+        st.code(resultado["resposta"], language=None)
+
+
+def painel_analise(tickers_selecionados):
+    """Resultado da seleção atual ou, se não houver, da última análise da sessão."""
+    job, kind = job_da_selecao(tickers_selecionados), tipo_analise
+    if job is None and "analise" in st.session_state:
+        job = st.session_state["analise"]["job_id"]
+        tickers_selecionados = st.session_state["analise"]["tickers"]
+        kind = st.session_state["analise"].get("kind", jobs.MULTI)
+    if job is not None:
+        mostrar_analise(job, tickers_selecionados, kind)
+
+
+# Área principal
+if modo == "comparar":
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        st.subheader("🎯 Ações Selecionadas")
+        if len(tickers_selecionados) >= 2:
+            # Mostra as ações selecionadas
+            cols = st.columns(min(len(tickers_selecionados), 4))
+            for idx, ticker in enumerate(tickers_selecionados):
+                with cols[idx % 4]:
+                    st.info(f"**{ticker}**")
+        elif len(tickers_selecionados) == 1:
+            st.warning("⚠️ Selecione pelo menos 2 ações para comparação")
+        else:
+            st.info("👈 Selecione as ações no menu lateral")
+
+    with col2:
+        st.subheader("🚀 Executar")
+        
+        # Validação
+        pode_executar = len(tickers_selecionados) >= 2
+        
+        ja_analisado = pode_executar and job_da_selecao(tickers_selecionados) is not None
+        
+        if st.button(
+            "🔄 Analisar novamente" if ja_analisado else "▶️ Analisar Dividendos",
+            type="secondary" if ja_analisado else "primary",
+            disabled=not pode_executar,
+            use_container_width=True
+        ):
+            iniciar_analise(tickers_selecionados, forcar=ja_analisado)
+
+    painel_analise(tickers_selecionados)
+
+else:
+    # Screener: filtros respondidos pelos índices pré-computados, sem LLM
+    start_refresh_scheduler(periodo)
+
+    st.subheader("🔎 Screener de Dividendos")
+    status = last_refresh(periodo)
+    col_status, col_refresh = st.columns([3, 1])
+    with col_status:
+        if status:
+            st.caption(
+                f"Universo atualizado há {int((time.time() - status['refreshed_at']) / 60)} min: "
+                f"{status['ok']} ações ({status['failed']} falhas) em {status['elapsed_s']}s"
+            )
+        else:
+            st.caption("⏳ Universo ainda não atualizado para este período.")
+    with col_refresh:
+        if st.button("🔄 Atualizar universo", use_container_width=True):
+            with st.spinner("Buscando dados do universo de ações..."):
+                status = refresh_universe(periodo)
+            st.success(f"✅ {status['ok']} ações atualizadas em {status['elapsed_s']}s")
+
+    f1, f2, f3, f4 = st.columns(4)
+    min_dy = f1.number_input("DY mínimo (%)", min_value=0.0, value=6.0, step=0.5)
+    min_pagamentos = f2.number_input("Pagamentos mínimos (12m)", min_value=0, value=0, step=1)
+    max_preco = f3.number_input("Preço máximo (R$)", min_value=0.0, value=0.0, step=5.0,
+                                help="0 = sem limite")
+    max_vol = f4.number_input("Volatilidade máxima (%)", min_value=0.0, value=0.0, step=5.0,
+                              help="0 = sem limite")
+
+    o1, o2 = st.columns([3, 1])
+    ordenar_por = o1.selectbox(
+        "Ordenar por:",
+        options=["dividend_yield", "dividendos_12m", "quantidade_pagamentos", "preco_atual", "volatilidade"],
+        format_func=lambda x: {
+            "dividend_yield": "Dividend yield",
+            "dividendos_12m": "Dividendos em 12 meses",
+            "quantidade_pagamentos": "Quantidade de pagamentos",
+            "preco_atual": "Preço",
+            "volatilidade": "Volatilidade"
+        }[x]
+    )
+    crescente = o2.checkbox("Ordem crescente", value=ordenar_por == "volatilidade")
+
+    resultados = screen(
+        periodo,
+        sort_by=ordenar_por,
+        ascending=crescente,
+        limit=100,
+        min_dy=min_dy or None,
+        min_pagamentos=min_pagamentos or None,
+        max_preco=max_preco or None,
+        max_volatilidade=max_vol or None,
+    )
+
+    if not resultados:
+        st.info("Nenhuma ação atende aos filtros (ou o universo ainda não foi atualizado).")
+    else:
+        st.dataframe(
+            [
+                {
+                    "Ticker": r["ticker"],
+                    "DY (%)": r.get("dividend_yield"),
+                    "Dividendos 12m (R$)": r.get("dividendos_12m"),
+                    "Pagamentos": int(r.get("quantidade_pagamentos", 0)),
+                    "Preço (R$)": r.get("preco_atual"),
+                    "Volatilidade (%)": r.get("volatilidade"),
+                }
+                for r in resultados
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # Só os N primeiros escolhidos vão para os agentes
+        st.subheader("🚀 Análise detalhada")
+        top_n = st.slider("Analisar as N primeiras:", min_value=2, max_value=6, value=3)
+        tickers_selecionados = st.multiselect(
+            "Ações para a análise com IA:",
+            options=[r["ticker"] for r in resultados],
+            default=[r["ticker"] for r in resultados[:top_n]],
+            max_selections=6
+        )
+
+        tipo_analise = escolher_tipo_analise()
+        if st.button(
+            "▶️ Analisar Dividendos",
+            type="primary",
+            disabled=len(tickers_selecionados) < 2
+        ):
+            iniciar_analise(tickers_selecionados)
+
+        painel_analise(tickers_selecionados)
 
 # Rodapé
 st.divider()
@@ -0,0 +1 @@
+"""Benchmarks de desempenho do Finance Advisor (import, pipeline e ferramentas)."""
@@ -0,0 +1,84 @@
+"""
+Payloads da brapi para os benchmarks: gravação e montagem do diretório de replay.
+
+Os benchmarks respondem a `fetch_brapi_data` a partir de arquivos JSON
+(`BRAPI_REPLAY_DIR`, ver `core/data_loader.py`).  Há duas fontes:
+
+* **Gravações reais**: `python -m benchmarks.fixtures record PETR4 VALE3`
+  busca na brapi.dev com `BRAPI_RECORD_DIR` ativo e salva os payloads;
+* **Payloads sintéticos**: quando não há gravação, usa o gerador de
+  `core/synthetic_data.py` (cotações diárias, proventos e fundamentos no
+  formato da brapi, determinístico por ticker).
+
+Para 10 ou 100 tickers, `prepare_replay_dir` reaproveita as gravações em
+rodízio (trocando o `symbol`), de modo que o volume de dados seja o real.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDINGS_DIR = os.path.join(ROOT, "benchmarks", "recordings")
+
+BASE_TICKERS = ["PETR4", "VALE3", "ITUB4", "BBDC4", "BBAS3", "TAEE11", "CMIG4", "SANB11", "CPLE6", "EGIE3"]
+
+
+def tickers_for(count: int) -> List[str]:
+    """Lista de `count` tickers: os mais negociados e, depois, códigos sintéticos."""
+    extra = [f"BCH{i:03d}3" for i in range(max(0, count - len(BASE_TICKERS)))]
+    return (BASE_TICKERS + extra)[:count]
+
+
+def _recordings(periodo: str, source_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(source_dir, f"*_{periodo}.json")))
+
+
+def prepare_replay_dir(tickers: List[str], periodo: str, directory: str,
+                       source_dir: Optional[str] = RECORDINGS_DIR) -> str:
+    """Preenche `directory` com um payload por ticker (gravado ou sintético)."""
+    from core.data_loader import recording_path
+    from core.synthetic_data import generate_quote
+
+    os.makedirs(directory, exist_ok=True)
+    sources = _recordings(periodo, source_dir) if source_dir and os.path.isdir(source_dir) else []
+    for i, ticker in enumerate(tickers):
+        if sources:
+            with open(sources[i % len(sources)], encoding="utf-8") as fh:
+                payload = json.load(fh)
+            payload["results"][0]["symbol"] = ticker
+        else:
+            payload = generate_quote(ticker, periodo)
+        with open(recording_path(directory, ticker, periodo), "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, ensure_ascii=False)
+    return directory
+
+
+def record(tickers: List[str], periodo: str, out_dir: str = RECORDINGS_DIR) -> None:
+    """Busca os tickers na brapi.dev e grava as respostas em `out_dir`."""
+    os.environ["BRAPI_RECORD_DIR"] = out_dir
+    os.environ.pop("BRAPI_REPLAY_DIR", None)
+    os.environ.pop("FAKE_DATA", None)
+    from core.data_loader import fetch_brapi_data
+
+    for ticker in tickers:
+        fetch_brapi_data(ticker, periodo)
+        print(f"gravado {ticker} ({periodo}) em {out_dir}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Grava payloads reais da brapi.dev para os benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="grava respostas reais da brapi.dev")
+    rec.add_argument("tickers", nargs="*", default=BASE_TICKERS[:4])
+    rec.add_argument("--periodo", default="1y")
+    rec.add_argument("--out", default=RECORDINGS_DIR)
+    args = parser.parse_args(argv)
+    record([t.upper() for t in args.tickers], args.periodo, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
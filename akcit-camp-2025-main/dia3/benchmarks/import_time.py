@@ -0,0 +1,84 @@
+"""
+Benchmark de tempo de import (partida a frio) dos módulos de entrada.
+
+Cada rerun do Streamlit e cada worker novo pagam o custo de importar o
+orquestrador.  Este script mede, em processos Python novos, o tempo de
+`import core.orchestrator` (e de outros módulos, se informados) e falha
+com código de saída 1 se a mediana passar do orçamento.
+
+Uso (a partir da pasta dia3)::
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 300 --runs 7 core.orchestrator utils.cache
+
+O orçamento padrão vem de `IMPORT_BUDGET_MS` (500 ms).  Use `--top 10` para
+listar os módulos mais caros segundo `python -X importtime`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str) -> float:
+    """Tempo (ms) de importar `module` em um interpretador novo."""
+    code = (
+        "import time; _t = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - _t) * 1000)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(module: str, limit: int) -> List[Tuple[int, str]]:
+    """Módulos com maior tempo cumulativo segundo `-X importtime` (µs)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows: List[Tuple[int, str]] = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Formato: "import time: <self us> | <cumulative us> | <módulo>"
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede o tempo de import a frio e aplica um orçamento.")
+    parser.add_argument("modules", nargs="*", default=["core.orchestrator"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "500")))
+    parser.add_argument("--top", type=int, default=0, help="lista os N imports mais caros")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        start = time.perf_counter()
+        samples = [measure_import(module) for _ in range(args.runs)]
+        median = statistics.median(samples)
+        status = "OK" if median <= args.budget_ms else "ACIMA DO ORÇAMENTO"
+        failed = failed or median > args.budget_ms
+        print(
+            f"{module:<28} mediana={median:8.1f} ms  min={min(samples):8.1f} ms  "
+            f"max={max(samples):8.1f} ms  orçamento={args.budget_ms:.0f} ms  [{status}]"
+            f"  ({time.perf_counter() - start:.1f}s)"
+        )
+        if args.top:
+            for cumulative_us, name in top_imports(module, args.top):
+                print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Benchmark offline e repetível do pipeline Finance Advisor.
+
+Roda sem rede e sem chaves de API:
+
+* brapi.dev respondida por payloads gravados ou sintéticos (`BRAPI_REPLAY_DIR`,
+  ver `benchmarks/fixtures.py`);
+* LLM substituído pelo `ReplayLLM` determinístico, com latência e tamanho de
+  resposta configuráveis (ver `benchmarks/replay_llm.py`);
+* Redis em memória (`FAKE_CACHE=1`), a menos que `--redis` seja informado.
+
+Cenários, cada um em 1, 10 e 100 tickers (`--sizes`):
+
+    tools     ferramentas chamadas diretamente (fetch, métricas, ranking, PDF)
+    analyze   `analyze()` uma vez por ticker
+    multi     `analyze_multi_tickers()` com todos os tickers de uma vez
+    aggregate o mesmo em `mode="aggregate"` (uma chamada ao LLM)
+
+Para cada cenário o relatório traz latência por operação (p50/p95/p99/máx),
+vazão (tickers/s), pico de memória alocada (tracemalloc) e o RSS máximo do
+processo, além do resumo por etapa de `utils.telemetry`.  A coluna
+`build ms` é o tempo médio de montagem de cada Crew (`crew_build`), sem o
+`kickoff`.
+
+Uso (a partir da pasta dia3)::
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --scenarios tools,multi --sizes 1,10 --llm-latency 0
+    python -m benchmarks.pipeline --json bench.json
+
+Cada rodada começa com o cache de dados vazio; `--warm-cache` mantém o
+cache da rodada anterior e mede o caminho pré-aquecido (`core/prewarm.py`).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+SCENARIOS = ("tools", "analyze", "multi", "aggregate")
+PERIODO = "1y"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil por interpolação linear (q entre 0 e 100)."""
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _summary(name: str, size: int, samples: List[float], wall: float, peak_bytes: int) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "tickers": size,
+        "ops": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+        "wall_s": round(wall, 3),
+        "tickers_per_s": round(size / wall, 2) if wall else None,
+        "peak_alloc_mb": round(peak_bytes / 2**20, 2),
+        # ru_maxrss é em KiB no Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _measure(fn: Callable[[], Any], samples: List[float]) -> Any:
+    start = time.perf_counter()
+    result = fn()
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def run_tools(tickers: List[str]) -> List[float]:
+    from crew.tools import (
+        calc_dividend_metrics_tool, fetch_brapi_data_tool, generate_dividend_pdf,
+        rank_tickers_by_dividend_yield,
+    )
+    from core.reports import extract_report_key, get_report
+
+    samples: List[float] = []
+    for ticker in tickers:
+        _measure(lambda: fetch_brapi_data_tool.run(ticker=ticker, periodo=PERIODO), samples)
+        _measure(lambda: calc_dividend_metrics_tool.run(ticker=ticker, periodo=PERIODO), samples)
+    ranking = _measure(
+        lambda: rank_tickers_by_dividend_yield.run(tickers_list=",".join(tickers), periodo=PERIODO), samples,
+    )
+    # A renderização é assíncrona: a amostra inclui a espera pelos bytes prontos
+    _measure(lambda: get_report(extract_report_key(generate_dividend_pdf.run(content=ranking))), samples)
+    return samples
+
+
+def run_analyze(tickers: List[str]) -> List[float]:
+    from core.orchestrator import analyze
+
+    samples: List[float] = []
+    for i, ticker in enumerate(tickers):
+        _measure(lambda: analyze(ticker, PERIODO, "benchmark", user_id=f"bench-{i}", llm_provider="replay"), samples)
+    return samples
+
+
+def run_multi(tickers: List[str]) -> List[float]:
+    from core.orchestrator import analyze_multi_tickers
+
+    samples: List[float] = []
+    _measure(lambda: analyze_multi_tickers(tickers, PERIODO, "benchmark", user_id="bench-multi",
+                                           llm_provider="replay"), samples)
+    return samples
+
+
+def run_aggregate(tickers: List[str]) -> List[float]:
+    from core.orchestrator import analyze_multi_tickers
+
+    samples: List[float] = []
+    _measure(lambda: analyze_multi_tickers(tickers, PERIODO, "benchmark", user_id="bench-aggregate",
+                                           llm_provider="replay", mode="aggregate"), samples)
+    return samples
+
+
+RUNNERS = {"tools": run_tools, "analyze": run_analyze, "multi": run_multi, "aggregate": run_aggregate}
+
+
+def run_scenario(name: str, tickers: List[str], quiet: bool = True) -> Dict[str, Any]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    # Com CREW_VERBOSE=1 o log de agentes é descartado e não entra na medição
+    sink = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        samples = RUNNERS[name](tickers)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(name, len(tickers), samples, wall, peak)
+
+
+# Chaves derivadas dos dados; o restante do Redis (rate limit etc.) fica intacto
+CACHE_PATTERNS = ("rawdata:*", "metrics:*", "rank:*", "insights:*", "recommendation:*", "deps:*")
+
+
+def _clear_cache() -> None:
+    """Esvazia o cache de dados para que cada rodada meça o caminho frio."""
+    from utils import cache
+
+    if os.getenv("FAKE_CACHE") != "1" and cache._load_redis():
+        r = cache.get_redis_connection()
+        for pattern in CACHE_PATTERNS:
+            keys = list(r.scan_iter(match=pattern, count=500))
+            if keys:
+                r.delete(*keys)
+    else:
+        with cache._in_memory_lock:
+            cache._in_memory_store.clear()
+
+
+def _setup_env(replay_dir: str, use_redis: bool) -> None:
+    os.environ["BRAPI_REPLAY_DIR"] = replay_dir
+    os.environ.pop("BRAPI_RECORD_DIR", None)
+    os.environ.pop("FAKE_DATA", None)
+    if not use_redis:
+        os.environ["FAKE_CACHE"] = "1"
+    # Um único provedor: o roteador não deve tentar Gemini/OpenAI reais
+    os.environ["LLM_ROUTER"] = "0"
+    # Telemetria da própria CrewAI acessa a rede e distorce a primeira rodada
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+
+def _crew_build_ms(series: List[Dict[str, Any]]) -> Optional[float]:
+    """Tempo médio de montagem das Crews da rodada (todas as variantes)."""
+    builds = [s for s in series if s["labels"].get("stage") == "crew_build"]
+    count = sum(s["count"] for s in builds)
+    return round(sum(s["sum"] for s in builds) / count * 1000, 2) if count else None
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    header = f"{'cenário':<10}{'tickers':>8}{'ops':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" \
+             f"{'máx ms':>10}{'build ms':>10}{'tickers/s':>11}{'pico MB':>9}{'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['scenario']:<10}{r['tickers']:>8}{r['ops']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}{(r['crew_build_ms'] or 0):>10.2f}"
+            f"{(r['tickers_per_s'] or 0):>11.2f}"
+            f"{r['peak_alloc_mb']:>9.1f}{r['max_rss_mb']:>8.0f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline (replay da brapi + LLM determinístico).")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sizes", default="1,10,100")
+    parser.add_argument("--llm-latency", type=float, default=None, help="segundos por chamada ao LLM")
+    parser.add_argument("--llm-tokens", type=int, default=None, help="palavras extras por resposta")
+    parser.add_argument("--redis", action="store_true", help="usa o Redis de REDIS_HOST em vez do cache em memória")
+    parser.add_argument("--json", dest="json_path", help="grava o relatório completo em JSON")
+    parser.add_argument("--warmup", type=int, default=1, help="rodadas de aquecimento (1 ticker) por cenário")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="mantém o cache entre rodadas (mede o caminho pré-aquecido)")
+    parser.add_argument("--verbose", action="store_true", help="mostra o log das Crews")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",")]
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    workdir = tempfile.mkdtemp(prefix="finance-bench-")
+    replay_dir = os.path.join(workdir, "brapi")
+    _setup_env(replay_dir, args.redis)
+    if args.verbose:
+        os.environ["CREW_VERBOSE"] = "1"
+
+    from benchmarks.fixtures import prepare_replay_dir, tickers_for
+    from utils import telemetry
+
+    prepare_replay_dir(tickers_for(max(sizes)), PERIODO, replay_dir)
+    llm = None
+    if {"analyze", "multi", "aggregate"} & set(scenarios):
+        from benchmarks.replay_llm import register_replay_provider
+        llm = register_replay_provider(args.llm_latency, args.llm_tokens)
+
+    # PDFs e demais artefatos ficam no diretório temporário
+    os.chdir(workdir)
+    rows = []
+    for name in scenarios:
+        # Aquecimento: imports tardios e caches de primeira chamada fora da medição
+        for _ in range(args.warmup):
+            run_scenario(name, tickers_for(1))
+        for size in sizes:
+            if not args.warm_cache:
+                _clear_cache()
+            telemetry.reset()
+            calls_before = llm.calls if llm else 0
+            row = run_scenario(name, tickers_for(size), quiet=not args.verbose)
+            row["llm_calls"] = (llm.calls - calls_before) if llm else 0
+            row["stages"] = telemetry.snapshot()["series"]
+            row["crew_build_ms"] = _crew_build_ms(row["stages"])
+            rows.append(row)
+            print(f"  {name} x{size}: {row['wall_s']:.2f}s", file=sys.stderr)
+
+    _print_table(rows)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as fh:
+            json.dump({"periodo": PERIODO, "results": rows}, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
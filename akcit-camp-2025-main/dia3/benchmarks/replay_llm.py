@@ -0,0 +1,169 @@
+"""
+LLM determinístico para benchmarks offline das Crews.
+
+O `FAKE_LLM` de `utils/llm_client.py` devolve uma frase fixa e não passa
+pelo loop de agentes da CrewAI, então não exercita nada do pipeline.  O
+`ReplayLLM` fala o protocolo ReAct que a CrewAI espera: na primeira chamada
+de cada tarefa ele escolhe a ferramenta citada na descrição da tarefa e
+extrai os argumentos (`ticker='PETR4'`, `periodo='1y'`, ...); depois da
+`Observation` ele devolve a `Final Answer`.  Assim as ferramentas reais
+(brapi em replay, Redis, cálculo de métricas, PDF) rodam de ponta a ponta.
+
+Latência e tamanho das respostas são configuráveis para simular o provedor:
+
+    BENCH_LLM_LATENCY=0.05   segundos por chamada
+    BENCH_LLM_TOKENS=150     "tokens" (palavras) extras em cada resposta final
+
+Uso::
+
+    from benchmarks.replay_llm import register_replay_provider
+    register_replay_provider()
+    analyze("PETR4", "1y", "...", llm_provider="replay")
+"""
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from crewai.llms.base_llm import BaseLLM
+from pydantic import PrivateAttr
+
+PROVIDER_NAME = "replay"
+
+_FILLER = (
+    "O histórico de proventos mostra pagamentos regulares e o rendimento "
+    "se mantém dentro da faixa observada para o setor no período analisado"
+).split()
+
+_TOOL_NAME_RE = re.compile(r"^Tool Name: (.+)$", re.MULTILINE)
+_ARG_RE = r"{name}\s*=\s*'([^']*)'"
+_PDF_NAME_RE = re.compile(r"'([\w.-]+\.pdf)'")
+_JSON_LIST_RE = re.compile(r"\[\s*\{.*?\}\s*\]", re.DOTALL)
+
+
+def _tool_catalog() -> Dict[str, Any]:
+    """Mapeia o nome da função Python de cada ferramenta para o objeto CrewAI."""
+    from crew import tools
+
+    catalog = {}
+    for obj in vars(tools).values():
+        func = getattr(obj, "func", None)
+        if func is not None and hasattr(obj, "name") and hasattr(obj, "args_schema"):
+            catalog[func.__name__] = obj
+    return catalog
+
+
+def _normalize(name: str) -> str:
+    """Normaliza nomes de ferramenta (a CrewAI anuncia versões sem acento em snake_case)."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", ascii_name.lower()).strip("_")
+
+
+def _text(messages: Any) -> List[Dict[str, str]]:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return [{"role": m.get("role", "user"), "content": str(m.get("content", ""))} for m in messages]
+
+
+class ReplayLLM(BaseLLM):
+    """LLM roteirizado: chama a ferramenta da tarefa e repete a observação."""
+
+    llm_type: str = PROVIDER_NAME
+    latency: float = 0.05
+    tokens: int = 150
+    calls: int = 0
+    prompt_chars: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _pick_tool(self, task: str, system: str) -> Optional[Tuple[str, Any]]:
+        """Ferramenta citada na tarefa, com o nome exato anunciado no prompt."""
+        advertised = {_normalize(name): name.strip() for name in _TOOL_NAME_RE.findall(system)}
+        for func_name, tool_obj in _tool_catalog().items():
+            name = advertised.get(_normalize(tool_obj.name))
+            if func_name in task and name:
+                return name, tool_obj
+        return None
+
+    def _tool_args(self, tool_obj: Any, task: str) -> Dict[str, Any]:
+        args: Dict[str, Any] = {}
+        for name in tool_obj.args_schema.model_fields:
+            match = re.search(_ARG_RE.format(name=name), task)
+            if match:
+                args[name] = match.group(1)
+            elif name == "content":
+                ranking = _JSON_LIST_RE.search(task)
+                args[name] = ranking.group(0) if ranking else task
+            elif name == "output_filename":
+                pdf_name = _PDF_NAME_RE.search(task)
+                if pdf_name:
+                    args[name] = pdf_name.group(1)
+        return args
+
+    def _filler(self) -> str:
+        return " ".join(_FILLER[i % len(_FILLER)] for i in range(self.tokens))
+
+    def call(self, messages, *args, **kwargs):  # type: ignore[override]
+        msgs = _text(messages)
+        prompt_chars = sum(len(m["content"]) for m in msgs)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+        if self.latency:
+            time.sleep(self.latency)
+
+        reply = self._reply(msgs)
+        # Uso estimado (~4 caracteres por token), para o progresso por tarefa ter tokens
+        prompt_tokens, completion_tokens = prompt_chars // 4, len(reply.split())
+        with self._lock:
+            self._track_token_usage_internal({
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            })
+        return reply
+
+    def _reply(self, msgs: List[Dict[str, str]]) -> str:
+        system = "\n".join(m["content"] for m in msgs if m["role"] == "system")
+        conversation = "\n".join(m["content"] for m in msgs if m["role"] != "system")
+        task = conversation.split("Current Task:")[-1]
+
+        if "Observation:" in task:
+            observation = task.rsplit("Observation:", 1)[-1]
+            # Remove a instrução que a CrewAI anexa depois do resultado da ferramenta
+            observation = observation.split("\nAnalyze the tool result", 1)[0].strip()
+            return f"Thought: I now know the final answer\nFinal Answer: {observation}\n\n{self._filler()}"
+
+        picked = self._pick_tool(task, system + "\n" + conversation)
+        if picked is None:
+            return f"Thought: I now know the final answer\nFinal Answer: {self._filler()}"
+        name, tool_obj = picked
+        tool_input = json.dumps(self._tool_args(tool_obj, task), ensure_ascii=False)
+        return f"Thought: vou usar a ferramenta\nAction: {name}\nAction Input: {tool_input}"
+
+    def supports_function_calling(self) -> bool:
+        # Força o formato ReAct em texto, o mesmo caminho dos provedores sem tools nativas
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+
+def register_replay_provider(latency: Optional[float] = None, tokens: Optional[int] = None) -> ReplayLLM:
+    """Registra o provedor `replay` em `crew.crew.get_llm`.
+
+    Todas as Crews compartilham a mesma instância, cujos contadores
+    (`calls`, `prompt_chars`) entram no relatório do benchmark.
+    """
+    from crew.crew import register_llm_provider
+
+    latency = float(os.getenv("BENCH_LLM_LATENCY", "0.05")) if latency is None else latency
+    tokens = int(os.getenv("BENCH_LLM_TOKENS", "150")) if tokens is None else tokens
+    llm = ReplayLLM(model=f"{PROVIDER_NAME}/deterministic", latency=latency, tokens=tokens)
+    register_llm_provider(PROVIDER_NAME, lambda: llm)
+    return llm
@@ -0,0 +1,195 @@
+"""
+Execução em lote de várias carteiras (`main.py`).
+
+Antes, cada carteira rodava `analyze_multi_tickers` em sequência e os
+tickers repetidos entre carteiras (PETR4 e VALE3 aparecem em várias) eram
+buscados e calculados de novo a cada uma.  O lote agora tem duas fases:
+
+1. **Pré-carga**: o universo de tickers de todas as carteiras é
+   deduplicado e cada `(ticker, periodo)` é buscado e calculado uma única
+   vez, em paralelo (`core.prewarm.warm`), deixando `rawdata:` e
+   `metrics:` no cache;
+2. **Carteiras**: as comparações/PDFs rodam em um pool limitado de
+   threads; as ferramentas da Crew encontram os dados no cache e só o LLM
+   e o PDF ficam por conta de cada carteira.  Com `mode="aggregate"`
+   (`main.py --mode aggregate`), cada carteira custa uma única chamada ao
+   LLM, com a tabela de métricas já pronta.
+
+O relatório traz o tempo de cada fase, a latência por carteira e a vazão.
+
+Carteiras podem vir de um arquivo:
+
+* YAML: lista de `{nome, tickers}` (ou chave `carteiras` com essa lista);
+* CSV: colunas `nome,tickers` (tickers separados por espaço, `;` ou `|`)
+  ou `nome,ticker` com uma linha por ticker.
+
+Variáveis de ambiente:
+
+    BATCH_WORKERS=3        carteiras analisadas simultaneamente
+    BATCH_FETCH_WORKERS=8  tickers buscados simultaneamente na pré-carga
+"""
+import csv
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from utils.telemetry import timed
+
+try:
+    import yaml  # type: ignore
+except ImportError:  # pragma: no cover - PyYAML é opcional
+    yaml = None  # type: ignore
+
+
+def _split_tickers(value: Any) -> List[str]:
+    items = value if isinstance(value, list) else re.split(r"[\s,;|]+", str(value or ""))
+    return [str(t).strip().upper() for t in items if str(t).strip()]
+
+
+def _normalize(raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    carteiras = []
+    for i, item in enumerate(raw):
+        tickers = list(dict.fromkeys(_split_tickers(item.get("tickers"))))
+        if not tickers:
+            raise ValueError(f"Carteira {item.get('nome') or i + 1} sem tickers")
+        carteiras.append({"nome": str(item.get("nome") or f"Carteira {i + 1}"), "tickers": tickers})
+    return carteiras
+
+
+def load_portfolios(path: str) -> List[Dict[str, Any]]:
+    """Lê carteiras de um arquivo YAML ou CSV.
+
+    Returns:
+        list: dicionários `{"nome": str, "tickers": list[str]}`.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".yaml", ".yml"):
+        if yaml is None:
+            raise RuntimeError("PyYAML não instalado: pip install pyyaml (ou use CSV)")
+        with open(path, encoding="utf-8") as fh:
+            data = yaml.safe_load(fh) or []
+        if isinstance(data, dict):
+            data = data.get("carteiras", [])
+        return _normalize(data)
+
+    if ext == ".csv":
+        with open(path, encoding="utf-8", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+        if rows and "ticker" in rows[0]:
+            # Formato longo: uma linha por ticker
+            grouped: Dict[str, List[str]] = {}
+            for row in rows:
+                grouped.setdefault(row.get("nome") or "Carteira", []).append(row["ticker"])
+            return _normalize([{"nome": n, "tickers": t} for n, t in grouped.items()])
+        return _normalize(rows)
+
+    raise ValueError(f"Formato de carteiras não suportado: {ext} (use .yaml, .yml ou .csv)")
+
+
+def prefetch(tickers: List[str], periodo: str, max_workers: Optional[int] = None) -> Dict[str, str]:
+    """Busca e calcula cada ticker uma única vez; retorna os erros por ticker."""
+    from core.prewarm import warm
+
+    max_workers = max_workers or int(os.getenv("BATCH_FETCH_WORKERS", "8"))
+    errors: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(warm, ticker, periodo): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as exc:
+                errors[futures[future]] = str(exc)
+    return errors
+
+
+def _run_portfolio(carteira: Dict[str, Any], periodo: str, llm_provider: str,
+                   mode: Optional[str] = None) -> Dict[str, Any]:
+    from core.orchestrator import analyze_multi_tickers_report
+
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"nome": carteira["nome"], "tickers": carteira["tickers"]}
+    try:
+        result.update(analyze_multi_tickers_report(
+            tickers=carteira["tickers"],
+            periodo=periodo,
+            user_question=f"Análise de dividendos - {carteira['nome']}",
+            # Um usuário por carteira: o limite de taxa vale por usuário
+            user_id=f"batch:{carteira['nome']}",
+            llm_provider=llm_provider,
+            include_pdf=False,
+            mode=mode,
+        ))
+        result["ok"] = True
+    except Exception as exc:
+        logging.error(f"Erro na análise de {carteira['nome']}: {exc}")
+        result["ok"] = False
+        result["erro"] = str(exc)
+    result["latency_s"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def run_batch(carteiras: List[Dict[str, Any]], periodo: str = "1y", llm_provider: str = "openai",
+              max_workers: Optional[int] = None, fetch_workers: Optional[int] = None,
+              mode: Optional[str] = None) -> Dict[str, Any]:
+    """Analisa várias carteiras: pré-carga deduplicada + análises concorrentes.
+
+    Args:
+        carteiras: lista de `{"nome", "tickers"}`.
+        periodo: período das análises.
+        llm_provider: provedor preferido do LLM.
+        max_workers: carteiras simultâneas (padrão `BATCH_WORKERS`).
+        fetch_workers: tickers simultâneos na pré-carga.
+        mode: "crew" ou "aggregate" (padrão `MULTI_TICKER_MODE`).
+
+    Returns:
+        dict: `carteiras` (na ordem de entrada: ranking, `report_key` do PDF,
+        latência e erro, se houver), `prefetch_s`, `prefetch_errors`,
+        `wall_s`, `tickers_unicos`, `tickers_pedidos`, `carteiras_por_min` e
+        `tickers_por_s`.
+    """
+    max_workers = max_workers or int(os.getenv("BATCH_WORKERS", "3"))
+    requested = [t for c in carteiras for t in c["tickers"]]
+    universe = list(dict.fromkeys(requested))
+    start = time.perf_counter()
+
+    with timed("batch_prefetch", tickers=len(universe)):
+        prefetch_errors = prefetch(universe, periodo, fetch_workers)
+    prefetch_s = time.perf_counter() - start
+
+    with timed("batch_portfolios", carteiras=len(carteiras)), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda c: _run_portfolio(c, periodo, llm_provider, mode), carteiras))
+
+    wall = time.perf_counter() - start
+    return {
+        "periodo": periodo,
+        "carteiras": results,
+        "tickers_pedidos": len(requested),
+        "tickers_unicos": len(universe),
+        "prefetch_s": round(prefetch_s, 2),
+        "prefetch_errors": prefetch_errors,
+        "wall_s": round(wall, 2),
+        "carteiras_por_min": round(len(carteiras) / wall * 60, 2) if wall else 0.0,
+        "tickers_por_s": round(len(requested) / wall, 2) if wall else 0.0,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Resumo legível do lote (latência por carteira e vazão)."""
+    lines = [
+        f"Tickers: {report['tickers_pedidos']} pedidos, {report['tickers_unicos']} únicos "
+        f"(pré-carga em {report['prefetch_s']}s, {len(report['prefetch_errors'])} falhas)",
+        "",
+        f"{'carteira':<28}{'tickers':>8}{'latência s':>12}  status",
+    ]
+    for r in report["carteiras"]:
+        status = "ok" if r["ok"] else f"erro: {r['erro'][:60]}"
+        lines.append(f"{r['nome'][:27]:<28}{len(r['tickers']):>8}{r['latency_s']:>12.2f}  {status}")
+    lines += [
+        "",
+        f"Total: {report['wall_s']}s | {report['carteiras_por_min']} carteiras/min | "
+        f"{report['tickers_por_s']} tickers/s",
+    ]
+    return "\n".join(lines)
@@ -3,13 +3,27 @@ Agente de ingestão de dados (DataLoader).
 
 Este módulo contém funções relacionadas à obtenção de dados da API
 brapi.dev. No fluxo simplificado, a ingestão é síncrona: buscamos o
-JSON da brapi e podemos armazenar no Redis sob a chave
-`rawdata:ticker:periodo` para reaproveitamento.
+JSON da brapi e podemos armazenar no Redis sob a chave versionada
+`rawdata:v<versão>:ticker:periodo` (`utils/cache_keys.py`) para
+reaproveitamento.  Gravar dados brutos diferentes dos anteriores invalida
+as métricas, insights e recomendações derivados deles.
 
 Para testes locais, chame `fetch_brapi_data` diretamente.
+
+Gravação e replay (benchmarks offline):
+
+    BRAPI_RECORD_DIR=benchmarks/recordings  grava cada resposta real em JSON
+    BRAPI_REPLAY_DIR=benchmarks/recordings  responde a partir dos arquivos
+                                            gravados, sem acessar a rede
+
+Dados sintéticos: `FAKE_DATA=1` responde cada URL com o gerador de
+`core/synthetic_data.py` (mesmo caminho de código, inclusive o fallback de
+histórico); `BRAPI_BASE_URL` aponta para outro servidor, por exemplo o
+stand-in HTTP `python -m core.synthetic_data`.
 """
+import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import requests
 try:
@@ -17,12 +31,19 @@ try:
 except ImportError:
     load_dotenv = None  # type: ignore
 
+from utils import cache_keys
 from utils.cache import get_redis_connection
+from utils.telemetry import timed, timed_fn
 
 if load_dotenv:
     load_dotenv()
 
 
+def brapi_base_url() -> str:
+    """URL base da API (padrão https://brapi.dev; ver `BRAPI_BASE_URL`)."""
+    return os.getenv("BRAPI_BASE_URL", "https://brapi.dev").rstrip("/")
+
+
 def build_brapi_url(ticker: str, periodo: str) -> str:
     """Monta a URL para a API brapi.dev com parâmetros de interesse.
 
@@ -31,7 +52,7 @@ def build_brapi_url(ticker: str, periodo: str) -> str:
     dividendos, respectivamente.  Ajuste conforme as necessidades do
     projeto (ex.: adicionar módulos via parâmetro `modules`).
     """
-    base_url = f"https://brapi.dev/api/quote/{ticker}"
+    base_url = f"{brapi_base_url()}/api/quote/{ticker}"
     params = {
         "range": periodo,
         "fundamental": "true",
@@ -50,7 +71,7 @@ def build_brapi_history_url(ticker: str, periodo: str) -> str:
 
     Ex.: https://brapi.dev/api/quote/PETR4?range=1y
     """
-    base_url = f"https://brapi.dev/api/quote/{ticker}"
+    base_url = f"{brapi_base_url()}/api/quote/{ticker}"
     params = {
         "range": periodo,
     }
@@ -61,6 +82,35 @@ def build_brapi_history_url(ticker: str, periodo: str) -> str:
     return f"{base_url}?{query}"
 
 
+def recording_path(directory: str, ticker: str, periodo: str) -> str:
+    """Caminho do payload gravado para `ticker`/`periodo` em `directory`."""
+    return os.path.join(directory, f"{ticker.upper()}_{periodo}.json")
+
+
+def _record(ticker: str, periodo: str, data: Dict[str, Any]) -> None:
+    directory = os.getenv("BRAPI_RECORD_DIR")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(recording_path(directory, ticker, periodo), "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False)
+
+
+def _get_json(url: str, headers: Dict[str, str]) -> Dict[str, Any]:
+    """GET na brapi; com `FAKE_DATA=1` responde com o gerador sintético."""
+    if os.getenv("FAKE_DATA") == "1":
+        from core.synthetic_data import SyntheticHTTPError, respond
+
+        try:
+            return respond(url)
+        except SyntheticHTTPError as exc:
+            raise requests.HTTPError(str(exc)) from exc
+    resp = requests.get(url, headers=headers)
+    resp.raise_for_status()
+    return resp.json()
+
+
+@timed_fn("brapi_fetch")
 def fetch_brapi_data(ticker: str, periodo: str) -> Dict[str, Any]:
     """Faz uma requisição HTTP à brapi.dev e retorna o JSON.
 
@@ -74,29 +124,21 @@ def fetch_brapi_data(ticker: str, periodo: str) -> Dict[str, Any]:
     Returns:
         dict: resposta JSON da brapi
     """
-    # Modo fake para bootcamp/testes offline
-    if os.getenv("FAKE_DATA") == "1":
-        return {
-            "results": [
-                {
-                    "historicalDataPrice": [
-                        {"close": 10.0},
-                        {"close": 10.2},
-                        {"close": 10.1},
-                        {"close": 10.5},
-                    ]
-                }
-            ]
-        }
+    # Replay de payloads gravados (benchmarks e testes de carga offline)
+    replay_dir = os.getenv("BRAPI_REPLAY_DIR")
+    if replay_dir:
+        path = recording_path(replay_dir, ticker, periodo)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Payload gravado não encontrado para {ticker} ({periodo}): {path}")
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
     url = build_brapi_url(ticker, periodo)
     # Headers para evitar erro 417 (Expectation Failed)
     headers = {
         'User-Agent': 'FinanceAdvisor/1.0',
         'Accept': 'application/json',
     }
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
-    data = resp.json()
+    data = _get_json(url, headers)
     # Se a resposta não contém série histórica, tenta o endpoint /history e injeta em results[0]
     try:
         result0 = data.get("results", [])[0]
@@ -108,19 +150,45 @@ def fetch_brapi_data(ticker: str, periodo: str) -> Dict[str, Any]:
         has_history = isinstance(series, list) and len(series) > 0
     if not has_history:
         hurl = build_brapi_history_url(ticker, periodo)
-        hresp = requests.get(hurl, headers=headers)
-        hresp.raise_for_status()
-        hjson = hresp.json() or {}
-        prices = hjson.get("prices") or hjson.get("historicalDataPrice") or []
+        with timed("brapi_fetch_history"):
+            hjson = _get_json(hurl, headers) or {}
+        # O endpoint de cotação devolve o histórico dentro de results[0]
+        hresults = hjson.get("results") or [{}]
+        hresult0 = hresults[0] if isinstance(hresults[0], dict) else {}
+        prices = (
+            hjson.get("prices") or hjson.get("historicalDataPrice")
+            or hresult0.get("historicalDataPrice") or hresult0.get("prices") or []
+        )
         if isinstance(result0, dict):
             result0["prices"] = prices
         elif isinstance(data.get("results"), list) and data["results"]:
             data["results"][0] = {"prices": prices}
         else:
             data = {"results": [{"prices": prices}]}
+    _record(ticker, periodo, data)
     return data
 
 
+def fetch_brapi_list(limit: int = 500) -> List[Dict[str, Any]]:
+    """Lista as ações negociadas na B3 (endpoint `/api/quote/list`), por volume.
+
+    Returns:
+        list: itens com `stock`, `name`, `close`, `volume`, `sector`...
+    """
+    params = {"type": "stock", "sortBy": "volume", "sortOrder": "desc", "limit": str(limit)}
+    token = os.getenv("BRAPI_TOKEN")
+    if token:
+        params["token"] = token
+    query = "&".join([f"{k}={v}" for k, v in params.items()])
+    headers = {
+        'User-Agent': 'FinanceAdvisor/1.0',
+        'Accept': 'application/json',
+    }
+    with timed("brapi_list"):
+        data = _get_json(f"{brapi_base_url()}/api/quote/list?{query}", headers)
+    return data.get("stocks") or []
+
+
 def enqueue_ingestion(ticker: str, periodo: str) -> None:
     """Mantido por compatibilidade: não faz nada no fluxo síncrono."""
     return None
@@ -137,9 +205,25 @@ def get_rawdata_from_cache(ticker: str, periodo: str):
         dict ou None: JSON se presente no cache ou None caso contrário.
     """
     r = get_redis_connection()
-    key = f"rawdata:{ticker}:{periodo}"
+    key = cache_keys.key("rawdata", ticker, periodo)
     data = r.get(key)
     if data:
-        import json
         return json.loads(data)
-    return None
\ No newline at end of file
+    return None
+
+
+def store_rawdata_in_cache(ticker: str, periodo: str, data: Dict[str, Any], r: Any = None) -> List[str]:
+    """Grava os dados brutos e, se o conteúdo mudou, invalida os derivados.
+
+    Returns:
+        list: chaves invalidadas (métricas, insights, recomendação e
+        dependentes registrados), vazia se os dados não mudaram.
+    """
+    r = r or get_redis_connection()
+    payload = json.dumps(data, ensure_ascii=False)
+    r.set(cache_keys.key("rawdata", ticker, periodo), payload, ex=cache_keys.ttl("rawdata"))
+    # Só `results` conta: metadados como `requestedAt` mudam a cada resposta
+    fingerprint = json.dumps(data.get("results"), sort_keys=True)
+    if cache_keys.content_changed("rawdata", ticker, periodo, fingerprint, r=r):
+        return cache_keys.invalidate("rawdata", ticker, periodo, r=r)
+    return []
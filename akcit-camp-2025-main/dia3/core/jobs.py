@@ -0,0 +1,261 @@
+"""
+Análises em segundo plano, com resultado em cache.
+
+No Streamlit, qualquer interação reexecuta o script inteiro: a análise
+(minutos de LLM) prendia o rerun e o resultado se perdia ao trocar um
+widget.  Aqui a análise vira um job:
+
+* a identidade do job é `(tickers ordenados, periodo, llm_provider)`, de
+  modo que a mesma pergunta sempre cai no mesmo job (`kind="single"`
+  identifica a análise completa de um ticker, `orchestrator.analyze`; na
+  análise agregada, a pergunta do usuário também faz parte dela);
+* o resultado (`resposta`, `ranking`, `report_key`) fica no Redis em
+  `analysis:{id}` por `ANALYSIS_TTL`, compartilhado entre sessões e
+  réplicas; o PDF já está em `report:{sha256}` (`core/reports.py`).  O
+  resultado é registrado como dependente das métricas de cada ticker
+  (`utils/cache_keys.py`): dados novos de um deles o invalidam;
+* enquanto roda, o job executa em uma thread daemon e o estado
+  (`running`/`done`/`error`) fica em `job:{id}`; pedidos repetidos do
+  mesmo job, na mesma ou em outra sessão, não disparam nova análise; entre
+  processos (réplicas, workers do Uvicorn) a trava `job:{id}:lock`
+  (SET NX) garante uma única execução;
+* cada processo limita as análises simultâneas por provedor de LLM; os
+  excedentes esperam na fila com `queued: true` no estado;
+* o progresso real da Crew (`core/progress.py`) é resumido em
+  `job:{id}:progress`: tarefas concluídas/total, tarefa atual, etapa de
+  cada ticker, tokens e os últimos eventos.
+
+Uso::
+
+    job_id = submit(["PETR4", "VALE3"], "1y", "openai")
+    status(job_id)   # {"state": "running", "progress": {...}} ... {"state": "done", "result": {...}}
+
+Variáveis de ambiente:
+
+    ANALYSIS_TTL=21600          validade (s) do resultado de uma análise (6h)
+    JOB_LOCK_TTL=1800           validade (s) da trava de execução entre processos
+    LLM_CONCURRENCY=4           análises simultâneas por provedor, por processo
+    LLM_CONCURRENCY_<PROVEDOR>  limite de um provedor (ex.: LLM_CONCURRENCY_GEMINI=2)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils import cache_keys
+from utils.cache import get_redis_connection
+
+RUNNING, DONE, ERROR = "running", "done", "error"
+MULTI, SINGLE, AGGREGATE = "multi", "single", "aggregate"
+
+_threads: Dict[str, threading.Thread] = {}
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_lock = threading.Lock()
+
+
+def job_id(tickers: Iterable[str], periodo: str, llm_provider: str, kind: str = MULTI,
+           question: Optional[str] = None) -> str:
+    """Identificador estável do job (independe da ordem dos tickers).
+
+    Na análise agregada a pergunta vai para o prompt do LLM, então ela
+    (normalizada) também identifica o job: outra pergunta, outra resposta.
+    """
+    parts: list = [sorted(t.upper() for t in tickers), periodo, llm_provider]
+    if kind != MULTI:
+        parts.append(kind)
+    if kind == AGGREGATE and question and question.strip():
+        parts.append(" ".join(question.lower().split()))
+    key = json.dumps(parts)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _provider_slots(llm_provider: str) -> threading.BoundedSemaphore:
+    """Semáforo que limita as análises simultâneas de um provedor neste processo."""
+    with _lock:
+        slots = _slots.get(llm_provider)
+        if slots is None:
+            limit = os.getenv(f"LLM_CONCURRENCY_{llm_provider.upper()}") or os.getenv("LLM_CONCURRENCY", "4")
+            slots = _slots[llm_provider] = threading.BoundedSemaphore(max(1, int(limit)))
+        return slots
+
+
+def _ttl() -> int:
+    return int(os.getenv("ANALYSIS_TTL", "21600"))
+
+
+def _lock_ttl() -> int:
+    return int(os.getenv("JOB_LOCK_TTL", "1800"))
+
+
+def _set_state(jid: str, state: Dict[str, Any]) -> None:
+    get_redis_connection().set(f"job:{jid}", json.dumps(state, ensure_ascii=False), ex=_ttl())
+
+
+def cached_result(jid: str) -> Optional[Dict[str, Any]]:
+    """Resultado já calculado do job, se houver (sem os bytes do PDF)."""
+    raw = get_redis_connection().get(f"analysis:{jid}")
+    return json.loads(raw) if raw else None
+
+
+def progress(jid: str) -> Optional[Dict[str, Any]]:
+    """Último resumo de progresso do job, se houver."""
+    raw = get_redis_connection().get(f"job:{jid}:progress")
+    return json.loads(raw) if raw else None
+
+
+def _progress_recorder(jid: str, tickers: list) -> Callable[[Dict[str, Any]], None]:
+    """Callback `on_progress` que mantém o resumo do job no Redis."""
+    snapshot: Dict[str, Any] = {
+        "tasks_done": 0, "total_tasks": 0, "current": None, "tokens": 0, "elapsed_s": 0.0,
+        "stages": {ticker: {} for ticker in tickers}, "events": [],
+    }
+
+    def on_progress(event: Dict[str, Any]) -> None:
+        kind = event["type"]
+        snapshot["total_tasks"] = event.get("total_tasks", snapshot["total_tasks"])
+        snapshot["tokens"] = event.get("tokens_total", snapshot["tokens"])
+        snapshot["elapsed_s"] = event.get("elapsed_s", snapshot["elapsed_s"])
+        # Etapas sem ticker (ranking, relatório) ficam na linha "todos"
+        stages = snapshot["stages"].setdefault(event.get("ticker") or "todos", {})
+        if kind == "task_started":
+            snapshot["current"] = {k: event.get(k) for k in ("task_index", "agent", "ticker", "stage")}
+            stages[event["stage"]] = "running"
+        elif kind == "task_finished":
+            snapshot["tasks_done"] += 1
+            stages[event["stage"]] = "done"
+        elif kind == "crew_finished":
+            snapshot["current"] = None
+        if kind in ("task_started", "task_finished", "tool_called"):
+            brief = {k: event[k] for k in ("type", "agent", "tool", "duration_s", "tokens", "elapsed_s") if k in event}
+            snapshot["events"] = (snapshot["events"] + [brief])[-10:]
+        get_redis_connection().set(f"job:{jid}:progress", json.dumps(snapshot, ensure_ascii=False), ex=_ttl())
+
+    return on_progress
+
+
+def _analyze(jid: str, kind: str, tickers: list, periodo: str, llm_provider: str, user_id: str,
+             question: Optional[str]) -> Dict[str, Any]:
+    from core.orchestrator import AGGREGATE_MODE, CREW_MODE, analyze, analyze_multi_tickers_report
+
+    on_progress = _progress_recorder(jid, tickers)
+    if kind == SINGLE:
+        resposta = analyze(
+            ticker=tickers[0],
+            periodo=periodo,
+            user_question=question or f"Análise de dividendos de {tickers[0]}",
+            user_id=user_id,
+            llm_provider=llm_provider,
+            on_progress=on_progress,
+        )
+        return {"resposta": resposta}
+    result = analyze_multi_tickers_report(
+        tickers=tickers,
+        periodo=periodo,
+        user_question=question or f"Análise comparativa de {', '.join(tickers)}",
+        user_id=user_id,
+        llm_provider=llm_provider,
+        include_pdf=False,
+        on_progress=on_progress,
+        mode=AGGREGATE_MODE if kind == AGGREGATE else CREW_MODE,
+    )
+    result.pop("pdf", None)
+    return result
+
+
+def _run(jid: str, kind: str, tickers: list, periodo: str, llm_provider: str, user_id: str,
+         question: Optional[str] = None) -> None:
+    started = time.time()
+    try:
+        with _provider_slots(llm_provider):
+            started = time.time()
+            _set_state(jid, {"state": RUNNING, "started_at": started})
+            result = _analyze(jid, kind, tickers, periodo, llm_provider, user_id, question)
+        r = get_redis_connection()
+        r.set(f"analysis:{jid}", json.dumps(result, ensure_ascii=False), ex=_ttl())
+        # Métricas novas de qualquer ticker invalidam este resultado
+        for ticker in tickers:
+            cache_keys.add_dependent(cache_keys.key("metrics", ticker, periodo), f"analysis:{jid}", r=r)
+        _set_state(jid, {"state": DONE, "started_at": started, "finished_at": time.time()})
+    except Exception as exc:
+        logging.error(f"Job de análise {jid} falhou: {exc}")
+        _set_state(jid, {"state": ERROR, "error": str(exc), "started_at": started, "finished_at": time.time()})
+    finally:
+        get_redis_connection().delete(f"job:{jid}:lock")
+        with _lock:
+            _threads.pop(jid, None)
+
+
+def submit(tickers: Iterable[str], periodo: str, llm_provider: str, user_id: str = "anon",
+           force: bool = False, kind: str = MULTI, question: Optional[str] = None) -> str:
+    """Inicia a análise em segundo plano (ou reaproveita o job/resultado existente).
+
+    Args:
+        force (bool): ignora o resultado em cache e analisa de novo.
+        kind (str): "multi" (comparação com PDF), "aggregate" (comparação
+            com PDF em uma chamada ao LLM) ou "single" (análise completa de
+            um ticker).
+        question (str): pergunta do usuário repassada ao orquestrador.
+
+    Returns:
+        str: identificador do job, para consultar com `status`.
+    """
+    tickers = [t.upper() for t in tickers]
+    jid = job_id(tickers, periodo, llm_provider, kind, question)
+    with _lock:
+        if jid in _threads:
+            return jid
+        if not force and cached_result(jid) is not None:
+            return jid
+        r = get_redis_connection()
+        # Outro processo já executa este job: basta acompanhar o estado
+        if not r.set(f"job:{jid}:lock", str(os.getpid()), nx=True, ex=_lock_ttl()):
+            return jid
+        _set_state(jid, {"state": RUNNING, "queued": True, "started_at": time.time()})
+        r.delete(f"job:{jid}:progress")
+        thread = threading.Thread(target=_run, args=(jid, kind, tickers, periodo, llm_provider, user_id, question),
+                                  name=f"analysis-{jid[:8]}", daemon=True)
+        _threads[jid] = thread
+        thread.start()
+    return jid
+
+
+def _abandoned(r: Any, jid: str, elapsed: float) -> bool:
+    """Job em `running` sem ninguém executando (o processo dono morreu).
+
+    A trava só é apagada depois do estado final; sem ela (ou passada a
+    validade dela) e com o estado ainda em `running`, o job não termina mais.
+    """
+    if r.exists(f"job:{jid}:lock") and elapsed <= _lock_ttl():
+        return False
+    raw = r.get(f"job:{jid}")
+    return bool(raw) and json.loads(raw).get("state") == RUNNING
+
+
+def status(jid: str) -> Dict[str, Any]:
+    """Estado do job: `state` (running/done/error), `progress` enquanto roda,
+    `result` quando pronto, `error` se falhou; "unknown" se não existe ou
+    se o resultado foi invalidado."""
+    result = cached_result(jid)
+    r = get_redis_connection()
+    raw = r.get(f"job:{jid}")
+    state = json.loads(raw) if raw else {}
+    # Um erro mais recente (ex.: reexecução forçada) prevalece sobre o resultado antigo
+    if result is not None and state.get("state") not in (RUNNING, ERROR):
+        return {**state, "state": DONE, "result": result}
+    # Sem estado, ou "done" com o resultado já invalidado (dados novos) ou expirado
+    if not state or state.get("state") == DONE:
+        return {"state": "unknown"}
+    if state.get("state") == RUNNING:
+        with _lock:
+            alive = jid in _threads
+        elapsed = time.time() - state.get("started_at", time.time())
+        if not alive and _abandoned(r, jid, elapsed):
+            return {**state, "state": ERROR, "local": False,
+                    "error": "A análise foi interrompida (o processo que a executava foi encerrado)."}
+        state["elapsed_s"] = round(elapsed, 1)
+        state["local"] = alive
+        state["progress"] = progress(jid)
+    return state
@@ -0,0 +1,129 @@
+"""
+Métricas de dividendos sem LLM.
+
+Para saber só o dividend yield de um ticker era preciso subir a Crew de
+quatro agentes, embora `calc_metrics_from_raw` seja Python puro.  Aqui o
+caminho é direto:
+
+    metrics:v*:{ticker}:{periodo}  ->  rawdata:v*:{ticker}:{periodo}  ->  brapi
+          (cache)                        (calcula e grava)             (busca, grava e calcula)
+
+Com o cache quente, `get_metrics` é um GET no Redis (poucos milissegundos)
+e `get_metrics_many` um único MGET para N tickers.  Os tickers que faltam
+são resolvidos em paralelo e as métricas novas gravadas em um pipeline
+(`store_metrics_many`), que também atualiza os índices de ranking.
+Buscas simultâneas do mesmo `(ticker, periodo)` na brapi são coalescidas
+no processo: a segunda thread espera o resultado da primeira.
+
+Uso::
+
+    from core.metrics import get_metrics, get_metrics_many
+    get_metrics("PETR4", "1y")                   # {"dividend_yield": 10.87, ...}
+    get_metrics_many(["PETR4", "VALE3"], "1y")   # {"PETR4": {...}, "VALE3": {...}}
+
+Variáveis de ambiente:
+
+    METRICS_FETCH_WORKERS=8   tickers buscados simultaneamente na brapi
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+
+from utils import cache_keys
+from utils.cache import get_redis_connection
+from utils.telemetry import timed
+
+# (ticker, periodo) -> busca em andamento na brapi
+_inflight: Dict[Tuple[str, str], "Future[Dict[str, float]]"] = {}
+_lock = threading.Lock()
+
+
+def _fetch_and_calc(ticker: str, periodo: str) -> Dict[str, float]:
+    """Busca na brapi, grava `rawdata:` e calcula, coalescendo buscas simultâneas."""
+    from core.data_loader import fetch_brapi_data, store_rawdata_in_cache
+    from core.metrics_calculator import calc_metrics_from_raw
+
+    key = (ticker, periodo)
+    with _lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        data = fetch_brapi_data(ticker, periodo)
+        store_rawdata_in_cache(ticker, periodo, data)
+        metrics = calc_metrics_from_raw(data)
+        future.set_result(metrics)
+        return metrics
+    except Exception as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def get_metrics_many(tickers: Iterable[str], periodo: str) -> Dict[str, Dict[str, Any]]:
+    """Métricas de vários tickers: cache, depois dados brutos em cache, depois brapi.
+
+    Tickers que falharem na brapi ficam de fora do resultado (o erro vai
+    para o log).
+
+    Returns:
+        dict: ticker -> métricas, na ordem dos tickers pedidos.
+    """
+    from core.metrics_calculator import calc_metrics_from_raw, store_metrics_many
+
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if not tickers:
+        return {}
+    with timed("get_metrics", tickers=len(tickers)):
+        r = get_redis_connection()
+        found: Dict[str, Dict[str, Any]] = {}
+        for ticker, value in zip(tickers, r.mget([cache_keys.key("metrics", t, periodo) for t in tickers])):
+            if value:
+                found[ticker] = json.loads(value)
+        missing = [t for t in tickers if t not in found]
+        if not missing:
+            return found
+
+        computed: Dict[str, Dict[str, float]] = {}
+        to_fetch: List[str] = []
+        for ticker, raw in zip(missing, r.mget([cache_keys.key("rawdata", t, periodo) for t in missing])):
+            if raw:
+                computed[ticker] = calc_metrics_from_raw(json.loads(raw))
+            else:
+                to_fetch.append(ticker)
+
+        if to_fetch:
+            workers = min(len(to_fetch), int(os.getenv("METRICS_FETCH_WORKERS", "8")))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {t: pool.submit(_fetch_and_calc, t, periodo) for t in to_fetch}
+            for ticker, future in futures.items():
+                try:
+                    computed[ticker] = future.result()
+                except Exception as exc:
+                    logging.warning(f"Métricas de {ticker} ({periodo}) indisponíveis: {exc}")
+
+        store_metrics_many(periodo, computed)
+        found.update(computed)
+        return {t: found[t] for t in tickers if t in found}
+
+
+def get_metrics(ticker: str, periodo: str) -> Dict[str, Any]:
+    """Métricas de um ticker, sem LLM.
+
+    Raises:
+        LookupError: se os dados do ticker não puderem ser obtidos.
+    """
+    ticker = ticker.upper()
+    metrics = get_metrics_many([ticker], periodo)
+    if ticker not in metrics:
+        raise LookupError(f"Não foi possível obter as métricas de {ticker} ({periodo})")
+    return metrics[ticker]
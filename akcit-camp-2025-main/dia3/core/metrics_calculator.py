@@ -12,7 +12,8 @@ volatilidade sobre uma série de preços de fechamento.  Você pode
 adicionar outras métricas (CAGR, margem bruta, ROE, etc.) conforme
 necessário.  O resultado é armazenado no Redis para reaproveitamento.
 """
-from typing import Any, Dict, List
+import math
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 
 try:
@@ -22,7 +23,9 @@ except Exception:
     np = None  # type: ignore
     pd = None  # type: ignore
 
+from utils import cache_keys
 from utils.cache import get_redis_connection
+from utils.telemetry import timed_fn
 
 
 def _extract_dividends(brapi_result: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -88,6 +91,25 @@ def _calculate_dividend_yield(brapi_result: Dict[str, Any]) -> float:
     return round(dividend_yield, 2)
 
 
+def _calculate_volatility(brapi_result: Dict[str, Any]) -> float:
+    """Volatilidade anualizada (%) dos retornos diários de fechamento.
+
+    Usa `historicalDataPrice` (ou `prices`, preenchido pelo fallback de
+    histórico).  Retorna 0.0 quando há menos de três fechamentos válidos.
+    """
+    series = brapi_result.get("historicalDataPrice") or brapi_result.get("prices") or []
+    closes = [float(p["close"]) for p in series if isinstance(p, dict) and p.get("close")]
+    if len(closes) < 3:
+        return 0.0
+    returns = [math.log(b / a) for a, b in zip(closes, closes[1:]) if a > 0 and b > 0]
+    if len(returns) < 2:
+        return 0.0
+    mean = sum(returns) / len(returns)
+    variance = sum((r - mean) ** 2 for r in returns) / (len(returns) - 1)
+    return round(math.sqrt(variance) * math.sqrt(252) * 100, 2)
+
+
+@timed_fn("metrics_compute")
 def calc_metrics_from_raw(data_json: Dict[str, Any]) -> Dict[str, float]:
     """Calcula métricas simples a partir do JSON da brapi.
 
@@ -147,22 +169,46 @@ def calc_metrics_from_raw(data_json: Dict[str, Any]) -> Dict[str, float]:
         "preco_atual": float(current_price),
         "dividendos_12m": round(total_dividends_12m, 2),
         "quantidade_pagamentos": float(dividend_count),
+        "volatilidade": _calculate_volatility(result0),
     }
 
 
-def store_metrics_in_cache(ticker: str, periodo: str, metrics: Dict[str, float], ttl: int = 86400) -> None:
+def store_metrics_in_cache(ticker: str, periodo: str, metrics: Dict[str, float], ttl: Optional[int] = None) -> None:
     """Armazena métricas no Redis para uso futuro.
 
+    Além da chave `metrics:v<versão>:{ticker}:{periodo}`, atualiza os índices de
+    ranking por período (`core/ranking_index.py`), usados para top-N,
+    faixas de dividend yield e ranking de subconjuntos.
+
     Args:
         ticker (str): código do ativo.
         periodo (str): intervalo analisado.
         metrics (dict): dicionário com métricas calculadas.
-        ttl (int): tempo de vida em segundos (default 24h).
+        ttl (int): tempo de vida em segundos (padrão `CACHE_TTL_METRICS`).
     """
     import json
+    from core.ranking_index import index_metrics
+
+    r = get_redis_connection()
+    key = cache_keys.key("metrics", ticker, periodo)
+    r.set(key, json.dumps(metrics), ex=ttl or cache_keys.ttl("metrics"))
+    index_metrics(ticker, periodo, metrics, r=r)
+
+
+def store_metrics_many(periodo: str, metrics_by_ticker: Dict[str, Dict[str, float]], ttl: Optional[int] = None) -> None:
+    """Versão em lote de `store_metrics_in_cache`: um único pipeline para N tickers."""
+    import json
+    from core.ranking_index import queue_index
+
+    if not metrics_by_ticker:
+        return
+    ttl = ttl or cache_keys.ttl("metrics")
     r = get_redis_connection()
-    key = f"metrics:{ticker}:{periodo}"
-    r.set(key, json.dumps(metrics), ex=ttl)
+    pipe = r.pipeline()
+    for ticker, metrics in metrics_by_ticker.items():
+        pipe.set(cache_keys.key("metrics", ticker, periodo), json.dumps(metrics), ex=ttl)
+        queue_index(pipe, ticker, periodo, metrics)
+    pipe.execute()
 
 
 def enqueue_metrics_calculation(ticker: str, periodo: str) -> None:
@@ -21,41 +21,113 @@ contexto relevante nas próximas interações.
 
 Uso típico::
 
-    from agents.orchestrator import analyze
+    from core.orchestrator import analyze, init_observability
+    init_observability()  # opcional: Langfuse, traces e métricas
     resposta = analyze("PETR4", "1y", "Analise a empresa PETR4", user_id="alice")
     print(resposta)
 
+A análise de vários tickers tem dois modos (`mode`, padrão em
+`MULTI_TICKER_MODE`):
+
+* `crew`: a Crew completa, com tarefas de dados e métricas por ticker,
+  ranking e PDF (2N+2 tarefas de LLM);
+* `aggregate`: métricas e ranking calculados sem LLM e uma única chamada
+  ao analista, que recebe a tabela compacta de todos os tickers e escreve
+  a análise comparativa (custo de LLM constante por carteira).
+
 Para aplicações reais, você pode integrar esta função com um
 framework web (FastAPI, Flask, etc.) ou CLI para receber as
 solicitações do usuário.
 """
 import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 try:
     from dotenv import load_dotenv  # type: ignore
 except ImportError:
     load_dotenv = None  # type: ignore
 
+from core.prewarm import record_requests
+from core.progress import ProgressCallback, ProgressTracker, iter_events
 from utils.cache import check_rate_limit
-from crew.crew import create_finance_crew, create_multi_ticker_crew
-from utils.langfuse_client import init_langfuse
-from openinference.instrumentation.crewai import CrewAIInstrumentor
-from openinference.instrumentation.litellm import LiteLLMInstrumentor
+from utils.telemetry import dump_json, start_metrics_server, timed
+from utils import tracing
 
 # Carrega variáveis do .env se a biblioteca estiver disponível
 if load_dotenv:
     load_dotenv()
 
-# Inicializa Langfuse para tracing e observabilidade
-langfuse_client = init_langfuse()
+# Modos da análise multi-ticker
+CREW_MODE, AGGREGATE_MODE = "crew", "aggregate"
+MULTI_TICKER_MODES = (CREW_MODE, AGGREGATE_MODE)
+
+# Cliente Langfuse; permanece None até `init_observability()` ser chamado
+langfuse_client = None
+_observability_ready = False
+_observability_lock = threading.Lock()
+
+
+def init_observability() -> None:
+    """Inicializa Langfuse, instrumentação, exportação de traces e métricas.
+
+    Antes isso acontecia no import deste módulo, que puxava crewai, os
+    instrumentadores do openinference e o cliente Langfuse a cada rerun do
+    Streamlit ou partida a frio de um worker.  Agora é um gancho explícito
+    e idempotente: chame uma vez na inicialização da aplicação (ver
+    `app.py` e `main.py`).  As funções `analyze*` funcionam sem ele, apenas
+    sem tracing do Langfuse.
+    """
+    global langfuse_client, _observability_ready
+    with _observability_lock:
+        if _observability_ready:
+            return
+        from utils.langfuse_client import init_langfuse
+
+        # Inicializa Langfuse para tracing e observabilidade
+        langfuse_client = init_langfuse()
+
+        # Somente instrumenta se o Langfuse estiver disponível
+        if langfuse_client:
+            from openinference.instrumentation.crewai import CrewAIInstrumentor
+            from openinference.instrumentation.litellm import LiteLLMInstrumentor
+
+            CrewAIInstrumentor().instrument(skip_dep_check=True)
+            LiteLLMInstrumentor().instrument()
+
+        # Exportação de spans em lote e em segundo plano (Langfuse e/ou TRACE_FILE)
+        tracing.configure(langfuse_client)
 
-# Somente instrumenta se o Langfuse estiver disponível
-if langfuse_client:
-    CrewAIInstrumentor().instrument(skip_dep_check=True)
-    LiteLLMInstrumentor().instrument()
+        # Endpoint local de métricas por etapa (somente se METRICS_PORT estiver definido)
+        start_metrics_server()
+        _observability_ready = True
 
 
-def analyze(ticker: str, periodo: str, user_question: str, user_id: str = "anon", llm_provider: str = "gemini") -> str:
+def _run_crew(crew: Any, trace_name: str, tickers: List[str],
+              on_progress: Optional[ProgressCallback] = None) -> Any:
+    """Executa a Crew (no span do Langfuse, se houver) emitindo eventos de progresso."""
+    tracker = ProgressTracker(crew, on_progress, tickers)
+    tracker.started()
+    if langfuse_client:
+        with langfuse_client.start_as_current_span(name=trace_name):
+            result = crew.kickoff()
+    else:
+        result = crew.kickoff()
+    tracker.finished()
+    return result
+
+
+def _export_metrics() -> None:
+    """Atualiza METRICS_JSON_PATH; uma falha na exportação nunca derruba a análise."""
+    try:
+        dump_json()
+    except Exception as exc:
+        logging.warning(f"Falha ao exportar métricas em JSON: {exc}")
+
+
+def analyze(ticker: str, periodo: str, user_question: str, user_id: str = "anon", llm_provider: str = "gemini",
+            on_progress: Optional[ProgressCallback] = None) -> str:
     """Executa a análise completa para uma ação e período usando CrewAI.
 
     Este método orquestra todo o fluxo através da CrewAI: aplica rate limiting
@@ -70,6 +142,8 @@ def analyze(ticker: str, periodo: str, user_question: str, user_id: str = "anon"
         user_id (str): identificador único do usuário para
             rate limiting.
         llm_provider (str): "gemini" (padrão) ou "openai" para escolher o LLM.
+        on_progress (callable): recebe os eventos de progresso da Crew
+            (ver `core/progress.py`).
 
     Returns:
         str: resposta combinando insights e recomendação gerados pela Crew.
@@ -77,40 +151,152 @@ def analyze(ticker: str, periodo: str, user_question: str, user_id: str = "anon"
     Raises:
         Exception: se exceder o limite de taxa ou se a Crew falhar.
     """
-    # Verifica limite de requisições
-    check_rate_limit(user_id)
+    with tracing.span("analyze", ticker=ticker, periodo=periodo, llm_provider=llm_provider):
+        # Verifica limite de requisições
+        with timed("rate_limit"):
+            check_rate_limit(user_id)
 
-    logging.info(f"Processando solicitação para {ticker} no período {periodo}")
-    print(f"Processando solicitação para {ticker} no período {periodo}")
+        # Frequência de pedidos alimenta o pré-aquecimento (core/prewarm.py)
+        record_requests([ticker], periodo)
 
-    # Cria e executa a Crew - AGENTES FAZEM TODO O TRABALHO
-    try:
-        crew = create_finance_crew(ticker, periodo, llm_provider)
+        logging.info(f"Processando solicitação para {ticker} no período {periodo}")
+        print(f"Processando solicitação para {ticker} no período {periodo}")
+
+        # Cria e executa a Crew - AGENTES FAZEM TODO O TRABALHO
+        try:
+            with timed("crew_build", crew="finance"):
+                # Import tardio: crewai só é carregado na primeira análise
+                from crew.crew import create_finance_crew
+                crew = create_finance_crew(ticker, periodo, llm_provider)
         
-        if langfuse_client:
-            with langfuse_client.start_as_current_span(name="finance-crew-trace"):
-                result = crew.kickoff()
-        else:
-            result = crew.kickoff()
+            with timed("crew_kickoff", crew="finance"):
+                result = _run_crew(crew, "finance-crew-trace", [ticker], on_progress)
         
-        # O resultado pode ser string ou objeto CrewOutput
-        if hasattr(result, 'raw'):
-            resposta = str(result.raw)
-        else:
-            resposta = str(result)
+            # O resultado pode ser string ou objeto CrewOutput
+            if hasattr(result, 'raw'):
+                resposta = str(result.raw)
+            else:
+                resposta = str(result)
             
-    except Exception as e:
-        logging.error(f"Erro ao executar Crew: {e}")
-        raise Exception(f"Falha na análise via CrewAI: {e}")
-    
-    if langfuse_client:
-        langfuse_client.flush()
+        except Exception as e:
+            logging.error(f"Erro ao executar Crew: {e}")
+            raise Exception(f"Falha na análise via CrewAI: {e}")
 
+    # Exportação em segundo plano: não soma latência à resposta
+    tracing.flush_async()
+
+    _export_metrics()
     return resposta
 
 
+def multi_ticker_mode(mode: Optional[str] = None) -> str:
+    """Modo efetivo da análise multi-ticker (`mode` ou `MULTI_TICKER_MODE`, padrão "crew")."""
+    mode = mode or os.getenv("MULTI_TICKER_MODE", CREW_MODE)
+    if mode not in MULTI_TICKER_MODES:
+        raise ValueError(f"Modo '{mode}' não suportado. Use 'crew' ou 'aggregate'.")
+    return mode
+
+
+def _ranking_from_output(result: Any) -> List[Dict[str, Any]]:
+    """Ranking validado da saída da Crew (última tarefa com um ranking válido)."""
+    from crew.schemas import parse_ranking
+
+    for task_output in reversed(getattr(result, "tasks_output", None) or []):
+        try:
+            entries = parse_ranking(getattr(task_output, "raw", task_output))
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        if entries:
+            return [entry.model_dump() for entry in entries]
+    return []
+
+
+def _run_multi_crew(tickers: list[str], periodo: str, llm_provider: str,
+                    on_progress: Optional[ProgressCallback]) -> Tuple[str, List[Dict[str, Any]], Optional[str]]:
+    from core.reports import extract_report_key, submit_report
+    from crew.schemas import RankingEntry, dump_ranking
+
+    with timed("crew_build", crew="multi_ticker"):
+        from crew.crew import create_multi_ticker_crew
+        crew = create_multi_ticker_crew(tickers, periodo, llm_provider)
+
+    with timed("crew_kickoff", crew="multi_ticker"):
+        result = _run_crew(crew, "multi-ticker-crew-trace", tickers, on_progress)
+    # O resultado pode ser string ou objeto CrewOutput
+    resposta = str(result.raw) if hasattr(result, 'raw') else str(result)
+    ranking = _ranking_from_output(result)
+
+    report_key = extract_report_key(resposta)
+    if report_key is None and ranking:
+        # O agente de PDF não devolveu a chave: o mesmo ranking gera (ou reaproveita) o relatório
+        report_key = submit_report(dump_ranking([RankingEntry(**item) for item in ranking]))
+    return resposta, ranking, report_key
+
+
+def _run_aggregate(tickers: list[str], periodo: str, user_question: str, llm_provider: str,
+                   on_progress: Optional[ProgressCallback]) -> Tuple[str, List[Dict[str, Any]], Optional[str]]:
+    from core.metrics import get_metrics_many
+    from core.reports import submit_report
+    from crew.schemas import dump_ranking
+    from crew.tools import build_ranking
+
+    # Números sem LLM: métricas (cache -> dados brutos -> brapi), ranking e PDF
+    with timed("aggregate_metrics", tickers=len(tickers)):
+        metrics = get_metrics_many(tickers, periodo)
+        if not metrics:
+            raise LookupError(f"Nenhuma métrica disponível para {', '.join(tickers)} ({periodo})")
+        entries = build_ranking(list(metrics), periodo)
+    # Mesmo ranking da Crew completa: o PDF é o mesmo (e reaproveitado) nos dois modos
+    report_key = submit_report(dump_ranking(entries)) if entries else None
+
+    with timed("crew_build", crew="aggregate"):
+        from crew.crew import create_aggregate_crew
+        crew = create_aggregate_crew(metrics, periodo, user_question, llm_provider)
+
+    with timed("crew_kickoff", crew="aggregate"):
+        result = _run_crew(crew, "aggregate-crew-trace", tickers, on_progress)
+    resposta = str(result.raw) if hasattr(result, 'raw') else str(result)
+    faltantes = [t for t in tickers if t not in metrics]
+    if faltantes:
+        resposta += f"\n\nSem dados para: {', '.join(faltantes)}"
+    if report_key:
+        resposta += f"\n\nPDF gerado com sucesso: {report_key}"
+    return resposta, [entry.model_dump() for entry in entries], report_key
+
+
+def _kickoff_multi(tickers: list[str], periodo: str, user_question: str, user_id: str, llm_provider: str,
+                   on_progress: Optional[ProgressCallback] = None,
+                   mode: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]], Optional[str]]:
+    """Aplica o rate limit e executa a análise multi-ticker no modo pedido.
+
+    Returns:
+        tuple: (resposta, ranking em dicionários, chave do relatório ou None).
+    """
+    mode = multi_ticker_mode(mode)
+    # Verifica limite de requisições
+    with timed("rate_limit"):
+        check_rate_limit(user_id)
+
+    record_requests(tickers, periodo)
+
+    tickers_str = ", ".join(tickers)
+    logging.info(f"Processando análise comparativa ({mode}) para {tickers_str} no período {periodo}")
+    print(f"Processando análise comparativa para {tickers_str} no período {periodo}")
+
+    try:
+        if mode == AGGREGATE_MODE:
+            return _run_aggregate(tickers, periodo, user_question, llm_provider, on_progress)
+        # Crew completa - AGENTES FAZEM TODO O TRABALHO
+        return _run_multi_crew(tickers, periodo, llm_provider, on_progress)
+    except Exception as e:
+        logging.error(f"Erro ao executar Crew multi-ticker: {e}")
+        raise Exception(f"Falha na análise comparativa via CrewAI: {e}")
+
+
 def analyze_multi_tickers(tickers: list[str], periodo: str, user_question: str, 
-                          user_id: str = "anon", llm_provider: str = "gemini") -> str:
+                          user_id: str = "anon", llm_provider: str = "gemini",
+                          on_progress: Optional[ProgressCallback] = None,
+                          mode: Optional[str] = None) -> str:
     """Executa análise comparativa para múltiplos tickers usando CrewAI.
 
     Este método orquestra a análise de múltiplos tickers, compara os dividend yields
@@ -124,41 +310,86 @@ def analyze_multi_tickers(tickers: list[str], periodo: str, user_question: str,
         user_id (str): identificador único do usuário para
             rate limiting.
         llm_provider (str): "gemini" (padrão) ou "openai" para escolher o LLM.
+        on_progress (callable): recebe os eventos de progresso da Crew
+            (tarefa iniciada/concluída, ferramenta chamada, tokens).
+        mode (str): "crew" (Crew completa) ou "aggregate" (uma chamada ao
+            LLM com a tabela de métricas); padrão em `MULTI_TICKER_MODE`.
 
     Returns:
-        str: resposta com o ranking e caminho do PDF gerado.
+        str: resposta da Crew, com a chave do relatório PDF (`report:<sha256>`).
 
     Raises:
         Exception: se exceder o limite de taxa ou se a Crew falhar.
     """
-    # Verifica limite de requisições
-    check_rate_limit(user_id)
+    with tracing.span("analyze_multi_tickers", tickers=",".join(tickers), periodo=periodo, llm_provider=llm_provider):
+        resposta, _, _ = _kickoff_multi(tickers, periodo, user_question, user_id, llm_provider, on_progress, mode)
 
-    tickers_str = ", ".join(tickers)
-    logging.info(f"Processando análise comparativa para {tickers_str} no período {periodo}")
-    print(f"Processando análise comparativa para {tickers_str} no período {periodo}")
+    # Exportação em segundo plano: não soma latência à resposta
+    tracing.flush_async()
 
-    # Cria e executa a Crew - AGENTES FAZEM TODO O TRABALHO
-    try:
-        crew = create_multi_ticker_crew(tickers, periodo, llm_provider)
-        
-        if langfuse_client:
-            with langfuse_client.start_as_current_span(name="multi-ticker-crew-trace"):
-                result = crew.kickoff()
-        else:
-            result = crew.kickoff()
-        
-        # O resultado pode ser string ou objeto CrewOutput
-        if hasattr(result, 'raw'):
-            resposta = str(result.raw)
-        else:
-            resposta = str(result)
-            
-    except Exception as e:
-        logging.error(f"Erro ao executar Crew multi-ticker: {e}")
-        raise Exception(f"Falha na análise comparativa via CrewAI: {e}")
-    
-    if langfuse_client:
-        langfuse_client.flush()
+    _export_metrics()
+    return resposta
+
+
+def analyze_multi_tickers_report(tickers: list[str], periodo: str, user_question: str,
+                                 user_id: str = "anon", llm_provider: str = "gemini",
+                                 include_pdf: bool = True,
+                                 on_progress: Optional[ProgressCallback] = None,
+                                 mode: Optional[str] = None) -> Dict[str, Any]:
+    """Como `analyze_multi_tickers`, mas devolve um resultado estruturado.
+
+    O PDF vem em bytes (renderizado em memória e compartilhado entre
+    réplicas pelo Redis, ver `core/reports.py`), sem ler arquivo do disco.
+
+    Args:
+        include_pdf (bool): espera a renderização e inclui os bytes do PDF;
+            com False, só a chave (útil para APIs que servem o PDF depois).
+        on_progress (callable): recebe os eventos de progresso da Crew.
+        mode (str): "crew" ou "aggregate" (ver `analyze_multi_tickers`).
 
-    return resposta
\ No newline at end of file
+    Returns:
+        dict: `resposta` (texto da Crew), `ranking` (lista de dicionários no
+        formato de `RankingEntry`), `report_key` (`report:<sha256>` ou None)
+        e `pdf` (bytes ou None).
+    """
+    from core.reports import get_report
+
+    with tracing.span("analyze_multi_tickers", tickers=",".join(tickers), periodo=periodo, llm_provider=llm_provider):
+        resposta, ranking, report_key = _kickoff_multi(
+            tickers, periodo, user_question, user_id, llm_provider, on_progress, mode,
+        )
+        pdf = None
+        if include_pdf and report_key:
+            # O PDF é um extra: se a renderização falhar, a análise segue sem ele
+            try:
+                with timed("pdf_wait"):
+                    pdf = get_report(report_key)
+            except Exception as exc:
+                logging.error(f"Falha ao gerar o PDF {report_key}: {exc}")
+                report_key = None
+
+    tracing.flush_async()
+
+    _export_metrics()
+    return {"resposta": resposta, "ranking": ranking, "report_key": report_key, "pdf": pdf}
+
+
+def analyze_multi_tickers_stream(tickers: list[str], periodo: str, user_question: str,
+                                 user_id: str = "anon", llm_provider: str = "gemini",
+                                 include_pdf: bool = True,
+                                 mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Gerador com os eventos de progresso da análise multi-ticker.
+
+    A Crew roda em uma thread; os eventos (`task_started`, `tool_called`,
+    `task_finished`, ...) são produzidos conforme acontecem e o último é
+    `{"type": "result", "result": <dict de analyze_multi_tickers_report>}`
+    ou `{"type": "error", "error": str}`.
+
+    Uso::
+
+        for event in analyze_multi_tickers_stream(["PETR4", "VALE3"], "1y", "..."):
+            print(event["type"], event.get("stage"), event.get("ticker"))
+    """
+    return iter_events(lambda on_progress: analyze_multi_tickers_report(
+        tickers, periodo, user_question, user_id, llm_provider, include_pdf, on_progress, mode,
+    ))
@@ -0,0 +1,242 @@
+"""
+Pré-aquecimento do cache para os tickers mais pedidos.
+
+Uma requisição fria paga brapi + métricas (+ LLM); as mesmas blue chips
+(PETR4, VALE3, ITUB4, BBDC4...) são pedidas o tempo todo.  Este módulo:
+
+* registra a frequência de cada `(ticker, periodo)` pedido em um sorted
+  set do Redis (`prewarm:freq`, via ZINCRBY em `record_requests`, chamado
+  pelo orquestrador);
+* escolhe o conjunto quente (`hot_set`): os mais pedidos, mais os tickers
+  fixos de `PREWARM_TICKERS`;
+* atualiza `rawdata:`, `metrics:` (e índices de ranking) e, opcionalmente,
+  `insights:` desses pares com no máximo `PREWARM_WORKERS` em paralelo;
+* agenda a atualização antes da abertura e depois do fechamento do pregão
+  (`PREWARM_TIMES`, horário de Brasília, dias úteis), com lock no Redis
+  para que só uma réplica rode cada janela.
+
+As ferramentas de busca e de métricas da Crew reaproveitam o que estiver
+no cache, então um pedido de um par quente já começa com dados prontos.
+
+Uso (a partir da pasta dia3)::
+
+    python -m core.prewarm hot            # mostra o conjunto quente
+    python -m core.prewarm run            # pré-aquece agora
+
+Variáveis de ambiente:
+
+    PREWARM_ENABLED=1                 liga o agendador no app
+    PREWARM_TIMES=09:30,18:30         horários (America/Sao_Paulo)
+    PREWARM_TOP_N=20                  tamanho do conjunto quente
+    PREWARM_MIN_HITS=2                pedidos mínimos para entrar no conjunto
+    PREWARM_TICKERS=PETR4:1y,VALE3    sempre aquecidos (período padrão 1y)
+    PREWARM_WORKERS=4                 atualizações simultâneas
+    PREWARM_INSIGHTS=0                1 também regenera `insights:` via LLM
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import cache_keys
+from utils.cache import get_redis_connection
+from utils.telemetry import timed
+
+FREQ_KEY = "prewarm:freq"
+STATUS_KEY = "prewarm:status"
+DEFAULT_TICKERS = "PETR4:1y,VALE3:1y,ITUB4:1y,BBDC4:1y"
+# Frequências caem pela metade a cada rodada: o conjunto quente acompanha a demanda recente
+DECAY = 0.5
+
+try:
+    from zoneinfo import ZoneInfo
+
+    MARKET_TZ = ZoneInfo("America/Sao_Paulo")
+except Exception:  # pragma: no cover - sem base de fusos horários
+    MARKET_TZ = None
+
+
+def _member(ticker: str, periodo: str) -> str:
+    return f"{ticker.upper()}:{periodo}"
+
+
+def _split(member: str) -> Tuple[str, str]:
+    ticker, _, periodo = member.partition(":")
+    return ticker, periodo or "1y"
+
+
+def record_requests(tickers: Iterable[str], periodo: str) -> None:
+    """Conta um pedido para cada `(ticker, periodo)` (falhas do Redis são ignoradas)."""
+    try:
+        pipe = get_redis_connection().pipeline()
+        for ticker in tickers:
+            pipe.zincrby(FREQ_KEY, 1, _member(ticker, periodo))
+        pipe.execute()
+    except Exception as exc:
+        logging.warning(f"Não foi possível registrar a frequência de pedidos: {exc}")
+
+
+def hot_set(top_n: Optional[int] = None, min_hits: Optional[float] = None) -> List[Tuple[str, str]]:
+    """Pares `(ticker, periodo)` a pré-aquecer: fixos primeiro, depois os mais pedidos."""
+    top_n = top_n or int(os.getenv("PREWARM_TOP_N", "20"))
+    min_hits = float(os.getenv("PREWARM_MIN_HITS", "2")) if min_hits is None else min_hits
+    pinned = [_split(m.strip() if ":" in m else f"{m.strip()}:1y")
+              for m in os.getenv("PREWARM_TICKERS", DEFAULT_TICKERS).split(",") if m.strip()]
+    popular = get_redis_connection().zrevrangebyscore(FREQ_KEY, "+inf", min_hits, start=0, num=top_n)
+    pairs = [(t.upper(), p) for t, p in pinned] + [_split(m) for m in popular]
+    return list(dict.fromkeys(pairs))
+
+
+def decay_frequencies(factor: float = DECAY) -> None:
+    """Multiplica as frequências por `factor` e descarta as que ficam irrelevantes."""
+    r = get_redis_connection()
+    scores = r.zrange(FREQ_KEY, 0, -1, withscores=True)
+    if not scores:
+        return
+    pipe = r.pipeline()
+    for member, score in scores:
+        if score * factor < 0.5:
+            pipe.zrem(FREQ_KEY, member)
+        else:
+            pipe.zadd(FREQ_KEY, {member: score * factor})
+    pipe.execute()
+
+
+def warm(ticker: str, periodo: str, insights: bool = False) -> Dict[str, Any]:
+    """Atualiza `rawdata:` e `metrics:` (e `insights:`, se pedido) de um par."""
+    from core.data_loader import fetch_brapi_data, store_rawdata_in_cache
+    from core.metrics_calculator import calc_metrics_from_raw, store_metrics_in_cache
+
+    r = get_redis_connection()
+    data = fetch_brapi_data(ticker, periodo)
+    # Dados diferentes dos anteriores já invalidam insights e recomendação
+    store_rawdata_in_cache(ticker, periodo, data, r=r)
+    metrics = calc_metrics_from_raw(data)
+    store_metrics_in_cache(ticker, periodo, metrics)
+    if insights:
+        from crew.crew import run_insights
+
+        # Remove a versão anterior para que o cache-aside gere uma nova
+        r.delete(cache_keys.key("insights", ticker, periodo))
+        run_insights(ticker, periodo, metrics)
+    return metrics
+
+
+def prewarm(pairs: Optional[List[Tuple[str, str]]] = None, max_workers: Optional[int] = None,
+            insights: Optional[bool] = None) -> Dict[str, Any]:
+    """Pré-aquece os pares informados (padrão: `hot_set()`) com concorrência limitada.
+
+    Returns:
+        dict: resumo com `ok`, `failed`, `errors` e `elapsed_s`.
+    """
+    pairs = pairs if pairs is not None else hot_set()
+    max_workers = max_workers or int(os.getenv("PREWARM_WORKERS", "4"))
+    insights = os.getenv("PREWARM_INSIGHTS") == "1" if insights is None else insights
+    start = time.perf_counter()
+    ok, errors = 0, {}
+
+    with timed("prewarm", pairs=len(pairs)), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(warm, t, p, insights): _member(t, p) for t, p in pairs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                ok += 1
+            except Exception as exc:
+                errors[futures[future]] = str(exc)
+
+    if errors:
+        logging.warning(f"Pré-aquecimento: {len(errors)} de {len(pairs)} pares falharam")
+    summary = {
+        "ok": ok,
+        "failed": len(errors),
+        "errors": dict(list(errors.items())[:10]),
+        "insights": insights,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "finished_at": time.time(),
+    }
+    get_redis_connection().set(STATUS_KEY, json.dumps(summary, ensure_ascii=False))
+    return summary
+
+
+def _schedule_times() -> List[Tuple[int, int]]:
+    times = []
+    for item in os.getenv("PREWARM_TIMES", "09:30,18:30").split(","):
+        hour, _, minute = item.strip().partition(":")
+        times.append((int(hour), int(minute or 0)))
+    return sorted(times)
+
+
+def next_run(now: Optional[datetime] = None) -> datetime:
+    """Próximo horário de `PREWARM_TIMES` em dia útil (fuso da B3)."""
+    now = now or datetime.now(MARKET_TZ)
+    day = now.replace(second=0, microsecond=0)
+    for offset in range(8):
+        candidate_day = day + timedelta(days=offset)
+        if candidate_day.weekday() >= 5:
+            continue
+        for hour, minute in _schedule_times():
+            candidate = candidate_day.replace(hour=hour, minute=minute)
+            if candidate > now:
+                return candidate
+    raise ValueError("PREWARM_TIMES sem horários válidos")
+
+
+def _scheduler_loop() -> None:
+    r = get_redis_connection()
+    while True:
+        target = next_run()
+        time.sleep(max(0.0, (target - datetime.now(MARKET_TZ)).total_seconds()))
+        # Uma réplica por janela: o lock expira bem antes da próxima
+        if not r.set(f"prewarm:lock:{target:%Y%m%d%H%M}", "1", ex=3600, nx=True):
+            continue
+        try:
+            summary = prewarm()
+            decay_frequencies()
+            logging.info(f"Pré-aquecimento concluído: {summary['ok']} ok, {summary['failed']} falhas")
+        except Exception as exc:
+            logging.error(f"Falha no pré-aquecimento agendado: {exc}")
+
+
+_scheduler: Optional[threading.Thread] = None
+_scheduler_lock = threading.Lock()
+
+
+def start_prewarm_scheduler() -> None:
+    """Inicia (uma vez por processo) o agendador em thread daemon."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return
+        _scheduler = threading.Thread(target=_scheduler_loop, name="prewarm", daemon=True)
+        _scheduler.start()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pré-aquecimento do cache para os tickers mais pedidos.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("hot", help="mostra o conjunto quente e o próximo horário agendado")
+    run = sub.add_parser("run", help="pré-aquece agora")
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--insights", action="store_true", help="também regenera insights via LLM")
+    args = parser.parse_args(argv)
+
+    if args.command == "hot":
+        freq = dict(get_redis_connection().zrange(FREQ_KEY, 0, -1, withscores=True))
+        for ticker, periodo in hot_set():
+            print(f"{ticker:<8} {periodo:<4} pedidos {freq.get(_member(ticker, periodo), 0):6.1f}")
+        print(f"próxima execução: {next_run():%Y-%m-%d %H:%M}")
+        return 0
+
+    summary = prewarm(max_workers=args.workers, insights=args.insights or None)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
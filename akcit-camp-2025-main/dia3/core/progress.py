@@ -0,0 +1,190 @@
+"""
+Eventos de progresso das Crews a partir dos callbacks da CrewAI.
+
+A barra do `app.py` ia de 20 a 100 sem dizer qual das 12+ tarefas estava
+rodando.  `ProgressTracker` se pendura no `step_callback` e no
+`task_callback` da Crew e emite eventos estruturados (dicionários):
+
+    crew_started    total de tarefas
+    task_started    índice, agente, ticker e etapa da tarefa
+    tool_called     ferramenta e argumentos (após a execução)
+    task_finished   duração da tarefa e tokens gastos nela
+    crew_finished   duração total e tokens
+
+Todos trazem `elapsed_s` (desde o início da Crew) e `tokens_total`.  O
+processo das Crews é sequencial, então o fim de uma tarefa marca o início
+da próxima.  A duração de cada tarefa também vai para a telemetria
+(`crew_task{task=<etapa>}`), deixando claro qual etapa é lenta em produção.
+
+Os eventos chegam por um callback (`on_progress`) ou, para quem prefere
+consumir em laço, pela fila/gerador de `iter_events`.
+
+Os tokens vêm do contador de uso dos LLMs dos agentes
+(`get_token_usage_summary`); se o mesmo LLM atende Crews concorrentes, a
+contagem por tarefa é aproximada.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.telemetry import observe
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Prefixo do papel do agente -> etapa do pipeline
+STAGES = {
+    "Ingestor de Dados": "dados",
+    "Calculador de Métricas": "metricas",
+    "Analista de Dividendos": "insights",
+    "Consultor de Dividendos": "recomendacao",
+    "Comparador de Dividendos": "ranking",
+    "Analista Comparativo": "comparativo",
+    "Gerador de Relatórios": "relatorio",
+}
+
+
+def _stage_and_ticker(role: str) -> Dict[str, Optional[str]]:
+    base, _, ticker = role.partition(" - ")
+    stage = next((s for prefix, s in STAGES.items() if base.startswith(prefix)), base)
+    return {"stage": stage, "ticker": ticker or None}
+
+
+def _tokens(llm: Any) -> int:
+    # O roteador delega aos LLMs de cada provedor: soma os candidatos
+    candidates = getattr(llm, "candidates", None) or {}
+    llms = list(candidates.values()) or [llm]
+    total = 0
+    for item in llms:
+        try:
+            total += int(item.get_token_usage_summary().total_tokens)
+        except Exception:
+            continue
+    return total
+
+
+class ProgressTracker:
+    """Converte os callbacks de uma Crew em eventos de progresso."""
+
+    def __init__(self, crew: Any, on_progress: Optional[ProgressCallback] = None,
+                 tickers: Optional[List[str]] = None) -> None:
+        self.crew = crew
+        self.on_progress = on_progress
+        self.tasks = list(getattr(crew, "tasks", []) or [])
+        # Crew de um ticker só: as tarefas sem ticker no papel são desse ticker
+        self.default_ticker = tickers[0] if tickers and len(tickers) == 1 else None
+        self._llms = list({id(a.llm): a.llm for a in getattr(crew, "agents", []) if getattr(a, "llm", None)}.values())
+        self._index = 0
+        self._start = 0.0
+        self._task_start = 0.0
+        self._tokens_start = 0
+        self._task_tokens_start = 0
+
+        previous_step, previous_task = getattr(crew, "step_callback", None), getattr(crew, "task_callback", None)
+
+        def step_callback(step: Any) -> None:
+            self._guard(self._on_step, step)
+            if previous_step:
+                previous_step(step)
+
+        def task_callback(output: Any) -> None:
+            self._guard(self._on_task, output)
+            if previous_task:
+                previous_task(output)
+
+        crew.step_callback = step_callback
+        crew.task_callback = task_callback
+
+    @staticmethod
+    def _guard(handler: Callable[[Any], None], arg: Any) -> None:
+        # Progresso nunca derruba a análise
+        try:
+            handler(arg)
+        except Exception as exc:
+            logging.warning(f"Falha ao registrar progresso da Crew: {exc}")
+
+    def _tokens_used(self) -> int:
+        return sum(_tokens(llm) for llm in self._llms)
+
+    def _emit(self, event_type: str, **fields: Any) -> None:
+        if not self.on_progress:
+            return
+        now = time.perf_counter()
+        event = {
+            "type": event_type,
+            "total_tasks": len(self.tasks),
+            "elapsed_s": round(now - self._start, 2),
+            "tokens_total": self._tokens_used() - self._tokens_start,
+            "ts": time.time(),
+            **fields,
+        }
+        try:
+            self.on_progress(event)
+        except Exception as exc:
+            logging.warning(f"Callback de progresso falhou: {exc}")
+
+    def _task_fields(self, index: int) -> Dict[str, Any]:
+        task = self.tasks[index]
+        role = getattr(getattr(task, "agent", None), "role", "") or ""
+        fields = _stage_and_ticker(role)
+        # Agentes compartilhados entre tickers: o ticker vem do nome da tarefa
+        name_ticker = (getattr(task, "name", None) or "").partition(" - ")[2]
+        fields["ticker"] = fields["ticker"] or name_ticker or self.default_ticker
+        return {"task_index": index, "agent": role, **fields}
+
+    def _start_task(self, index: int) -> None:
+        self._index = index
+        self._task_start = time.perf_counter()
+        self._task_tokens_start = self._tokens_used()
+        if index < len(self.tasks):
+            self._emit("task_started", **self._task_fields(index))
+
+    def started(self) -> None:
+        self._start = time.perf_counter()
+        self._tokens_start = self._tokens_used()
+        self._emit("crew_started")
+        self._start_task(0)
+
+    def finished(self) -> None:
+        self._emit("crew_finished", duration_s=round(time.perf_counter() - self._start, 2))
+
+    def _on_step(self, step: Any) -> None:
+        tool = getattr(step, "tool", None)
+        if tool and self._index < len(self.tasks):
+            self._emit("tool_called", tool=tool, tool_input=str(getattr(step, "tool_input", ""))[:200],
+                       **self._task_fields(self._index))
+
+    def _on_task(self, output: Any) -> None:
+        if self._index >= len(self.tasks):
+            return
+        duration = time.perf_counter() - self._task_start
+        fields = self._task_fields(self._index)
+        observe("crew_task", duration, task=fields["stage"])
+        self._emit("task_finished", duration_s=round(duration, 2),
+                   tokens=self._tokens_used() - self._task_tokens_start, **fields)
+        self._start_task(self._index + 1)
+
+
+def iter_events(run: Callable[[ProgressCallback], Any]) -> Iterator[Dict[str, Any]]:
+    """Executa `run(on_progress)` em uma thread e produz os eventos conforme chegam.
+
+    O último evento é `{"type": "result", "result": ...}` com o retorno de
+    `run`, ou `{"type": "error", "error": ...}` se ele falhar.
+    """
+    events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+    def worker() -> None:
+        try:
+            events.put({"type": "result", "result": run(events.put)})
+        except Exception as exc:
+            events.put({"type": "error", "error": str(exc)})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, name="crew-progress", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is None:
+            return
+        yield event
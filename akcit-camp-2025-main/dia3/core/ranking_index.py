@@ -0,0 +1,159 @@
+"""
+Índice de ranking pré-computado em sorted sets do Redis.
+
+`rank_tickers_by_dividend_yield` lia as métricas de cada ticker e ordenava
+em Python a cada requisição.  Agora `store_metrics_in_cache` também mantém,
+por período, um sorted set para cada métrica:
+
+    rank:v*:dy:{periodo}          ticker -> dividend yield (índice principal)
+    rank:v*:preco:{periodo}       ticker -> preço atual
+    rank:v*:div12m:{periodo}      ticker -> dividendos dos últimos 12 meses
+    rank:v*:pagamentos:{periodo}  ticker -> quantidade de pagamentos
+    rank:v*:vol:{periodo}         ticker -> volatilidade anualizada (%)
+    rank:v*:ts:{periodo}          ticker -> timestamp da última atualização
+
+A versão é a das métricas (`cache_keys.version("metrics")`, ex.:
+`rank:v1.1:dy:1y`): ao mudar o cálculo, os índices antigos deixam de ser
+consultados junto com as métricas que os alimentaram.  Invalidar as
+métricas de um ticker (`cache_keys.invalidate`) também o tira dos índices.
+
+Consultas como top-N, faixas ("DY > 7%") e ranking de um subconjunto de
+tickers viram ZRANGE/ZRANGEBYSCORE/ZINTERSTORE, em O(log n + k), sem ler as
+métricas de todos os tickers.  O fallback em memória (`FAKE_CACHE=1`)
+implementa os mesmos comandos (ver `utils/cache.py`).
+
+Como membros de sorted set não expiram individualmente, entradas mais
+antigas que o TTL das métricas são removidas de todos os índices antes de
+cada consulta (`prune_stale`).
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import cache_keys
+from utils.cache import get_redis_connection
+
+# Métrica -> sufixo do índice.  O dividend yield é o índice principal.
+METRIC_INDEXES: Dict[str, str] = {
+    "dividend_yield": "dy",
+    "preco_atual": "preco",
+    "dividendos_12m": "div12m",
+    "quantidade_pagamentos": "pagamentos",
+    "volatilidade": "vol",
+}
+
+
+
+def index_key(periodo: str, metric: str = "dividend_yield") -> str:
+    """Chave do sorted set de `metric` no período (ex.: rank:v1.1:dy:1y)."""
+    if metric not in METRIC_INDEXES:
+        raise ValueError(f"Métrica sem índice: {metric}. Use uma de {sorted(METRIC_INDEXES)}")
+    return f"rank:{cache_keys.version('metrics')}:{METRIC_INDEXES[metric]}:{periodo}"
+
+
+def _ts_key(periodo: str) -> str:
+    return f"rank:{cache_keys.version('metrics')}:ts:{periodo}"
+
+
+def queue_index(pipe: Any, ticker: str, periodo: str, metrics: Dict[str, Any]) -> None:
+    """Enfileira em `pipe` as atualizações de índice de um ticker."""
+    for metric in METRIC_INDEXES:
+        value = metrics.get(metric)
+        if isinstance(value, (int, float)):
+            pipe.zadd(index_key(periodo, metric), {ticker: float(value)})
+    pipe.zadd(_ts_key(periodo), {ticker: time.time()})
+
+
+def index_metrics(ticker: str, periodo: str, metrics: Dict[str, Any], r: Any = None) -> None:
+    """Atualiza todos os índices do período com as métricas de `ticker`."""
+    r = r or get_redis_connection()
+    pipe = r.pipeline()
+    queue_index(pipe, ticker, periodo, metrics)
+    pipe.execute()
+
+
+def remove_ticker(ticker: str, periodo: str, r: Any = None) -> None:
+    """Remove `ticker` de todos os índices do período."""
+    r = r or get_redis_connection()
+    pipe = r.pipeline()
+    for metric in METRIC_INDEXES:
+        pipe.zrem(index_key(periodo, metric), ticker)
+    pipe.zrem(_ts_key(periodo), ticker)
+    pipe.execute()
+
+
+def prune_stale(periodo: str, max_age: Optional[int] = None, r: Any = None) -> int:
+    """Remove dos índices os tickers atualizados há mais de `max_age` segundos.
+
+    O padrão é o TTL das métricas (`CACHE_TTL_METRICS`): o índice não
+    sobrevive às métricas que o alimentam.
+    """
+    max_age = max_age or cache_keys.ttl("metrics")
+    r = r or get_redis_connection()
+    stale = r.zrangebyscore(_ts_key(periodo), "-inf", f"({time.time() - max_age}")
+    if not stale:
+        return 0
+    pipe = r.pipeline()
+    for metric in METRIC_INDEXES:
+        pipe.zrem(index_key(periodo, metric), *stale)
+    pipe.zrem(_ts_key(periodo), *stale)
+    pipe.execute()
+    return len(stale)
+
+
+def top_n(periodo: str, n: int = 10, metric: str = "dividend_yield",
+          ascending: bool = False) -> List[Tuple[str, float]]:
+    """Os `n` primeiros tickers por `metric` (maior primeiro por padrão)."""
+    r = get_redis_connection()
+    prune_stale(periodo, r=r)
+    return [(t, float(s)) for t, s in
+            r.zrange(index_key(periodo, metric), 0, n - 1, desc=not ascending, withscores=True)]
+
+
+def range_query(periodo: str, minimum: Optional[float] = None, maximum: Optional[float] = None,
+                metric: str = "dividend_yield", exclusive_min: bool = False,
+                limit: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Tickers com `metric` dentro da faixa, do maior para o menor.
+
+    Ex.: `range_query("1y", 7, exclusive_min=True)` responde "DY > 7%".
+    """
+    r = get_redis_connection()
+    prune_stale(periodo, r=r)
+    low = "-inf" if minimum is None else (f"({minimum}" if exclusive_min else minimum)
+    high = "+inf" if maximum is None else maximum
+    kwargs = {"start": 0, "num": limit} if limit else {}
+    return [(t, float(s)) for t, s in
+            r.zrevrangebyscore(index_key(periodo, metric), high, low, withscores=True, **kwargs)]
+
+
+def rank_subset(tickers: Iterable[str], periodo: str, metric: str = "dividend_yield") -> List[Tuple[str, float]]:
+    """Ordena um subconjunto de tickers por `metric` via ZINTERSTORE.
+
+    Tickers sem entrada no índice ficam de fora do resultado.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return []
+    r = get_redis_connection()
+    prune_stale(periodo, r=r)
+    subset_key = f"rank:tmp:{uuid.uuid4().hex}"
+    dest_key = f"{subset_key}:result"
+    pipe = r.pipeline()
+    pipe.zadd(subset_key, {t: 0 for t in tickers})
+    # Peso 0 no subconjunto: o score resultante é o da métrica
+    pipe.zinterstore(dest_key, {subset_key: 0, index_key(periodo, metric): 1})
+    pipe.zrange(dest_key, 0, -1, desc=True, withscores=True)
+    pipe.delete(subset_key, dest_key)
+    ranked = pipe.execute()[2]
+    return [(t, float(s)) for t, s in ranked]
+
+
+def get_metrics_many(tickers: Iterable[str], periodo: str) -> Dict[str, Dict[str, Any]]:
+    """Lê as métricas de vários tickers em uma única ida ao Redis (MGET)."""
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    r = get_redis_connection()
+    values = r.mget([cache_keys.key("metrics", t, periodo) for t in tickers])
+    return {t: json.loads(v) for t, v in zip(tickers, values) if v}
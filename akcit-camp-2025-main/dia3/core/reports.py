@@ -0,0 +1,324 @@
+"""
+Serviço de relatórios PDF fora do caminho da requisição.
+
+`generate_dividend_pdf` montava `getSampleStyleSheet()` e todos os
+`ParagraphStyle` a cada chamada, gravava de forma síncrona em
+`reports/ranking_dividendos_{periodo}.pdf` (o mesmo nome para usuários
+concorrentes, que se sobrescreviam) e prendia a Crew até o PDF ficar pronto.
+Agora:
+
+* os estilos são criados uma vez por processo (`_styles`, em cache);
+* a renderização roda em um pool de processos (`REPORT_WORKERS`) e produz
+  bytes em memória (`BytesIO`); a ferramenta só enfileira e devolve a chave;
+* o relatório é endereçado pelo conteúdo: `report:{sha256}` no Redis, a
+  partir do ranking canônico (ou do texto), com TTL `REPORT_TTL`;
+* rankings idênticos reaproveitam o PDF já renderizado (em qualquer
+  réplica, via Redis) ou em renderização (no processo).
+
+Quem precisa do PDF (app, API, benchmarks) chama `get_report(chave)`, que
+espera a renderização pendente e devolve os bytes, sem passar pelo disco.
+Os bytes vão para o Redis em base64, pois o cliente usa
+`decode_responses=True`.  Com `REPORTS_DIR` definido, o PDF também é
+gravado em `{REPORTS_DIR}/{sha256}.pdf` (gravação atômica).
+
+Variáveis de ambiente:
+
+    REPORT_WORKERS=2        processos de renderização; 0 renderiza na thread atual
+    REPORT_TTL=604800       validade (s) dos relatórios no Redis (7 dias)
+    REPORTS_DIR=            também grava os PDFs neste diretório (opcional)
+"""
+import base64
+import functools
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from utils.cache import get_redis_connection
+from utils.telemetry import observe
+
+KEY_PREFIX = "report:"
+_KEY_RE = re.compile(r"report:([0-9a-f]{64})")
+_PATH_RE = re.compile(r"([0-9a-f]{64})\.pdf\b")
+
+
+def report_key(digest: str) -> str:
+    return f"{KEY_PREFIX}{digest}"
+
+
+def _digest(ref: str) -> str:
+    """Aceita a chave (`report:<hash>`), um caminho `<hash>.pdf` ou o hash puro."""
+    match = _KEY_RE.search(ref) or _PATH_RE.search(ref)
+    return match.group(1) if match else ref
+
+
+@functools.lru_cache(maxsize=1)
+def _reportlab() -> SimpleNamespace:
+    """Importa o reportlab uma única vez, na primeira geração de PDF."""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    return SimpleNamespace(
+        colors=colors, TA_CENTER=TA_CENTER, TA_JUSTIFY=TA_JUSTIFY, A4=A4,
+        ParagraphStyle=ParagraphStyle, getSampleStyleSheet=getSampleStyleSheet, cm=cm,
+        Paragraph=Paragraph, SimpleDocTemplate=SimpleDocTemplate, Spacer=Spacer,
+        Table=Table, TableStyle=TableStyle,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _styles() -> SimpleNamespace:
+    """Folha de estilos e estilos do relatório, criados uma vez por processo."""
+    rl = _reportlab()
+    styles = rl.getSampleStyleSheet()
+    blue = rl.colors.HexColor('#1a5490')
+    return SimpleNamespace(
+        normal=styles['Normal'],
+        title=rl.ParagraphStyle(
+            'CustomTitle', parent=styles['Heading1'], fontSize=24, textColor=blue,
+            spaceAfter=30, alignment=rl.TA_CENTER,
+        ),
+        heading=rl.ParagraphStyle(
+            'CustomHeading', parent=styles['Heading2'], fontSize=14, textColor=blue,
+            spaceAfter=12, spaceBefore=12,
+        ),
+        body=rl.ParagraphStyle(
+            'CustomNormal', parent=styles['Normal'], fontSize=10, alignment=rl.TA_JUSTIFY, spaceAfter=12,
+        ),
+        table=rl.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), blue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), rl.colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), rl.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, rl.colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [rl.colors.white, rl.colors.lightgrey]),
+        ]),
+    )
+
+
+def build_story(ranking: Optional[List[Dict[str, Any]]], text: str, generated_at: str) -> List[Any]:
+    """Elementos do relatório: tabela do ranking ou, sem ranking, o texto livre."""
+    rl, st = _reportlab(), _styles()
+    cm, Paragraph, Spacer = rl.cm, rl.Paragraph, rl.Spacer
+
+    story = [
+        Paragraph("Análise de Dividendos", st.title),
+        Paragraph(f"Data: {generated_at}", st.normal),
+        Spacer(1, 0.5*cm),
+    ]
+
+    if ranking:
+        story.append(Paragraph("Ranking de Ações por Dividend Yield", st.heading))
+        story.append(Spacer(1, 0.3*cm))
+        table_data = [[
+            "Posição", "Ticker", "Dividend Yield", "Preço Atual",
+            "Dividendos 12M", "Pagamentos", "Recomendação"
+        ]]
+        for idx, item in enumerate(ranking, 1):
+            table_data.append([
+                str(idx),
+                item.get("ticker", ""),
+                f"{item.get('dividend_yield', 0):.2f}%",
+                f"R$ {item.get('preco_atual', 0):.2f}",
+                f"R$ {item.get('dividendos_12m', 0):.2f}",
+                str(item.get('quantidade_pagamentos', 0)),
+                item.get('recomendacao', '')
+            ])
+        table = rl.Table(table_data, colWidths=[1.5*cm, 2*cm, 2.5*cm, 2.5*cm, 2.5*cm, 2*cm, 2.5*cm])
+        table.setStyle(st.table)
+        story.append(table)
+        story.append(Spacer(1, 0.5*cm))
+
+        # Destaque para a melhor opção
+        best = ranking[0]
+        story.append(Paragraph("🏆 Melhor Oportunidade", st.heading))
+        story.append(Paragraph(f"""
+            O ticker <b>{escape(str(best.get('ticker', '')))}</b> apresenta o melhor dividend yield
+            de <b>{best.get('dividend_yield', 0):.2f}%</b> ao ano, com preço atual de
+            R$ {best.get('preco_atual', 0):.2f} e {best.get('quantidade_pagamentos', 0)}
+            pagamentos nos últimos 12 meses, totalizando R$ {best.get('dividendos_12m', 0):.2f}
+            em dividendos.
+            """, st.body))
+    else:
+        # Texto do LLM: escapado, pois o Paragraph interpreta marcação ("<b>x" sem fechar quebra o PDF)
+        for para in text.split('\n\n'):
+            if para.strip():
+                story.append(Paragraph(escape(para.strip()), st.body))
+                story.append(Spacer(1, 0.3*cm))
+
+    # Rodapé
+    story.append(Spacer(1, 1*cm))
+    story.append(Paragraph(
+        "<i>Relatório gerado automaticamente pelo Finance Advisor - Dividend Analyst</i>", st.normal,
+    ))
+    return story
+
+
+def render_pdf(ranking: Optional[List[Dict[str, Any]]], text: str,
+               generated_at: str) -> Tuple[bytes, float]:
+    """Renderiza o PDF em memória (executado nos processos do pool).
+
+    Returns:
+        tuple: bytes do PDF e segundos gastos na renderização.
+    """
+    start = time.perf_counter()
+    rl = _reportlab()
+    buffer = io.BytesIO()
+    doc = rl.SimpleDocTemplate(buffer, pagesize=rl.A4,
+                               rightMargin=2*rl.cm, leftMargin=2*rl.cm,
+                               topMargin=2*rl.cm, bottomMargin=2*rl.cm)
+    doc.build(build_story(ranking, text, generated_at))
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def prepare(content: str) -> Tuple[str, Optional[List[Dict[str, Any]]], str]:
+    """Normaliza o conteúdo: (digest, ranking canônico ou None, texto)."""
+    from crew.schemas import parse_ranking
+
+    try:
+        # Repara saídas malformadas do LLM e ordena por DY: mesmo ranking, mesmo hash
+        ranking = [entry.model_dump() for entry in parse_ranking(content)] or None
+    except (ValueError, TypeError, SyntaxError):
+        ranking = None
+    canonical = json.dumps(ranking, ensure_ascii=False, sort_keys=True) if ranking else content.strip()
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest(), ranking, content
+
+
+def _store(digest: str, pdf: bytes) -> None:
+    """Publica o PDF no Redis (e no disco, se `REPORTS_DIR` estiver definido)."""
+    get_redis_connection().set(report_key(digest), base64.b64encode(pdf).decode("ascii"),
+                               ex=int(os.getenv("REPORT_TTL", "604800")))
+    directory = os.getenv("REPORTS_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{digest}.pdf")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(pdf)
+        os.replace(tmp_path, path)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+# Reentrante: o callback roda na própria thread se a renderização já terminou
+_lock = threading.RLock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    workers = int(os.getenv("REPORT_WORKERS", "2"))
+    if workers <= 0:
+        return None
+    if _pool is None:
+        # spawn: o processo pai tem threads (Crew, telemetria) e fork não é seguro
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _finish(digest: str, done: Future, pdf: bytes, seconds: float) -> None:
+    observe("pdf_build", seconds)
+    _store(digest, pdf)
+    done.set_result(pdf)
+
+
+def _render_inline(digest: str, job: Tuple[Optional[List[Dict[str, Any]]], str, str], done: Future) -> None:
+    try:
+        _finish(digest, done, *render_pdf(*job))
+    except Exception as exc:
+        logging.error(f"Falha ao renderizar relatório {digest[:12]}: {exc}")
+        done.set_exception(exc)
+
+
+def _on_done(digest: str, job: Tuple[Optional[List[Dict[str, Any]]], str, str],
+             done: Future, future: Future) -> None:
+    global _pool
+    try:
+        _finish(digest, done, *future.result())
+    except BrokenProcessPool as exc:
+        # Pool quebrado (processo morto): recria no próximo envio e renderiza aqui
+        logging.warning(f"Pool de relatórios indisponível, renderizando no processo: {exc}")
+        with _lock:
+            _pool = None
+        _render_inline(digest, job, done)
+    except Exception as exc:
+        logging.error(f"Falha ao renderizar relatório {digest[:12]}: {exc}")
+        done.set_exception(exc)
+    finally:
+        with _lock:
+            _pending.pop(digest, None)
+
+
+def submit_report(content: str) -> str:
+    """Enfileira a renderização e devolve a chave do relatório (`report:<sha256>`).
+
+    Conteúdo já renderizado (em qualquer réplica) ou em renderização neste
+    processo reaproveita o mesmo relatório.
+    """
+    digest, ranking, text = prepare(content)
+    key = report_key(digest)
+
+    with _lock:
+        if digest in _pending or get_redis_connection().exists(key):
+            return key
+        job = (ranking, text, datetime.now().strftime('%d/%m/%Y %H:%M'))
+        done: Future = Future()
+        _pending[digest] = done
+        pool = _get_pool()
+
+    if pool is None:
+        # REPORT_WORKERS=0: renderiza na thread atual
+        _render_inline(digest, job, done)
+        with _lock:
+            _pending.pop(digest, None)
+        done.result()
+    else:
+        pool.submit(render_pdf, *job).add_done_callback(functools.partial(_on_done, digest, job, done))
+    return key
+
+
+def extract_report_key(text: str) -> Optional[str]:
+    """Extrai a chave do relatório de uma resposta da Crew ("PDF gerado com sucesso: report:...")."""
+    match = _KEY_RE.search(text or "") or _PATH_RE.search(text or "")
+    return report_key(match.group(1)) if match else None
+
+
+def get_report(ref: str, timeout: Optional[float] = 60.0) -> bytes:
+    """Bytes do PDF de `ref`, esperando a renderização pendente, se houver.
+
+    Raises:
+        KeyError: se o relatório não existir (ou tiver expirado).
+    """
+    digest = _digest(ref)
+    with _lock:
+        future = _pending.get(digest)
+    if future is not None:
+        return future.result(timeout=timeout)
+    encoded = get_redis_connection().get(report_key(digest))
+    if encoded:
+        return base64.b64decode(encoded)
+    directory = os.getenv("REPORTS_DIR")
+    path = os.path.join(directory, f"{digest}.pdf") if directory else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as fh:
+            return fh.read()
+    raise KeyError(f"Relatório não encontrado: {report_key(digest)}")
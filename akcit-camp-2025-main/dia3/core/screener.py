@@ -0,0 +1,276 @@
+"""
+Screener de dividendos sobre o universo de ações da B3.
+
+A comparação via Crew custa minutos de LLM por ticker, por isso o
+`app.py` limitava a escolha a uma lista fixa de poucas ações.  O screener
+separa as duas coisas:
+
+* **Atualização** (`refresh_universe`): busca os dados de centenas de
+  tickers em paralelo (threads, I/O da brapi), calcula as métricas de cada
+  um e grava tudo em lote (um pipeline do Redis por bloco), alimentando os
+  índices de `core/ranking_index.py`.  Pode rodar sob agenda
+  (`start_refresh_scheduler`) ou pela linha de comando;
+* **Consulta** (`screen`): filtros e ordenação por dividend yield,
+  quantidade de pagamentos, preço e volatilidade respondidos direto dos
+  sorted sets pré-computados, sem LLM.
+
+Os agentes só entram depois, para os N primeiros que o usuário escolher
+analisar em profundidade (`analyze_multi_tickers`).
+
+Uso (a partir da pasta dia3)::
+
+    python -m core.screener refresh --periodo 1y --limit 300
+    python -m core.screener query --periodo 1y --min-dy 7 --min-pagamentos 4
+
+Variáveis de ambiente:
+
+    SCREENER_UNIVERSE=PETR4,VALE3,...  universo fixo (padrão: lista da brapi)
+    SCREENER_UNIVERSE_LIMIT=300        tamanho do universo buscado na brapi
+    SCREENER_WORKERS=8                 requisições simultâneas à brapi
+    SCREENER_REFRESH_INTERVAL=21600    intervalo (s) do agendador (6h)
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from utils.cache import get_redis_connection
+from utils.telemetry import timed
+
+# Usada quando a brapi não responde a listagem (ações líquidas da B3)
+FALLBACK_UNIVERSE = [
+    "PETR4", "PETR3", "VALE3", "ITUB4", "BBDC4", "BBDC3", "BBAS3", "ABEV3", "B3SA3", "WEGE3",
+    "ITSA4", "SANB11", "TAEE11", "CMIG4", "CPLE6", "EGIE3", "ELET3", "ELET6", "SBSP3", "CSMG3",
+    "SAPR11", "TRPL4", "ENGI11", "EQTL3", "CPFE3", "ALUP11", "TIMS3", "VIVT3", "KLBN11", "SUZB3",
+    "GGBR4", "GOAU4", "CSNA3", "USIM5", "BRAP4", "CMIN3", "PRIO3", "RECV3", "UGPA3", "VBBR3",
+    "CSAN3", "RAIL3", "CCRO3", "ECOR3", "LREN3", "MGLU3", "GRND3", "JBSS3", "BRFS3", "MRFG3",
+    "BEEF3", "SLCE3", "SMTO3", "CXSE3", "BBSE3", "PSSA3", "IRBR3", "BPAC11", "ABCB4", "BRSR6",
+    "RDOR3", "HAPV3", "FLRY3", "RADL3", "HYPE3", "TOTS3", "POSI3", "CYRE3", "EZTC3", "MRVE3",
+    "DIRR3", "MULT3", "IGTI11", "EMBR3", "AZUL4", "YDUQ3", "COGN3", "PETZ3", "ASAI3", "CRFB3",
+    "PCAR3", "AURE3", "KEPL3", "UNIP6", "FESA4", "ROMI3", "TASA4", "LEVE3", "TUPY3", "RAPT4",
+    "POMO4", "SHUL4",
+]
+
+UNIVERSE_KEY = "screener:universe"
+UNIVERSE_TTL = 86400
+WRITE_BATCH = 50
+
+# Filtros aceitos por `screen`: nome -> (métrica, limite inferior?)
+FILTERS = {
+    "min_dy": ("dividend_yield", True),
+    "max_dy": ("dividend_yield", False),
+    "min_pagamentos": ("quantidade_pagamentos", True),
+    "min_preco": ("preco_atual", True),
+    "max_preco": ("preco_atual", False),
+    "max_volatilidade": ("volatilidade", False),
+}
+
+
+def _status_key(periodo: str) -> str:
+    return f"screener:status:{periodo}"
+
+
+def load_universe(limit: Optional[int] = None) -> List[str]:
+    """Tickers do universo: `SCREENER_UNIVERSE`, cache do Redis, brapi ou fallback fixo."""
+    limit = limit or int(os.getenv("SCREENER_UNIVERSE_LIMIT", "300"))
+    configured = os.getenv("SCREENER_UNIVERSE")
+    if configured:
+        return [t.strip().upper() for t in configured.split(",") if t.strip()][:limit]
+
+    r = get_redis_connection()
+    cached = r.get(UNIVERSE_KEY)
+    if cached:
+        tickers = json.loads(cached)
+        if len(tickers) >= limit:
+            return tickers[:limit]
+
+    from core.data_loader import fetch_brapi_list
+
+    try:
+        tickers = [item["stock"] for item in fetch_brapi_list(limit) if item.get("stock")]
+    except Exception as exc:
+        logging.warning(f"Listagem da brapi indisponível, usando universo padrão: {exc}")
+        return FALLBACK_UNIVERSE[:limit]
+    if not tickers:
+        return FALLBACK_UNIVERSE[:limit]
+    r.set(UNIVERSE_KEY, json.dumps(tickers), ex=UNIVERSE_TTL)
+    return tickers
+
+
+def _ingest(ticker: str, periodo: str) -> Dict[str, float]:
+    """Busca e calcula as métricas de um ticker (executado nas threads)."""
+    from core.data_loader import fetch_brapi_data, store_rawdata_in_cache
+    from core.metrics_calculator import calc_metrics_from_raw
+
+    data = fetch_brapi_data(ticker, periodo)
+    store_rawdata_in_cache(ticker, periodo, data)
+    return calc_metrics_from_raw(data)
+
+
+def refresh_universe(periodo: str = "1y", tickers: Optional[List[str]] = None,
+                     max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Atualiza métricas e índices de todo o universo em paralelo.
+
+    Falhas de tickers individuais (ticker deslistado, erro 429 da brapi...)
+    são contadas e registradas no log, sem interromper a atualização.
+
+    Returns:
+        dict: resumo com `ok`, `failed`, `errors` (amostra) e `elapsed_s`.
+    """
+    from core.metrics_calculator import store_metrics_many
+
+    tickers = tickers or load_universe()
+    max_workers = max_workers or int(os.getenv("SCREENER_WORKERS", "8"))
+    start = time.perf_counter()
+    batch: Dict[str, Dict[str, float]] = {}
+    ok, errors = 0, {}
+
+    with timed("screener_refresh", periodo=periodo), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_ingest, ticker, periodo): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                batch[ticker] = future.result()
+            except Exception as exc:
+                errors[ticker] = str(exc)
+                continue
+            if len(batch) >= WRITE_BATCH:
+                store_metrics_many(periodo, batch)
+                ok += len(batch)
+                batch = {}
+        store_metrics_many(periodo, batch)
+        ok += len(batch)
+
+    if errors:
+        logging.warning(f"Screener: {len(errors)} tickers falharam na atualização ({periodo})")
+    summary = {
+        "periodo": periodo,
+        "ok": ok,
+        "failed": len(errors),
+        "errors": dict(list(errors.items())[:10]),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "refreshed_at": time.time(),
+    }
+    get_redis_connection().set(_status_key(periodo), json.dumps(summary, ensure_ascii=False))
+    return summary
+
+
+def last_refresh(periodo: str = "1y") -> Optional[Dict[str, Any]]:
+    """Resumo da última atualização do período, se houver."""
+    raw = get_redis_connection().get(_status_key(periodo))
+    return json.loads(raw) if raw else None
+
+
+def screen(periodo: str = "1y", sort_by: str = "dividend_yield", ascending: bool = False,
+           limit: int = 50, **filters: Optional[float]) -> List[Dict[str, Any]]:
+    """Filtra e ordena o universo a partir dos índices pré-computados.
+
+    Args:
+        periodo: período das métricas.
+        sort_by: métrica de ordenação (ver `METRIC_INDEXES`).
+        ascending: ordem crescente (padrão: decrescente).
+        limit: máximo de linhas retornadas.
+        **filters: `min_dy`, `max_dy`, `min_pagamentos`, `min_preco`,
+            `max_preco`, `max_volatilidade` (None = sem filtro).
+
+    Returns:
+        list: dicionários com `ticker` e as métricas, já ordenados.
+    """
+    from core.ranking_index import get_metrics_many, range_query, rank_subset, top_n
+
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise ValueError(f"Filtros desconhecidos: {', '.join(sorted(unknown))}")
+
+    # Faixa por métrica a partir dos filtros informados
+    bounds: Dict[str, List[Optional[float]]] = {}
+    for name, value in filters.items():
+        if value is None:
+            continue
+        metric, is_min = FILTERS[name]
+        bounds.setdefault(metric, [None, None])[0 if is_min else 1] = value
+
+    with timed("screener_query"):
+        if not bounds:
+            ranked = top_n(periodo, limit, metric=sort_by, ascending=ascending)
+        else:
+            selected: Optional[set] = None
+            for metric, (low, high) in bounds.items():
+                members = {t for t, _ in range_query(periodo, low, high, metric=metric)}
+                selected = members if selected is None else selected & members
+            ranked = rank_subset(selected or [], periodo, metric=sort_by)
+            if ascending:
+                ranked.reverse()
+            ranked = ranked[:limit]
+        metrics = get_metrics_many([t for t, _ in ranked], periodo)
+    return [{"ticker": t, **metrics.get(t, {sort_by: score})} for t, score in ranked]
+
+
+_schedulers: Dict[str, threading.Thread] = {}
+_schedulers_lock = threading.Lock()
+
+
+def _refresh_loop(periodo: str, interval: int) -> None:
+    r = get_redis_connection()
+    while True:
+        # Lock no Redis: só uma réplica da aplicação atualiza por intervalo
+        if r.set(f"screener:lock:{periodo}", "1", ex=interval, nx=True):
+            try:
+                summary = refresh_universe(periodo)
+                logging.info(f"Screener atualizado ({periodo}): {summary['ok']} ok, {summary['failed']} falhas")
+            except Exception as exc:
+                logging.error(f"Falha na atualização agendada do screener: {exc}")
+        time.sleep(interval)
+
+
+def start_refresh_scheduler(periodo: str = "1y", interval: Optional[int] = None) -> None:
+    """Inicia (uma vez por período) a atualização periódica em thread daemon."""
+    interval = interval or int(os.getenv("SCREENER_REFRESH_INTERVAL", "21600"))
+    with _schedulers_lock:
+        if periodo in _schedulers:
+            return
+        thread = threading.Thread(target=_refresh_loop, args=(periodo, interval),
+                                  name=f"screener-{periodo}", daemon=True)
+        _schedulers[periodo] = thread
+        thread.start()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Screener de dividendos da B3.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ref = sub.add_parser("refresh", help="atualiza métricas de todo o universo")
+    ref.add_argument("--periodo", default="1y")
+    ref.add_argument("--limit", type=int, default=None, help="tamanho do universo")
+    ref.add_argument("--workers", type=int, default=None)
+    query = sub.add_parser("query", help="consulta os índices pré-computados")
+    query.add_argument("--periodo", default="1y")
+    query.add_argument("--sort-by", default="dividend_yield")
+    query.add_argument("--asc", action="store_true")
+    query.add_argument("--limit", type=int, default=20)
+    for name in FILTERS:
+        query.add_argument(f"--{name.replace('_', '-')}", dest=name, type=float, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        summary = refresh_universe(args.periodo, load_universe(args.limit), args.workers)
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0 if summary["ok"] else 1
+
+    filters = {name: getattr(args, name) for name in FILTERS}
+    rows = screen(args.periodo, args.sort_by, args.asc, args.limit, **filters)
+    for row in rows:
+        print(
+            f"{row['ticker']:<8} DY {row.get('dividend_yield', 0):6.2f}%  "
+            f"preço R$ {row.get('preco_atual', 0):8.2f}  pagamentos {int(row.get('quantidade_pagamentos', 0)):3d}  "
+            f"vol {row.get('volatilidade', 0):6.2f}%"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Gerador de dados de mercado sintéticos no formato da brapi.dev.
+
+O modo `FAKE_DATA=1` devolvia o mesmo payload de quatro cotações para
+qualquer ticker e período, sem `dividendsData` nem `regularMarketPrice`; os
+laços de dividendos do cálculo de métricas e o fallback de histórico nunca
+eram exercitados.  Este módulo gera, de forma determinística por semente e
+ticker:
+
+* anos de cotações diárias OHLCV (passeio aleatório geométrico, só dias úteis);
+* agenda de proventos (mensal, trimestral, semestral ou anual, alternando
+  dividendos e JCP) cobrindo o período pedido e anos anteriores;
+* os campos de cotação e fundamentos que a brapi devolve, com tamanho de
+  payload realista (~30 KB para `1y`, ~300 KB para `10y`).
+
+O mesmo gerador atende três usos:
+
+* `fetch_brapi_data` com `FAKE_DATA=1` (ver `core/data_loader.py`), passando
+  pelo mesmo caminho de código das requisições reais, inclusive o fallback
+  de histórico;
+* benchmarks (`benchmarks/fixtures.py`);
+* um servidor HTTP local que imita a brapi.dev::
+
+      python -m core.synthetic_data --port 8765
+      BRAPI_BASE_URL=http://localhost:8765 streamlit run app.py
+
+Variáveis de ambiente:
+
+    SYNTHETIC_SEED=42              semente do gerador
+    SYNTHETIC_LATENCY_MS=0         latência média simulada por requisição
+    SYNTHETIC_ERROR_RATE=0         fração de requisições que falham (HTTP 429/500)
+    SYNTHETIC_OMIT_HISTORY=0       1 = cotação sem histórico (força o fallback)
+    SYNTHETIC_UNIVERSE_SIZE=400    tickers em `GET /api/quote/list`
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Pregões por período aceito pela brapi (aproximado, 252 por ano)
+RANGE_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252,
+    "2y": 504, "5y": 1260, "10y": 2520, "max": 2520,
+}
+MAX_DAYS = RANGE_DAYS["max"]
+VALID_RANGES = list(RANGE_DAYS) + ["ytd"]
+VALID_INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"]
+
+# Pagamentos por ano possíveis para a agenda de proventos
+DIVIDEND_FREQUENCIES = (1, 2, 4, 12)
+
+
+class SyntheticHTTPError(Exception):
+    """Falha simulada da API (equivalente a um 429/500 da brapi)."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+def _seed() -> int:
+    return int(os.getenv("SYNTHETIC_SEED", "42"))
+
+
+def _trading_days(end: date, count: int) -> List[date]:
+    days: List[date] = []
+    current = end
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current)
+        current -= timedelta(days=1)
+    return days[::-1]
+
+
+def _range_days(periodo: str, today: date) -> int:
+    if periodo == "ytd":
+        start = date(today.year, 1, 1)
+        return max(1, sum(1 for i in range((today - start).days + 1) if (start + timedelta(days=i)).weekday() < 5))
+    return RANGE_DAYS.get(periodo, RANGE_DAYS["1y"])
+
+
+@functools.lru_cache(maxsize=512)
+def _profile(ticker: str, seed: int) -> Dict[str, Any]:
+    """Parâmetros fixos do ativo: preço inicial, volatilidade, yield e frequência."""
+    rng = random.Random(f"{seed}:{ticker}:profile")
+    return {
+        "start_price": rng.uniform(5, 80),
+        "drift": rng.uniform(-0.0003, 0.0003),
+        "volatility": rng.uniform(0.01, 0.03),
+        "annual_yield": rng.choice([0.0, 0.02, 0.04, 0.06, 0.08, 0.10, 0.12, 0.15]) * rng.uniform(0.8, 1.2),
+        "frequency": rng.choice(DIVIDEND_FREQUENCIES),
+        "volume": rng.uniform(2e5, 5e7),
+        "shares": rng.uniform(5e8, 1.2e10),
+    }
+
+
+@functools.lru_cache(maxsize=256)
+def _series(ticker: str, seed: int, today: date) -> Tuple[Tuple[int, float, float, float, float, int], ...]:
+    """Série diária completa (MAX_DAYS pregões) terminando em `today`.
+
+    Cada período é um recorte do fim desta série, então `1y` e `5y` do mesmo
+    ticker são consistentes entre si.
+    """
+    profile = _profile(ticker, seed)
+    rng = random.Random(f"{seed}:{ticker}:prices")
+    price = profile["start_price"]
+    rows = []
+    for day in _trading_days(today, MAX_DAYS):
+        open_ = price
+        price = max(0.5, price * math.exp(profile["drift"] + rng.gauss(0, profile["volatility"])))
+        spread = abs(rng.gauss(0, profile["volatility"] / 2))
+        high = max(open_, price) * (1 + spread)
+        low = min(open_, price) * (1 - spread)
+        timestamp = int(datetime.combine(day, dtime(13, 0), tzinfo=timezone.utc).timestamp())
+        volume = int(profile["volume"] * rng.lognormvariate(0, 0.4))
+        rows.append((timestamp, round(open_, 2), round(high, 2), round(low, 2), round(price, 2), volume))
+    return tuple(rows)
+
+
+def _dividends(ticker: str, seed: int, today: date, last_price: float) -> List[Dict[str, Any]]:
+    """Agenda de proventos dos últimos anos, do mais recente para o mais antigo."""
+    profile = _profile(ticker, seed)
+    if profile["annual_yield"] <= 0:
+        return []
+    rng = random.Random(f"{seed}:{ticker}:dividends")
+    frequency = profile["frequency"]
+    step = 365 / frequency
+    per_payment = last_price * profile["annual_yield"] / frequency
+    payments = []
+    years = 6
+    for i in range(frequency * years):
+        paid = today - timedelta(days=int(15 + i * step))
+        approved = paid - timedelta(days=rng.randint(20, 60))
+        label = "JCP" if i % 3 == 1 else "DIVIDENDO"
+        payments.append({
+            "assetIssued": f"BR{ticker[:4]}ACNOR{ticker[-1]}",
+            "paymentDate": f"{paid.isoformat()}T00:00:00.000Z",
+            "rate": round(per_payment * rng.uniform(0.7, 1.3), 6),
+            "relatedTo": f"{(paid.month - 1) // 3 + 1}º Trimestre/{paid.year}",
+            "approvedOn": f"{approved.isoformat()}T00:00:00.000Z",
+            "isinCode": f"BR{ticker[:4]}ACNOR{i % 10}",
+            "label": label,
+            "lastDatePrior": f"{(approved + timedelta(days=3)).isoformat()}T00:00:00.000Z",
+            "remarks": "",
+        })
+    return payments
+
+
+def generate_history(ticker: str, periodo: str = "1y", seed: Optional[int] = None,
+                     today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Cotações diárias OHLCV do período, no formato de `historicalDataPrice`."""
+    seed = _seed() if seed is None else seed
+    today = today or datetime.now(timezone.utc).date()
+    rows = _series(ticker.upper(), seed, today)[-_range_days(periodo, today):]
+    return [
+        {"date": ts, "open": o, "high": h, "low": l, "close": c, "volume": v, "adjustedClose": c}
+        for ts, o, h, l, c, v in rows
+    ]
+
+
+def generate_quote(ticker: str, periodo: str = "1y", seed: Optional[int] = None,
+                   fundamental: bool = True, dividends: bool = True,
+                   include_history: bool = True, today: Optional[date] = None) -> Dict[str, Any]:
+    """Payload completo de `GET /api/quote/{ticker}` para um ticker."""
+    ticker = ticker.upper()
+    seed = _seed() if seed is None else seed
+    today = today or datetime.now(timezone.utc).date()
+    profile = _profile(ticker, seed)
+    series = _series(ticker, seed, today)
+    last, previous = series[-1], series[-2]
+    year = series[-252:]
+    price = last[4]
+
+    result: Dict[str, Any] = {
+        "currency": "BRL",
+        "shortName": f"{ticker[:4]} ON",
+        "longName": f"{ticker[:4].title()} Participações S.A.",
+        "regularMarketChange": round(price - previous[4], 2),
+        "regularMarketChangePercent": round((price / previous[4] - 1) * 100, 4),
+        "regularMarketTime": datetime.fromtimestamp(last[0], timezone.utc).isoformat().replace("+00:00", ".000Z"),
+        "regularMarketPrice": price,
+        "regularMarketDayHigh": last[2],
+        "regularMarketDayRange": f"{last[3]} - {last[2]}",
+        "regularMarketDayLow": last[3],
+        "regularMarketVolume": last[5],
+        "regularMarketPreviousClose": previous[4],
+        "regularMarketOpen": last[1],
+        "fiftyTwoWeekRange": f"{min(r[3] for r in year)} - {max(r[2] for r in year)}",
+        "fiftyTwoWeekLow": min(r[3] for r in year),
+        "fiftyTwoWeekHigh": max(r[2] for r in year),
+        "symbol": ticker,
+        "logourl": f"https://icons.brapi.dev/icons/{ticker}.svg",
+        "usedInterval": "1d",
+        "usedRange": periodo,
+        "validRanges": VALID_RANGES,
+        "validIntervals": VALID_INTERVALS,
+    }
+    if fundamental:
+        eps = price * random.Random(f"{seed}:{ticker}:eps").uniform(0.03, 0.2)
+        result.update({
+            "marketCap": int(price * profile["shares"]),
+            "priceEarnings": round(price / eps, 4),
+            "earningsPerShare": round(eps, 4),
+        })
+    if include_history:
+        result["historicalDataPrice"] = generate_history(ticker, periodo, seed, today)
+    if dividends:
+        result["dividendsData"] = {
+            "cashDividends": _dividends(ticker, seed, today, price),
+            "stockDividends": [],
+            "subscriptions": [],
+        }
+    return {
+        "results": [result],
+        "requestedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "took": "0ms",
+    }
+
+
+# Códigos reais mais negociados; o restante do universo é gerado
+_KNOWN_TICKERS = [
+    "PETR4", "VALE3", "ITUB4", "BBDC4", "BBAS3", "ABEV3", "B3SA3", "WEGE3", "ITSA4", "SANB11",
+    "TAEE11", "CMIG4", "CPLE6", "EGIE3", "ELET3", "SBSP3", "TRPL4", "VIVT3", "KLBN11", "SUZB3",
+]
+_SECTORS = ["Finance", "Energy Minerals", "Utilities", "Non-Energy Minerals", "Retail Trade",
+            "Communications", "Consumer Non-Durables", "Transportation", "Health Services"]
+
+
+def generate_universe(size: Optional[int] = None, seed: Optional[int] = None) -> List[str]:
+    """Universo de tickers sintéticos (`SYNTHETIC_UNIVERSE_SIZE`, padrão 400)."""
+    size = size or int(os.getenv("SYNTHETIC_UNIVERSE_SIZE", "400"))
+    seed = _seed() if seed is None else seed
+    rng = random.Random(f"{seed}:universe")
+    tickers = list(_KNOWN_TICKERS[:size])
+    seen = set(tickers)
+    while len(tickers) < size:
+        code = "".join(rng.choice("ABCDEFGHIJKLMNOPRSTUVWXZ") for _ in range(4)) + rng.choice(["3", "4", "11"])
+        if code not in seen:
+            seen.add(code)
+            tickers.append(code)
+    return tickers
+
+
+def generate_list(limit: Optional[int] = None) -> Dict[str, Any]:
+    """Resposta de `GET /api/quote/list` para o universo sintético, por volume."""
+    seed = _seed()
+    today = datetime.now(timezone.utc).date()
+    stocks = []
+    for ticker in generate_universe(seed=seed):
+        profile = _profile(ticker, seed)
+        last = _series(ticker, seed, today)[-1]
+        stocks.append({
+            "stock": ticker,
+            "name": f"{ticker[:4]} ON",
+            "close": last[4],
+            "change": 0.0,
+            "volume": last[5],
+            "market_cap": int(last[4] * profile["shares"]),
+            "logo": f"https://icons.brapi.dev/icons/{ticker}.svg",
+            "sector": _SECTORS[int(profile["shares"]) % len(_SECTORS)],
+            "type": "stock",
+        })
+    stocks.sort(key=lambda item: item["volume"], reverse=True)
+    stocks = stocks[:limit] if limit else stocks
+    return {
+        "indexes": [],
+        "stocks": stocks,
+        "availableSectors": _SECTORS,
+        "availableStockTypes": ["stock", "fund", "bdr"],
+        "currentPage": 1,
+        "totalPages": 1,
+        "itemsPerPage": len(stocks),
+        "totalCount": len(stocks),
+        "hasNextPage": False,
+    }
+
+
+_fault_rng = random.Random(_seed())
+_fault_lock = threading.Lock()
+
+
+def _simulate_network() -> None:
+    """Aplica latência e falhas simuladas (SYNTHETIC_LATENCY_MS / SYNTHETIC_ERROR_RATE)."""
+    latency_ms = float(os.getenv("SYNTHETIC_LATENCY_MS", "0"))
+    error_rate = float(os.getenv("SYNTHETIC_ERROR_RATE", "0"))
+    with _fault_lock:
+        # Latência exponencial em torno da média: cauda longa como numa API real
+        delay = _fault_rng.expovariate(1000 / latency_ms) if latency_ms > 0 else 0.0
+        fail = error_rate > 0 and _fault_rng.random() < error_rate
+        status = _fault_rng.choice([429, 500, 502]) if fail else 200
+    if delay:
+        time.sleep(delay)
+    if fail:
+        raise SyntheticHTTPError(status, "Erro simulado pelo gerador sintético")
+
+
+def respond(url: str) -> Dict[str, Any]:
+    """Responde uma URL da brapi (`/api/quote/{tickers}?range=...`) com dados sintéticos.
+
+    Vários tickers separados por vírgula geram vários itens em `results`,
+    como na API real.
+    """
+    _simulate_network()
+    parsed = urlparse(url)
+    parts = [p for p in parsed.path.split("/") if p]
+    if len(parts) < 3 or parts[:2] != ["api", "quote"]:
+        raise SyntheticHTTPError(404, f"Rota não encontrada: {parsed.path}")
+    query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+    if parts[2] == "list":
+        return generate_list(int(query.get("limit", "0")) or None)
+    periodo = query.get("range", "1mo")
+    fundamental = query.get("fundamental") == "true"
+    omit_history = os.getenv("SYNTHETIC_OMIT_HISTORY") == "1" and fundamental
+    results = []
+    for ticker in parts[2].split(","):
+        payload = generate_quote(
+            ticker, periodo,
+            fundamental=fundamental,
+            dividends=query.get("dividends") == "true",
+            include_history=not omit_history,
+        )
+        results.extend(payload["results"])
+    return {**payload, "results": results}
+
+
+def _make_handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class _BrapiHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - nome exigido pela stdlib
+            try:
+                body = json.dumps(respond(self.path), ensure_ascii=False).encode("utf-8")
+                status = 200
+            except SyntheticHTTPError as exc:
+                body = json.dumps({"error": True, "message": str(exc)}).encode("utf-8")
+                status = exc.status
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            return
+
+    return _BrapiHandler
+
+
+def serve(port: int = 8765, host: str = "127.0.0.1"):
+    """Cria o servidor HTTP que imita a brapi.dev (chame `serve_forever()`)."""
+    from http.server import ThreadingHTTPServer
+
+    return ThreadingHTTPServer((host, port), _make_handler())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor local que imita a brapi.dev com dados sintéticos.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args(argv)
+    server = serve(args.port, args.host)
+    print(f"brapi sintética em http://{args.host}:{server.server_address[1]} (seed={_seed()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
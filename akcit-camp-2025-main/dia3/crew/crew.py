@@ -2,12 +2,25 @@
 
 Converte os agentes manuais (`insight_generator`, `advisor`, etc.)
 em Agents/Tasks CrewAI mantendo integrações existentes (cache, LLM).
+
+Os textos dos agentes e das tarefas são templates fixos (`AGENT_TEMPLATES`,
+`TASK_TEMPLATES`): o ticker e o período entram só nas descrições das
+tarefas, então o prompt de sistema de cada agente é o mesmo em todas as
+requisições.  O LLM roteado é criado uma vez por processo
+(`get_routed_llm`).  Os objetos `Agent` continuam sendo criados por Crew:
+a CrewAI amarra cada agente à sua Crew (`agent.crew`) e as análises rodam
+em paralelo, e `Crew.copy()` custa mais que montar a Crew do zero.
+
+Variáveis de ambiente:
+
+    CREW_VERBOSE=0   1 liga o log detalhado dos agentes no console
 """
 from __future__ import annotations
 
 import os
 import sys
-from typing import Dict, Any
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
 
 # Fix para SQLite antigo - CrewAI depende do ChromaDB que precisa do SQLite 3.35+
 try:
@@ -25,17 +38,48 @@ except Exception:  # pragma: no cover - fallback em ambientes sem crewai
     LLM = object  # type: ignore
 
 from .tools import (
-    fetch_brapi_data_tool, calc_dividend_metrics_tool, redis_get, get_metrics_from_cache,
+    cache_get_or_compute, fetch_brapi_data_tool, calc_dividend_metrics_tool, redis_get, get_metrics_from_cache,
     rank_tickers_by_dividend_yield, generate_dividend_pdf
 )
+from .schemas import DividendMetrics, RankingEntry, metrics_guardrail, ranking_guardrail, schema_hint
+from utils import cache_keys
+from utils.llm_router import RoutedLLM, router_enabled
+
+# Provedores suportados e a variável que indica se estão configurados
+PROVIDER_KEYS = {
+    "gemini": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+}
+
+# Provedores extras registrados em tempo de execução (ex.: LLM de replay dos benchmarks)
+_EXTRA_PROVIDERS: Dict[str, Callable[[], Any]] = {}
+
+# (preferido, provedores e chaves) -> LLM roteado, reaproveitado entre requisições
+_llm_cache: Dict[Tuple[Any, ...], Any] = {}
+_llm_lock = threading.Lock()
+
+
+def register_llm_provider(name: str, factory: Callable[[], Any]) -> None:
+    """Registra um provedor adicional aceito por `get_llm(name)`.
+
+    Usado pelos benchmarks para injetar um LLM determinístico sem tocar no
+    código das Crews (ver `benchmarks/replay_llm.py`).
+    """
+    _EXTRA_PROVIDERS[name] = factory
+    with _llm_lock:
+        _llm_cache.clear()
 
 
 def get_llm(provider: str = "gemini"):
     """Configura o LLM para usar Gemini ou OpenAI.
     
     Args:
-        provider: "gemini" (padrão) ou "openai"
+        provider: "gemini" (padrão), "openai" ou um provedor registrado
+            via `register_llm_provider`
     """
+    if provider in _EXTRA_PROVIDERS:
+        return _EXTRA_PROVIDERS[provider]()
+
     if provider == "gemini":
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -62,6 +106,240 @@ def get_llm(provider: str = "gemini"):
         raise ValueError(f"Provider '{provider}' não suportado. Use 'gemini' ou 'openai'.")
 
 
+def get_llm_candidates() -> list[str]:
+    """Lista os provedores com chave configurada no ambiente."""
+    return [name for name, env in PROVIDER_KEYS.items() if os.getenv(env)]
+
+
+def get_routed_llm(preferred: str = "gemini"):
+    """Retorna um LLM com roteamento entre provedores (failover + hedging).
+
+    O `preferred` continua sendo a escolha padrão do usuário; os demais
+    provedores configurados só são usados quando o preferido está lento ou
+    falhando (ver `utils/llm_router.py`).  Com o roteador desativado
+    (`LLM_ROUTER=0`) ou um único provedor, todas as chamadas vão para o
+    preferido, mas continuam medidas pela telemetria (`llm_call`).
+
+    Criar os clientes custa dezenas de milissegundos, então o LLM é montado
+    uma vez por processo para cada combinação de provedores e chaves.
+    """
+    candidates = get_llm_candidates()
+    if RoutedLLM is None or not router_enabled() or len(candidates) < 2 or preferred not in PROVIDER_KEYS:
+        candidates = [preferred]
+
+    # O preferido vem primeiro; se não estiver configurado, segue com os demais
+    ordered = sorted(candidates, key=lambda name: name != preferred)
+    cache_key = (preferred, RoutedLLM is None, tuple((name, os.getenv(PROVIDER_KEYS.get(name, ""))) for name in ordered))
+    with _llm_lock:
+        llm = _llm_cache.get(cache_key)
+        if llm is None:
+            if RoutedLLM is None:
+                llm = get_llm(preferred)
+            else:
+                llm = RoutedLLM(
+                    model="router/" + ",".join(ordered),
+                    preferred=preferred,
+                    candidates={name: get_llm(name) for name in ordered},
+                )
+            _llm_cache[cache_key] = llm
+    return llm
+
+
+def crew_verbose() -> bool:
+    """Log detalhado dos agentes (`CREW_VERBOSE=1`); desligado por padrão."""
+    return os.getenv("CREW_VERBOSE", "0") == "1"
+
+
+# Agentes: textos sem ticker, iguais em todas as requisições
+AGENT_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "data": {
+        "role": "Ingestor de Dados",
+        "goal": "Buscar dados da brapi.dev para o ticker e o período de cada tarefa",
+        "backstory": "Profissional focado em coleta de dados robusta e resiliente.",
+        "tools": [fetch_brapi_data_tool, redis_get],
+    },
+    "metrics": {
+        "role": "Calculador de Métricas de Dividendos",
+        "goal": "Calcular dividend yield e métricas relacionadas a dividendos a partir dos dados",
+        "backstory": "Analista quantitativo especializado em análise de dividendos que calcula dividend yield dos últimos 12 meses.",
+        "tools": [calc_dividend_metrics_tool],
+    },
+    "insight": {
+        "role": "Analista de Dividendos",
+        "goal": "Gerar insights sobre dividendos baseados em métricas",
+        "backstory": (
+            "Especialista em análise de dividendos que avalia a consistência,"
+            " regularidade e atratividade dos pagamentos de dividendos."
+        ),
+        "tools": [get_metrics_from_cache],
+    },
+    "advisor": {
+        "role": "Consultor de Dividendos",
+        "goal": "Recomendar compra se dividend yield > 7% ao ano",
+        "backstory": (
+            "Consultor especializado em investimentos focados em dividendos."
+            " Recomenda COMPRA quando dividend yield ultrapassa 7% ao ano,"
+            " considerando também a consistência dos pagamentos."
+        ),
+        "tools": [get_metrics_from_cache],
+    },
+    "comparator": {
+        "role": "Comparador de Dividendos",
+        "goal": "Comparar dividend yields e criar ranking de recomendações",
+        "backstory": (
+            "Especialista em análise comparativa de ações que identifica as melhores "
+            "oportunidades de investimento focado em dividendos."
+        ),
+        "tools": [rank_tickers_by_dividend_yield],
+    },
+    "pdf": {
+        "role": "Gerador de Relatórios",
+        "goal": "Criar relatório PDF profissional com análise comparativa",
+        "backstory": (
+            "Especialista em comunicação financeira que transforma análises técnicas "
+            "em relatórios visuais claros e profissionais."
+        ),
+        "tools": [generate_dividend_pdf],
+    },
+    "aggregate": {
+        "role": "Analista Comparativo de Dividendos",
+        "goal": "Comparar todos os tickers de uma carteira a partir de uma tabela de métricas pronta",
+        "backstory": (
+            "Analista de dividendos que recebe as métricas já calculadas e escreve, de uma vez,"
+            " a análise comparativa da carteira, sem recalcular números."
+        ),
+        "tools": [],
+    },
+}
+
+_METRICS_HINT = schema_hint(DividendMetrics)
+_RANKING_HINT = schema_hint(RankingEntry)
+
+# Tarefas: `{ticker}`, `{periodo}` e `{tickers}` são preenchidos por requisição
+TASK_TEMPLATES: Dict[str, Dict[str, str]] = {
+    "data": {
+        "description": (
+            "Use a ferramenta fetch_brapi_data_tool passando ticker='{ticker}' e periodo='{periodo}' "
+            "para buscar e salvar os dados no cache."
+        ),
+        "expected_output": "Mensagem confirmando que os dados de {ticker} foram salvos no cache",
+    },
+    "metrics": {
+        "description": (
+            "Use a ferramenta calc_dividend_metrics_tool passando ticker='{ticker}' e periodo='{periodo}' "
+            "para ler os dados do cache e calcular dividend yield e outras métricas. Retorne o JSON de métricas."
+        ),
+        "expected_output": "JSON string com métricas de {ticker} no formato " + _METRICS_HINT.replace("{", "{{").replace("}", "}}"),
+    },
+    "insight": {
+        "description": (
+            "1. Use get_metrics_from_cache(ticker='{ticker}', periodo='{periodo}') para obter as métricas de dividendos. "
+            "2. Analise: dividend_yield, consistência dos pagamentos, regularidade. "
+            "3. Crie uma análise em português sobre a qualidade dos dividendos."
+        ),
+        "expected_output": "Texto em português analisando os dividendos da empresa",
+    },
+    "advisor": {
+        "description": (
+            "1. Use get_metrics_from_cache(ticker='{ticker}', periodo='{periodo}') para obter as métricas. "
+            "2. REGRA CRÍTICA: Se dividend_yield > 7%, recomende COMPRA. Caso contrário, NÃO recomende compra. "
+            "3. Crie uma recomendação clara (COMPRAR/MANTER/VENDER) em português, "
+            "justificando com base no dividend yield e qualidade dos pagamentos."
+        ),
+        "expected_output": "Recomendação final em português (COMPRAR se DY > 7%)",
+    },
+    "comparator": {
+        "description": (
+            "1. Use rank_tickers_by_dividend_yield com tickers_list='{tickers}' e periodo='{periodo}' "
+            "2. Analise o ranking retornado e identifique as melhores oportunidades "
+            "3. Retorne o JSON do ranking completo"
+        ),
+        "expected_output": (
+            "Lista JSON ordenada por dividend yield, cada item no formato "
+            + _RANKING_HINT.replace("{", "{{").replace("}", "}}")
+        ),
+    },
+    "pdf": {
+        "description": (
+            "1. Receba o ranking JSON da tarefa anterior "
+            "2. Use generate_dividend_pdf passando o ranking como 'content' "
+            "3. Retorne a mensagem de sucesso com o caminho do arquivo"
+        ),
+        "expected_output": "Caminho do arquivo PDF gerado",
+    },
+    "aggregate": {
+        "description": (
+            "Pergunta do usuário: {question}\n\n"
+            "Métricas de dividendos no período {periodo}, já calculadas e ordenadas por dividend yield "
+            "(uma linha por ticker, colunas separadas por |):\n"
+            "dy=dividend yield 12m (%), preco=preço atual (R$), div12m=dividendos 12m (R$), "
+            "pagtos=pagamentos no período, vol=volatilidade (%), regra=COMPRAR se dy > 7, senão MANTER\n\n"
+            "{table}\n\n"
+            "Escreva em português uma análise comparativa de todos os tickers: destaque os melhores "
+            "pagadores, compare consistência e risco e dê a recomendação de cada um seguindo a coluna regra. "
+            "Use apenas os números da tabela."
+        ),
+        "expected_output": "Análise comparativa em português com a recomendação de cada ticker",
+    },
+}
+
+
+def _compact(value: Any) -> str:
+    number = float(value or 0)
+    return f"{number:.2f}".rstrip("0").rstrip(".") or "0"
+
+
+def format_metrics_table(metrics_by_ticker: Dict[str, Dict[str, Any]]) -> str:
+    """Tabela compacta das métricas para o prompt, ordenada por dividend yield.
+
+    O cabeçalho aparece uma vez e cada ticker ocupa uma linha separada por
+    `|`, com números de até duas casas: bem menos tokens que um JSON por
+    ticker, que repete todas as chaves.
+
+        ticker|dy|preco|div12m|pagtos|vol|regra
+        PETR4|10.87|38.2|4.15|4|25.3|COMPRAR
+    """
+    lines = ["ticker|dy|preco|div12m|pagtos|vol|regra"]
+    ordered = sorted(metrics_by_ticker.items(), key=lambda item: item[1].get("dividend_yield", 0), reverse=True)
+    for ticker, metrics in ordered:
+        dy = metrics.get("dividend_yield", 0)
+        lines.append("|".join([
+            ticker,
+            _compact(dy),
+            _compact(metrics.get("preco_atual")),
+            _compact(metrics.get("dividendos_12m")),
+            str(int(metrics.get("quantidade_pagamentos", 0))),
+            _compact(metrics.get("volatilidade")),
+            "COMPRAR" if dy > 7.0 else "MANTER",
+        ]))
+    return "\n".join(lines)
+
+
+def _agent(name: str, llm: Any) -> Agent:
+    template = AGENT_TEMPLATES[name]
+    return Agent(
+        role=template["role"],
+        goal=template["goal"],
+        backstory=template["backstory"],
+        tools=list(template["tools"]),
+        verbose=crew_verbose(),
+        allow_delegation=False,
+        llm=llm,
+    )
+
+
+def _task(name: str, agent: Any, params: Dict[str, str], label: Optional[str] = None, **kwargs: Any) -> Task:
+    """Tarefa a partir do template; `label` vira o nome (ex.: "Dados - PETR4")."""
+    template = TASK_TEMPLATES[name]
+    return Task(
+        description=template["description"].format(**params),
+        expected_output=template["expected_output"].format(**params),
+        agent=agent,
+        name=label,
+        **kwargs,
+    )
+
+
 def build_insight_prompt(metrics: Dict[str, float], ticker: str, context: list[str]) -> str:
     lines: list[str] = []
     lines.append(
@@ -136,107 +414,27 @@ def create_finance_crew(ticker: str, periodo: str, llm_provider: str = "gemini")
     Args:
         ticker: Código da ação
         periodo: Período de análise
-        llm_provider: "gemini" (padrão) ou "openai"
+        llm_provider: "gemini" (padrão) ou "openai" — preferência do roteador de LLMs
     """
-    llm = get_llm(llm_provider)
-    
-    data_agent = Agent(
-        role="Ingestor de Dados",
-        goal=f"Buscar dados da brapi.dev para {ticker} período {periodo}",
-        backstory="Profissional focado em coleta de dados robusta e resiliente.",
-        tools=[fetch_brapi_data_tool, redis_get],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
+    llm = get_routed_llm(llm_provider)
+    params = {"ticker": ticker, "periodo": periodo}
+    agents = {name: _agent(name, llm) for name in ("data", "metrics", "insight", "advisor")}
 
-    metrics_agent = Agent(
-        role="Calculador de Métricas de Dividendos",
-        goal="Calcular dividend yield e métricas relacionadas a dividendos a partir dos dados",
-        backstory="Analista quantitativo especializado em análise de dividendos que calcula dividend yield dos últimos 12 meses.",
-        tools=[calc_dividend_metrics_tool],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-
-    insight_agent = Agent(
-        role="Analista de Dividendos",
-        goal="Gerar insights sobre dividendos baseados em métricas",
-        backstory=(
-            "Especialista em análise de dividendos que avalia a consistência,"
-            " regularidade e atratividade dos pagamentos de dividendos."
-        ),
-        tools=[get_metrics_from_cache],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-
-    advisor_agent = Agent(
-        role="Consultor de Dividendos",
-        goal="Recomendar compra se dividend yield > 7% ao ano",
-        backstory=(
-            "Consultor especializado em investimentos focados em dividendos."
-            " Recomenda COMPRA quando dividend yield ultrapassa 7% ao ano,"
-            " considerando também a consistência dos pagamentos."
-        ),
-        tools=[get_metrics_from_cache],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-
-    data_task = Task(
-        description=f"Use a ferramenta fetch_brapi_data_tool passando ticker='{ticker}' e periodo='{periodo}' para buscar e salvar os dados no cache.",
-        expected_output=f"Mensagem confirmando que os dados de {ticker} foram salvos no cache",
-        agent=data_agent,
-    )
+    data_task = _task("data", agents["data"], params)
+    metrics_task = _task("metrics", agents["metrics"], params, context=[data_task], guardrail=metrics_guardrail)
+    insight_task = _task("insight", agents["insight"], params, context=[metrics_task])
+    advisor_task = _task("advisor", agents["advisor"], params, context=[metrics_task, insight_task])
 
-    metrics_task = Task(
-        description=(
-            f"Use a ferramenta calc_dividend_metrics_tool passando ticker='{ticker}' e periodo='{periodo}' "
-            f"para ler os dados do cache e calcular dividend yield e outras métricas. Retorne o JSON de métricas."
-        ),
-        expected_output="JSON string com métricas: dividend_yield, preco_atual, dividendos_12m, quantidade_pagamentos",
-        agent=metrics_agent,
-        context=[data_task],
-    )
-
-    insight_task = Task(
-        description=(
-            f"1. Use get_metrics_from_cache(ticker='{ticker}', periodo='{periodo}') para obter as métricas de dividendos. "
-            f"2. Analise: dividend_yield, consistência dos pagamentos, regularidade. "
-            f"3. Crie uma análise em português sobre a qualidade dos dividendos."
-        ),
-        expected_output="Texto em português analisando os dividendos da empresa",
-        agent=insight_agent,
-        context=[metrics_task],
-    )
-
-    advisor_task = Task(
-        description=(
-            f"1. Use get_metrics_from_cache(ticker='{ticker}', periodo='{periodo}') para obter as métricas. "
-            f"2. REGRA CRÍTICA: Se dividend_yield > 7%, recomende COMPRA. Caso contrário, NÃO recomende compra. "
-            f"3. Crie uma recomendação clara (COMPRAR/MANTER/VENDER) em português, "
-            f"justificando com base no dividend yield e qualidade dos pagamentos."
-        ),
-        expected_output="Recomendação final em português (COMPRAR se DY > 7%)",
-        agent=advisor_agent,
-        context=[metrics_task, insight_task],
-    )
-
-    crew = Crew(
-        agents=[data_agent, metrics_agent, insight_agent, advisor_agent],
+    return Crew(
+        agents=list(agents.values()),
         tasks=[data_task, metrics_task, insight_task, advisor_task],
-        verbose=True,
+        verbose=crew_verbose(),
     )
-    return crew
 
 
 def run_insights(ticker: str, periodo: str, metrics: Dict[str, float]) -> str:
     """Executa apenas a tarefa de insights usando as ferramentas com cache."""
-    cache_key = f"insights:{ticker}:{periodo}"
+    cache_key = cache_keys.key("insights", ticker, periodo)
     prompt = build_insight_prompt(metrics, ticker, [])
     insights = cache_get_or_compute.run(cache_key, compute_prompt=prompt)  # type: ignore[attr-defined]
     return str(insights)
@@ -244,7 +442,7 @@ def run_insights(ticker: str, periodo: str, metrics: Dict[str, float]) -> str:
 
 def run_recommendation(ticker: str, periodo: str, metrics: Dict[str, float], insights: str) -> str:
     """Executa apenas a tarefa de recomendação usando as ferramentas com cache."""
-    cache_key = f"recommendation:{ticker}:{periodo}"
+    cache_key = cache_keys.key("recommendation", ticker, periodo)
     prompt = build_advisor_prompt(ticker, periodo, metrics, insights, [])
     texto = cache_get_or_compute.run(cache_key, compute_prompt=prompt)  # type: ignore[attr-defined]
     return str(texto)
@@ -262,112 +460,58 @@ def create_multi_ticker_crew(tickers: list[str], periodo: str, llm_provider: str
     Args:
         tickers: Lista de tickers a analisar (ex: ["PETR4", "VALE3", "ITUB4", "BBDC4"])
         periodo: Período de análise
-        llm_provider: "gemini" (padrão) ou "openai"
+        llm_provider: "gemini" (padrão) ou "openai" — preferência do roteador de LLMs
     """
-    llm = get_llm(llm_provider)
-    
-    all_agents = []
-    all_tasks = []
-    
-    # Cria agentes de data e métricas para cada ticker
+    llm = get_routed_llm(llm_provider)
+    data_agent = _agent("data", llm)
+    metrics_agent = _agent("metrics", llm)
+    comparator_agent = _agent("comparator", llm)
+    pdf_agent = _agent("pdf", llm)
+
+    # Os mesmos agentes de dados e métricas atendem todos os tickers;
+    # o nome de cada tarefa identifica o ticker (ex.: "Dados - PETR4")
+    ticker_tasks = []
     for ticker in tickers:
-        data_agent = Agent(
-            role=f"Ingestor de Dados - {ticker}",
-            goal=f"Buscar dados da brapi.dev para {ticker} período {periodo}",
-            backstory=f"Especialista em coleta de dados de {ticker}.",
-            tools=[fetch_brapi_data_tool],
-            verbose=True,
-            allow_delegation=False,
-            llm=llm,
-        )
-        
-        metrics_agent = Agent(
-            role=f"Calculador de Métricas - {ticker}",
-            goal=f"Calcular dividend yield para {ticker}",
-            backstory=f"Analista quantitativo especializado em dividendos de {ticker}.",
-            tools=[calc_dividend_metrics_tool],
-            verbose=True,
-            allow_delegation=False,
-            llm=llm,
-        )
-        
-        data_task = Task(
-            description=f"Use fetch_brapi_data_tool com ticker='{ticker}' e periodo='{periodo}'",
-            expected_output=f"Confirmação de que dados de {ticker} foram salvos",
-            agent=data_agent,
-        )
-        
-        metrics_task = Task(
-            description=f"Use calc_dividend_metrics_tool com ticker='{ticker}' e periodo='{periodo}'",
-            expected_output=f"JSON com métricas de dividendos de {ticker}",
-            agent=metrics_agent,
-            context=[data_task],
-        )
-        
-        all_agents.extend([data_agent, metrics_agent])
-        all_tasks.extend([data_task, metrics_task])
-    
-    # Agente Comparador
-    comparator_agent = Agent(
-        role="Comparador de Dividendos",
-        goal="Comparar dividend yields e criar ranking de recomendações",
-        backstory=(
-            "Especialista em análise comparativa de ações que identifica as melhores "
-            "oportunidades de investimento focado em dividendos."
-        ),
-        tools=[rank_tickers_by_dividend_yield],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-    
-    tickers_str = ",".join(tickers)
-    comparator_task = Task(
-        description=(
-            f"1. Use rank_tickers_by_dividend_yield com tickers_list='{tickers_str}' e periodo='{periodo}' "
-            f"2. Analise o ranking retornado e identifique as melhores oportunidades "
-            f"3. Retorne o JSON do ranking completo"
-        ),
-        expected_output="JSON com ranking ordenado por dividend yield",
-        agent=comparator_agent,
-        context=all_tasks,  # Depende de todas as tarefas de métricas
-    )
-    
-    # Agente Gerador de PDF
-    pdf_agent = Agent(
-        role="Gerador de Relatórios",
-        goal="Criar relatório PDF profissional com análise comparativa",
-        backstory=(
-            "Especialista em comunicação financeira que transforma análises técnicas "
-            "em relatórios visuais claros e profissionais."
-        ),
-        tools=[generate_dividend_pdf],
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-    
-    pdf_task = Task(
-        description=(
-            f"1. Receba o ranking JSON da tarefa anterior "
-            f"2. Use generate_dividend_pdf passando o ranking como 'content' "
-            f"3. Use o nome de arquivo 'ranking_dividendos_{periodo}.pdf' "
-            f"4. Retorne a mensagem de sucesso com o caminho do arquivo"
-        ),
-        expected_output="Caminho do arquivo PDF gerado",
-        agent=pdf_agent,
-        context=[comparator_task],
-    )
-    
-    all_agents.extend([comparator_agent, pdf_agent])
-    all_tasks.extend([comparator_task, pdf_task])
-    
-    crew = Crew(
-        agents=all_agents,
-        tasks=all_tasks,
-        verbose=True,
+        params = {"ticker": ticker, "periodo": periodo}
+        data_task = _task("data", data_agent, params, label=f"Dados - {ticker}")
+        metrics_task = _task("metrics", metrics_agent, params, label=f"Métricas - {ticker}",
+                             context=[data_task], guardrail=metrics_guardrail)
+        ticker_tasks.extend([data_task, metrics_task])
+
+    params = {"tickers": ",".join(tickers), "periodo": periodo}
+    comparator_task = _task("comparator", comparator_agent, params,
+                            context=ticker_tasks,  # Depende de todas as tarefas de métricas
+                            guardrail=ranking_guardrail)
+    pdf_task = _task("pdf", pdf_agent, params, context=[comparator_task])
+
+    return Crew(
+        agents=[data_agent, metrics_agent, comparator_agent, pdf_agent],
+        tasks=[*ticker_tasks, comparator_task, pdf_task],
+        verbose=crew_verbose(),
     )
-    
-    return crew
 
 
+def create_aggregate_crew(metrics_by_ticker: Dict[str, Dict[str, Any]], periodo: str, user_question: str,
+                          llm_provider: str = "gemini") -> Crew:
+    """Crew de uma única tarefa que compara todos os tickers em uma chamada ao LLM.
+
+    As métricas chegam prontas (calculadas sem LLM, `core/metrics.py`) e
+    entram no prompt como tabela compacta (`format_metrics_table`); o
+    agente não tem ferramentas, então o custo de LLM é constante, não
+    proporcional ao número de tickers.
+
+    Args:
+        metrics_by_ticker: ticker -> métricas (formato de `DividendMetrics`)
+        periodo: Período de análise
+        user_question: Pergunta do usuário, repassada ao analista
+        llm_provider: "gemini" (padrão) ou "openai" — preferência do roteador de LLMs
+    """
+    llm = get_routed_llm(llm_provider)
+    agent = _agent("aggregate", llm)
+    params = {
+        "periodo": periodo,
+        "question": user_question or "Compare os dividendos destas ações.",
+        "table": format_metrics_table(metrics_by_ticker),
+    }
+    task = _task("aggregate", agent, params, label="Comparativo")
+    return Crew(agents=[agent], tasks=[task], verbose=crew_verbose())
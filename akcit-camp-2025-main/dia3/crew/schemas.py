@@ -0,0 +1,216 @@
+"""
+Esquemas Pydantic e reparo de JSON para as saídas estruturadas da Crew.
+
+As tarefas de métricas e de comparação pedem ao LLM que "retorne o JSON",
+mas o texto devolvido costuma vir embrulhado em blocos markdown, com
+vírgulas sobrando, aspas simples ou números formatados ("7,5%").  Cada
+falha de parsing virava uma nova rodada de LLM (retry da tarefa) ou fazia
+o `generate_dividend_pdf` cair no modo texto.
+
+Este módulo define os modelos de `DividendMetrics` e `RankingEntry` e uma
+etapa de *parse → valida → repara* puramente local: tudo o que pode ser
+consertado é consertado aqui, sem chamar o LLM novamente.  Os guardrails
+`metrics_guardrail` e `ranking_guardrail` expõem isso para as Tasks da
+CrewAI: devolvem o JSON canônico quando conseguem reparar e só sinalizam
+falha (o que provoca retry) para saídas realmente irrecuperáveis.
+"""
+import ast
+import json
+import re
+from typing import Any, List, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
+
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)*")
+
+
+def _to_number(value: Any) -> Any:
+    """Converte strings como '7,5%', 'R$ 10.20', '1.234,56' ou '1,234.56' em float."""
+    if isinstance(value, (int, float)) or value is None:
+        return value if value is not None else 0.0
+    if isinstance(value, str):
+        match = _NUMBER_RE.search(value.replace(" ", ""))
+        if not match:
+            return value
+        num = match.group(0)
+        if "," in num and "." in num:
+            # O último separador é o decimal: '1.234,56' (brasileiro) ou '1,234.56' (americano)
+            if num.rfind(",") > num.rfind("."):
+                num = num.replace(".", "").replace(",", ".")
+            else:
+                num = num.replace(",", "")
+        else:
+            num = num.replace(",", ".")
+        try:
+            return float(num)
+        except ValueError:
+            return value
+    return value
+
+
+class DividendMetrics(BaseModel):
+    """Métricas de dividendos de um ticker (saída de `calc_metrics_from_raw`)."""
+
+    dividend_yield: float = 0.0
+    preco_atual: float = 0.0
+    dividendos_12m: float = 0.0
+    quantidade_pagamentos: float = 0.0
+    volatilidade: float = 0.0
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _coerce_number(cls, value: Any) -> Any:
+        return _to_number(value)
+
+
+class RankingEntry(BaseModel):
+    """Uma linha do ranking comparativo por dividend yield."""
+
+    ticker: str
+    dividend_yield: float = 0.0
+    preco_atual: float = 0.0
+    dividendos_12m: float = 0.0
+    quantidade_pagamentos: int = 0
+    recomendacao: str = "MANTER"
+
+    @field_validator("dividend_yield", "preco_atual", "dividendos_12m", mode="before")
+    @classmethod
+    def _coerce_number(cls, value: Any) -> Any:
+        return _to_number(value)
+
+    @field_validator("quantidade_pagamentos", mode="before")
+    @classmethod
+    def _coerce_int(cls, value: Any) -> Any:
+        value = _to_number(value)
+        return int(value) if isinstance(value, float) else value
+
+    @field_validator("ticker", "recomendacao", mode="before")
+    @classmethod
+    def _upper(cls, value: Any) -> Any:
+        return value.strip().upper() if isinstance(value, str) else value
+
+
+_RANKING_ADAPTER = TypeAdapter(List[RankingEntry])
+
+
+def schema_hint(model: type[BaseModel]) -> str:
+    """Resumo compacto dos campos do modelo para usar em `expected_output`."""
+    fields = ", ".join(
+        f'"{name}": {getattr(info.annotation, "__name__", str(info.annotation))}'
+        for name, info in model.model_fields.items()
+    )
+    return "{" + fields + "}"
+
+
+def _extract_candidate(text: str) -> str:
+    """Isola o trecho JSON: remove blocos markdown e texto ao redor."""
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text.strip()
+    start = min(starts)
+    closer = "}" if text[start] == "{" else "]"
+    end = text.rfind(closer)
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def repair_json(text: str) -> Any:
+    """Tenta converter uma saída de LLM em JSON, consertando erros comuns.
+
+    Aplica, em ordem: extração do bloco JSON, `json.loads` direto, remoção
+    de vírgulas finais e aspas tipográficas e, por fim, `ast.literal_eval`
+    (que aceita aspas simples e literais Python como True/None).
+
+    Raises:
+        ValueError: se nenhuma das estratégias produzir um valor válido.
+    """
+    if not isinstance(text, str):
+        return text
+    candidate = _extract_candidate(text)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    fixed = (
+        candidate.replace("“", '"').replace("”", '"')
+        .replace("‘", "'").replace("’", "'")
+    )
+    fixed = _TRAILING_COMMA_RE.sub(r"\1", fixed)
+    try:
+        return json.loads(fixed)
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        pythonish = re.sub(r"\btrue\b", "True", fixed)
+        pythonish = re.sub(r"\bfalse\b", "False", pythonish)
+        pythonish = re.sub(r"\bnull\b", "None", pythonish)
+        return ast.literal_eval(pythonish)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError) as exc:
+        raise ValueError(f"Não foi possível reparar o JSON: {exc}") from exc
+
+
+def parse_metrics(text: Any) -> DividendMetrics:
+    """Converte a saída (texto ou dict) em `DividendMetrics` validado."""
+    data = repair_json(text) if isinstance(text, str) else text
+    if isinstance(data, dict) and "metrics" in data and isinstance(data["metrics"], dict):
+        data = data["metrics"]
+    # Os campos têm padrão 0.0: sem esta checagem, o `{"error": ...}` da
+    # ferramenta (dados ausentes) viraria um dividend yield de 0%
+    if isinstance(data, dict) and data.get("error"):
+        raise ValueError(f"A ferramenta retornou erro: {data['error']}")
+    if isinstance(data, dict) and not set(data) & set(DividendMetrics.model_fields):
+        raise ValueError("Nenhuma métrica no JSON")
+    try:
+        return DividendMetrics.model_validate(data)
+    except ValidationError as exc:
+        raise ValueError(f"Métricas fora do esquema: {exc}") from exc
+
+
+def parse_ranking(text: Any) -> List[RankingEntry]:
+    """Converte a saída (texto ou lista) em ranking validado e ordenado por DY."""
+    data = repair_json(text) if isinstance(text, str) else text
+    if isinstance(data, dict):
+        # Aceita {"ranking": [...]} ou um único item
+        data = data.get("ranking", [data])
+    try:
+        entries = _RANKING_ADAPTER.validate_python(data)
+    except ValidationError as exc:
+        raise ValueError(f"Ranking fora do esquema: {exc}") from exc
+    entries.sort(key=lambda e: e.dividend_yield, reverse=True)
+    return entries
+
+
+def dump_ranking(entries: List[RankingEntry]) -> str:
+    """Serializa o ranking no formato canônico usado entre as tarefas."""
+    return json.dumps([e.model_dump() for e in entries], ensure_ascii=False, indent=2)
+
+
+def _raw(output: Any) -> str:
+    return getattr(output, "raw", output)
+
+
+def metrics_guardrail(output: Any) -> Tuple[bool, Any]:
+    """Guardrail CrewAI: repara e valida o JSON de métricas sem chamar o LLM."""
+    try:
+        metrics = parse_metrics(_raw(output))
+    except (ValueError, TypeError, SyntaxError) as exc:
+        return False, f"Retorne apenas o JSON no formato {schema_hint(DividendMetrics)}. Erro: {exc}"
+    return True, metrics.model_dump_json()
+
+
+def ranking_guardrail(output: Any) -> Tuple[bool, Any]:
+    """Guardrail CrewAI: repara e valida o JSON do ranking sem chamar o LLM."""
+    try:
+        entries = parse_ranking(_raw(output))
+    except (ValueError, TypeError, SyntaxError) as exc:
+        return False, f"Retorne apenas a lista JSON no formato [{schema_hint(RankingEntry)}]. Erro: {exc}"
+    if not entries:
+        return False, "O ranking está vazio; use rank_tickers_by_dividend_yield para obtê-lo."
+    return True, dump_ranking(entries)
@@ -1,53 +1,86 @@
 """
 Finance Advisor - Dividend Analyst
 Análise multi-ticker de dividendos com geração de PDF
+
+Uso:
+    python main.py                              # carteiras padrão abaixo
+    python main.py --file carteiras.yaml        # carteiras de um YAML/CSV
+    python main.py --workers 2 --provider gemini
 """
-from .core.orchestrator import analyze_multi_tickers
+import argparse
+import logging
+import os
+import re
+
+from core.batch import format_report, load_portfolios, run_batch
+from core.orchestrator import init_observability
+from core.reports import get_report
+
+# Combinações de análise padrão
+CARTEIRAS = [
+    {
+        "nome": "Blue Chips",
+        "tickers": ["PETR4", "VALE3", "ITUB4", "BBDC4"]
+    },
+    {
+        "nome": "Utilities + Energia",
+        "tickers": ["ELET3", "ENBR3", "TAEE11", "CPLE6"]
+    },
+    {
+        "nome": "Top Dividendos",
+        "tickers": ["PETR4", "VALE3", "BBAS3"]
+    }
+]
+
+
+def salvar_pdf(resultado, out_dir):
+    """Grava o PDF da carteira (bytes do cache de relatórios) em `out_dir`."""
+    pdf = get_report(resultado["report_key"])  # antes de abrir o arquivo: falha não deixa PDF vazio
+    os.makedirs(out_dir, exist_ok=True)
+    slug = re.sub(r"[^a-z0-9]+", "_", resultado["nome"].lower()).strip("_")
+    path = os.path.join(out_dir, f"{slug}.pdf")
+    with open(path, "wb") as fh:
+        fh.write(pdf)
+    return path
 
 
 def main():
     """Executa análises comparativas de dividendos para diferentes carteiras."""
-    
-    # Configuração
-    periodo = "1y"
-    llm_provider = "openai"  # ou "gemini"
-    
-    # Combinações de análise
-    carteiras = [
-        {
-            "nome": "Blue Chips",
-            "tickers": ["PETR4", "VALE3", "ITUB4", "BBDC4"]
-        },
-        {
-            "nome": "Utilities + Energia",
-            "tickers": ["ELET3", "ENBR3", "TAEE11", "CPLE6"]
-        },
-        {
-            "nome": "Top Dividendos",
-            "tickers": ["PETR4", "VALE3", "BBAS3"]
-        }
-    ]
-    
-    # Executa análises
-    for carteira in carteiras:
-        print(f"\n{'='*80}")
-        print(f"📊 ANÁLISE: {carteira['nome']}")
-        print(f"{'='*80}\n")
-        
-        try:
-            pdf_path = analyze_multi_tickers(
-                tickers=carteira["tickers"],
-                periodo=periodo,
-                user_question=f"Análise de dividendos - {carteira['nome']}",
-                user_id="batch_analysis",
-                llm_provider=llm_provider
-            )
-            print(f"\n✅ Análise concluída!")
-            print(f"📄 PDF: {pdf_path}\n")
-            
-        except Exception as e:
-            print(f"\n❌ Erro na análise de {carteira['nome']}: {e}\n")
+    parser = argparse.ArgumentParser(description="Análise de dividendos em lote.")
+    parser.add_argument("--file", help="carteiras em YAML ou CSV (padrão: carteiras embutidas)")
+    parser.add_argument("--periodo", default="1y")
+    parser.add_argument("--provider", default="openai", help="openai ou gemini")
+    parser.add_argument("--workers", type=int, default=None, help="carteiras simultâneas")
+    parser.add_argument("--out", default="reports", help="diretório dos PDFs")
+    parser.add_argument("--mode", choices=["crew", "aggregate"], default=None,
+                        help="crew (agentes por ticker) ou aggregate (uma chamada ao LLM por carteira)")
+    args = parser.parse_args()
+
+    init_observability()
+    carteiras = load_portfolios(args.file) if args.file else CARTEIRAS
+
+    print(f"\n{'='*80}")
+    print(f"📊 ANÁLISE EM LOTE: {len(carteiras)} carteiras ({args.periodo})")
+    print(f"{'='*80}\n")
+
+    report = run_batch(carteiras, periodo=args.periodo, llm_provider=args.provider, max_workers=args.workers,
+                       mode=args.mode)
+
+    for resultado in report["carteiras"]:
+        if resultado["ok"]:
+            print(f"\n✅ {resultado['nome']} concluída em {resultado['latency_s']}s")
+            if resultado["report_key"]:
+                # Um PDF que falhou (expirado ou erro de renderização) não interrompe o lote
+                try:
+                    print(f"📄 PDF: {salvar_pdf(resultado, args.out)}\n")
+                except Exception as exc:
+                    logging.error(f"Falha ao gerar o PDF de {resultado['nome']}: {exc}")
+                    print("⚠️ PDF indisponível para esta carteira.\n")
+        else:
+            print(f"\n❌ Erro na análise de {resultado['nome']}: {resultado['erro']}\n")
+
+    print(format_report(report))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -21,15 +21,18 @@ Nota: Para usar este módulo, certifique‑se de que um servidor Redis
 esteja acessível e que as variáveis REDIS_HOST e REDIS_PORT estejam
 definidas no arquivo `.env`.
 """
+import bisect
 import json
 import os
+import threading
 import time
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-try:
-    import redis  # type: ignore
-except Exception:
-    redis = None  # type: ignore
+from utils.telemetry import telemetry_enabled, timed
+
+# O cliente redis-py (com seu submódulo asyncio) é a parte mais cara do
+# import deste módulo; ele só é carregado ao abrir a primeira conexão.
+redis = None  # type: ignore
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -40,10 +43,67 @@ except ImportError:
 
 
 _in_memory_store = {}
+_in_memory_lock = threading.RLock()
+
+
+def _parse_bound(value: Union[str, float, int]) -> Tuple[float, bool]:
+    """Converte limites no formato do Redis ("-inf", "+inf", "(7") em (valor, exclusivo)."""
+    if isinstance(value, str):
+        exclusive = value.startswith("(")
+        return float(value[1:] if exclusive else value), exclusive
+    return float(value), False
+
+
+class _SortedSet:
+    """Sorted set em memória: dicionário membro->score + lista ordenada (bisect)."""
+
+    def __init__(self) -> None:
+        self.scores: Dict[str, float] = {}
+        self.ordered: List[Tuple[float, str]] = []
+
+    def add(self, member: str, score: float) -> bool:
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            self.ordered.pop(bisect.bisect_left(self.ordered, (old, member)))
+        self.scores[member] = score
+        bisect.insort(self.ordered, (score, member))
+        return old is None
+
+    def remove(self, member: str) -> bool:
+        old = self.scores.pop(member, None)
+        if old is None:
+            return False
+        self.ordered.pop(bisect.bisect_left(self.ordered, (old, member)))
+        return True
+
+    def by_score(self, low: Tuple[float, bool], high: Tuple[float, bool]) -> List[Tuple[float, str]]:
+        lo_value, lo_excl = low
+        hi_value, hi_excl = high
+        if lo_excl:
+            start = bisect.bisect_right(self.ordered, (lo_value, "\U0010ffff"))
+        else:
+            start = bisect.bisect_left(self.ordered, (lo_value, ""))
+        if hi_excl:
+            end = bisect.bisect_left(self.ordered, (hi_value, ""))
+        else:
+            end = bisect.bisect_right(self.ordered, (hi_value, "\U0010ffff"))
+        return self.ordered[start:end]
+
+
+def _slice(items: List[Any], start: Optional[int], num: Optional[int]) -> List[Any]:
+    if start is None or num is None:
+        return items
+    return items[start:start + num] if num >= 0 else items[start:]
+
+
+def _with_scores(items: List[Tuple[float, str]], withscores: bool) -> List[Any]:
+    return [(member, score) for score, member in items] if withscores else [member for _, member in items]
 
 
 class InMemoryRedis:
-    def get(self, key: str):
+    def _alive(self, key: str):
         item = _in_memory_store.get(key)
         if not item:
             return None
@@ -53,9 +113,27 @@ class InMemoryRedis:
             return None
         return value
 
-    def set(self, key: str, value: str, ex=None) -> None:
-        expiry = time.time() + ex if ex else None
-        _in_memory_store[key] = (value, expiry)
+    def get(self, key: str):
+        value = self._alive(key)
+        return value if isinstance(value, str) else None
+
+    def set(self, key: str, value: str, ex=None, nx: bool = False):
+        with _in_memory_lock:
+            if nx and self._alive(key) is not None:
+                return None
+            expiry = time.time() + ex if ex else None
+            _in_memory_store[key] = (value, expiry)
+            return True
+
+    def mget(self, keys: Iterable[str], *args: str) -> List[Optional[str]]:
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return [self.get(k) for k in [*keys, *args]]
+
+    def exists(self, *keys: str) -> int:
+        return sum(1 for k in keys if self._alive(k) is not None)
+
+    def delete(self, *keys: str) -> int:
+        return sum(1 for k in keys if _in_memory_store.pop(k, None) is not None)
 
     def incr(self, key: str) -> int:
         current = self.get(key)
@@ -74,21 +152,244 @@ class InMemoryRedis:
         value, _ = item
         _in_memory_store[key] = (value, time.time() + seconds)
 
+    # --- Conjuntos (SADD/SMEMBERS/SREM) ---
+
+    def sadd(self, key: str, *members: str) -> int:
+        with _in_memory_lock:
+            value = self._alive(key)
+            if not isinstance(value, set):
+                value = set()
+                _in_memory_store[key] = (value, None)
+            added = len(set(members) - value)
+            value.update(members)
+            return added
+
+    def smembers(self, key: str) -> set:
+        value = self._alive(key)
+        return set(value) if isinstance(value, set) else set()
+
+    def srem(self, key: str, *members: str) -> int:
+        with _in_memory_lock:
+            value = self._alive(key)
+            if not isinstance(value, set):
+                return 0
+            removed = len(value & set(members))
+            value.difference_update(members)
+            return removed
+
+    # --- Sorted sets (subconjunto dos comandos Z* do Redis) ---
+
+    def _zset(self, key: str, create: bool = False) -> Optional[_SortedSet]:
+        value = self._alive(key)
+        if isinstance(value, _SortedSet):
+            return value
+        if not create:
+            return None
+        zset = _SortedSet()
+        _in_memory_store[key] = (zset, None)
+        return zset
+
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        with _in_memory_lock:
+            zset = self._zset(key, create=True)
+            return sum(1 for member, score in mapping.items() if zset.add(member, float(score)))
+
+    def zincrby(self, key: str, amount: float, member: str) -> float:
+        with _in_memory_lock:
+            zset = self._zset(key, create=True)
+            score = zset.scores.get(member, 0.0) + float(amount)
+            zset.add(member, score)
+            return score
+
+    def zrem(self, key: str, *members: str) -> int:
+        with _in_memory_lock:
+            zset = self._zset(key)
+            return sum(1 for m in members if zset and zset.remove(m))
+
+    def zscore(self, key: str, member: str) -> Optional[float]:
+        zset = self._zset(key)
+        return zset.scores.get(member) if zset else None
+
+    def zcard(self, key: str) -> int:
+        zset = self._zset(key)
+        return len(zset.scores) if zset else 0
+
+    def zrange(self, key: str, start: int, end: int, desc: bool = False, withscores: bool = False) -> List[Any]:
+        zset = self._zset(key)
+        if not zset:
+            return []
+        items = zset.ordered[::-1] if desc else zset.ordered
+        end = len(items) if end == -1 else end + 1
+        return _with_scores(items[start:end], withscores)
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> List[Any]:
+        return self.zrange(key, start, end, desc=True, withscores=withscores)
+
+    def zrangebyscore(self, key: str, min, max, start: Optional[int] = None, num: Optional[int] = None,
+                      withscores: bool = False) -> List[Any]:
+        zset = self._zset(key)
+        if not zset:
+            return []
+        return _with_scores(_slice(zset.by_score(_parse_bound(min), _parse_bound(max)), start, num), withscores)
+
+    def zrevrangebyscore(self, key: str, max, min, start: Optional[int] = None, num: Optional[int] = None,
+                         withscores: bool = False) -> List[Any]:
+        zset = self._zset(key)
+        if not zset:
+            return []
+        items = zset.by_score(_parse_bound(min), _parse_bound(max))[::-1]
+        return _with_scores(_slice(items, start, num), withscores)
+
+    def zremrangebyscore(self, key: str, min, max) -> int:
+        with _in_memory_lock:
+            zset = self._zset(key)
+            if not zset:
+                return 0
+            stale = zset.by_score(_parse_bound(min), _parse_bound(max))
+            for _, member in stale:
+                zset.remove(member)
+            return len(stale)
+
+    def zinterstore(self, dest: str, keys: Union[Dict[str, float], List[str]], aggregate: Optional[str] = None) -> int:
+        """Interseção com pesos (dict chave->peso) e agregação SUM/MIN/MAX."""
+        weights = keys if isinstance(keys, dict) else {k: 1.0 for k in keys}
+        combine = {"MIN": min, "MAX": max}.get((aggregate or "SUM").upper(), lambda a, b: a + b)
+        with _in_memory_lock:
+            sets = [(self._zset(k), w) for k, w in weights.items()]
+            result = _SortedSet()
+            if all(z for z, _ in sets):
+                smallest = min((z for z, _ in sets), key=lambda z: len(z.scores))
+                for member in smallest.scores:
+                    if all(member in z.scores for z, _ in sets):
+                        total = None
+                        for z, w in sets:
+                            value = z.scores[member] * w
+                            total = value if total is None else combine(total, value)
+                        result.add(member, total)
+            _in_memory_store[dest] = (result, None)
+            return len(result.scores)
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    """Acumula comandos e os executa em sequência (equivalente ao pipeline do redis-py)."""
+
+    def __init__(self, conn: InMemoryRedis) -> None:
+        self._conn = conn
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        getattr(self._conn, name)  # valida o comando
+
+        def _queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return _queue
+
+    def execute(self) -> List[Any]:
+        with _in_memory_lock:
+            results = [getattr(self._conn, n)(*a, **kw) for n, a, kw in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self) -> "InMemoryPipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._commands = []
+
 
 _in_memory_singleton = InMemoryRedis()
 
 
+class TimedConnection:
+    """Proxy que mede cada comando do Redis como etapa `cache` da telemetria."""
+
+    def __init__(self, conn) -> None:
+        self._conn = conn
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._conn, name)
+        if not callable(attr):
+            return attr
+
+        if name == "pipeline":
+            return lambda *args, **kwargs: _TimedPipeline(attr(*args, **kwargs))
+
+        def _timed_command(*args, **kwargs):
+            with timed("cache", op=name):
+                return attr(*args, **kwargs)
+        return _timed_command
+
+
+class _TimedPipeline(TimedConnection):
+    """Pipeline medido apenas no `execute()`, uma vez por lote de comandos."""
+
+    def __getattr__(self, name: str):
+        if name == "execute":
+            return super().__getattr__(name)
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> "_TimedPipeline":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._conn.__exit__(*exc)
+
+
+def _load_redis() -> bool:
+    """Importa o redis-py sob demanda; retorna False se não estiver instalado."""
+    global redis
+    if redis is None:
+        try:
+            import redis as _redis  # type: ignore
+        except Exception:
+            return False
+        redis = _redis
+    return True
+
+
+# Clientes por (host, porta, senha, pid): cada cliente mantém seu pool de
+# conexões, reaproveitado entre chamadas; o pid evita herdar sockets após fork
+_clients: Dict[Tuple[str, int, Optional[str], int], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client(host: str, port: int, password: Optional[str]):
+    key = (host, port, password, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = redis.Redis(
+                    host=host, port=port, password=password, decode_responses=True,
+                    health_check_interval=30,
+                )
+    return client
+
+
 def get_redis_connection():
     """Obtém uma conexão Redis ou fallback em memória se FAKE_CACHE=1 ou sem redis.
 
+    O cliente Redis é criado uma vez por processo (e endereço) e reutiliza
+    as conexões do seu pool: antes cada chamada abria um socket novo, o que
+    custava mais que o próprio comando.
+
     Retorna:
-        objeto compatível com Redis (get, set, incr, expire).
+        objeto compatível com Redis (strings, contadores, sorted sets e
+        pipeline), com cada
+        comando medido pela telemetria (`utils/telemetry.py`).
     """
-    if os.getenv("FAKE_CACHE") == "1" or redis is None:
-        return _in_memory_singleton
-    host = os.getenv("REDIS_HOST", "localhost")
-    port = int(os.getenv("REDIS_PORT", "6379"))
-    return redis.Redis(host=host, port=port, password=os.getenv("REDIS_PASSWORD"), decode_responses=True)
+    if os.getenv("FAKE_CACHE") == "1" or not _load_redis():
+        conn = _in_memory_singleton
+    else:
+        host = os.getenv("REDIS_HOST", "localhost")
+        port = int(os.getenv("REDIS_PORT", "6379"))
+        conn = _client(host, port, os.getenv("REDIS_PASSWORD"))
+    return TimedConnection(conn) if telemetry_enabled() else conn
 
 
 def get_or_set_cache(key: str, func: Callable[[], Any], ttl: int = 86400) -> Any:
@@ -0,0 +1,158 @@
+"""
+Chaves de cache versionadas e invalidação pelas dependências.
+
+As chaves `rawdata:`, `metrics:`, `insights:` e `recommendation:` não
+tinham versão nem dependências: mudar `calc_metrics_from_raw` ou receber
+dados novos deixava `metrics:` e os `insights:` do LLM válidos por 24h, e a
+única saída era limpar o Redis.  Agora:
+
+* **Versão por tipo**: a chave leva a versão do tipo e dos que ele deriva,
+  em cadeia (`metrics:v1.1:PETR4:1y`).  Ao mudar o cálculo das métricas,
+  incremente `VERSIONS["metrics"]`: as métricas, insights e recomendações
+  antigas deixam de ser lidas (e expiram sozinhas), sem afetar os dados
+  brutos.
+* **Grafo de dependências**: rawdata -> metrics -> insights ->
+  recommendation para o mesmo `(ticker, periodo)`; outras chaves derivadas
+  (ex.: o resultado de uma análise, `analysis:{id}`) se registram com
+  `add_dependent`.  `invalidate("rawdata", ticker, periodo)` apaga
+  exatamente os dependentes daquele ticker, transitivamente, e o tira dos
+  índices de ranking (`core/ranking_index.py`, versionados como as métricas).  Gravar dados
+  brutos com conteúdo diferente do anterior (`content_changed`) dispara
+  essa invalidação (`core.data_loader.store_rawdata_in_cache`).
+* **TTL por tipo**: com a invalidação dirigida, os derivados podem viver
+  mais (padrão 7 dias); os dados brutos seguem com 24h, o que define a
+  frequência de busca na brapi.
+
+Os PDFs são endereçados pelo conteúdo do ranking (`core/reports.py`):
+métricas novas geram outro PDF, então eles nunca ficam obsoletos.
+
+Variáveis de ambiente:
+
+    CACHE_TTL_RAWDATA=86400          validade dos dados brutos (s)
+    CACHE_TTL_METRICS=604800         validade das métricas (s)
+    CACHE_TTL_INSIGHTS=604800        validade dos insights do LLM (s)
+    CACHE_TTL_RECOMMENDATION=604800  validade das recomendações do LLM (s)
+"""
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cache import get_redis_connection
+
+# Versão do formato/cálculo de cada tipo: incremente ao mudar quem o produz
+VERSIONS: Dict[str, int] = {
+    "rawdata": 1,
+    "metrics": 1,
+    "insights": 1,
+    "recommendation": 1,
+}
+
+# Tipo -> tipo de que ele deriva (mesmo ticker e período)
+PARENTS: Dict[str, Optional[str]] = {
+    "rawdata": None,
+    "metrics": "rawdata",
+    "insights": "metrics",
+    "recommendation": "insights",
+}
+DEPENDENTS: Dict[str, List[str]] = {
+    kind: [child for child, parent in PARENTS.items() if parent == kind] for kind in PARENTS
+}
+
+DEFAULT_TTLS: Dict[str, int] = {
+    "rawdata": 86400,
+    "metrics": 7 * 86400,
+    "insights": 7 * 86400,
+    "recommendation": 7 * 86400,
+}
+
+
+def version(kind: str) -> str:
+    """Versão efetiva do tipo: a própria precedida pela dos tipos de origem."""
+    chain = []
+    current: Optional[str] = kind
+    while current:
+        chain.append(str(VERSIONS[current]))
+        current = PARENTS[current]
+    return "v" + ".".join(reversed(chain))
+
+
+def key(kind: str, ticker: str, periodo: str) -> str:
+    """Chave versionada, ex.: `key("metrics", "PETR4", "1y")` -> `metrics:v1.1:PETR4:1y`."""
+    return f"{kind}:{version(kind)}:{ticker}:{periodo}"
+
+
+def parse(cache_key: str) -> Optional[Tuple[str, str, str]]:
+    """`(tipo, ticker, periodo)` de uma chave versionada, ou None."""
+    parts = cache_key.split(":")
+    if len(parts) == 4 and parts[0] in VERSIONS:
+        return parts[0], parts[2], parts[3]
+    return None
+
+
+def ttl(kind: str) -> int:
+    return int(os.getenv(f"CACHE_TTL_{kind.upper()}", str(DEFAULT_TTLS[kind])))
+
+
+def ttl_for_key(cache_key: str, default: int = 86400) -> int:
+    """TTL do tipo da chave (para chaves fora do esquema, `default`)."""
+    parsed = parse(cache_key)
+    return ttl(parsed[0]) if parsed else default
+
+
+def _deps_key(cache_key: str) -> str:
+    return f"deps:{cache_key}"
+
+
+def add_dependent(parent_key: str, dependent_key: str, r: Any = None) -> None:
+    """Registra que `dependent_key` deriva de `parent_key` (apagada junto na invalidação)."""
+    r = r or get_redis_connection()
+    deps = _deps_key(parent_key)
+    r.sadd(deps, dependent_key)
+    parsed = parse(parent_key)
+    r.expire(deps, ttl(parsed[0]) if parsed else DEFAULT_TTLS["metrics"])
+
+
+def invalidate(kind: str, ticker: str, periodo: str, include_self: bool = False, r: Any = None) -> List[str]:
+    """Apaga os dependentes de `kind` para o ticker/período (transitivamente).
+
+    Args:
+        include_self (bool): também apaga a própria chave de `kind`.
+
+    Returns:
+        list: chaves apagadas.
+    """
+    r = r or get_redis_connection()
+    root = key(kind, ticker, periodo)
+    pending = [root]
+    removed: List[str] = [root] if include_self else []
+    seen = {root}
+    while pending:
+        current = pending.pop()
+        children = [key(child, ticker, periodo) for child in DEPENDENTS.get((parse(current) or ("",))[0], [])]
+        children += sorted(r.smembers(_deps_key(current)))
+        for child in children:
+            if child not in seen:
+                seen.add(child)
+                removed.append(child)
+                pending.append(child)
+    r.delete(*removed, *(_deps_key(k) for k in seen))
+    if key("metrics", ticker, periodo) in removed:
+        # Os índices de ranking são derivados das métricas: o ticker sai deles também
+        from core.ranking_index import remove_ticker
+        remove_ticker(ticker, periodo, r=r)
+    return removed
+
+
+def digest_key(kind: str, ticker: str, periodo: str) -> str:
+    """Chave com o hash do último conteúdo gravado (dura como os derivados)."""
+    return f"{key(kind, ticker, periodo)}:digest"
+
+
+def content_changed(kind: str, ticker: str, periodo: str, payload: str, r: Any = None) -> bool:
+    """Registra o hash de `payload` e diz se ele difere do conteúdo anterior."""
+    r = r or get_redis_connection()
+    new = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    dkey = digest_key(kind, ticker, periodo)
+    old = r.get(dkey)
+    r.set(dkey, new, ex=max(ttl(child) for child in DEPENDENTS[kind]) if DEPENDENTS[kind] else ttl(kind))
+    return old is not None and old != new
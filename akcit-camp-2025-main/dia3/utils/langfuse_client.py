@@ -1,4 +1,5 @@
 import os
+import threading
 from dotenv import load_dotenv
 from langfuse import get_client
 
@@ -7,9 +8,31 @@ load_dotenv()
 LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_HOST=os.getenv("LANGFUSE_HOST", "http://localhost:3000")
-  
-def init_langfuse():
-    """Inicializa o cliente Langfuse com as chaves do .env."""
+
+
+def check_auth(langfuse_client) -> bool:
+    """Verifica as credenciais do cliente (chamada de rede) e informa o resultado."""
+    try:
+        if langfuse_client.auth_check():
+            print("✅ Cliente Langfuse está autenticado e pronto!")
+            return True
+        print("⚠️  Falha na autenticação do Langfuse. Verifique suas credenciais e host.")
+        print("   A aplicação continuará funcionando; os traces podem não ser aceitos.")
+    except Exception as auth_error:
+        print(f"⚠️  Erro na autenticação do Langfuse: {auth_error}")
+        print("   A aplicação continuará funcionando; os traces podem não ser aceitos.")
+        print("   Acesse http://localhost:3000 para configurar o Langfuse e obter as chaves corretas.")
+    return False
+
+
+def init_langfuse(verify: bool = True):
+    """Inicializa o cliente Langfuse com as chaves do .env.
+
+    A criação do cliente não faz chamadas de rede.  A verificação de
+    credenciais (`auth_check`, que custa um round trip ou um timeout inteiro
+    se o host estiver fora do ar) roda em uma thread daemon para não atrasar
+    a inicialização.  Defina `LANGFUSE_AUTH_CHECK=0` para pulá-la.
+    """
     if not LANGFUSE_PUBLIC_KEY or not LANGFUSE_SECRET_KEY:
         print("⚠️  Aviso: LANGFUSE_PUBLIC_KEY e/ou LANGFUSE_SECRET_KEY não definidas.")
         print("   O tracing do Langfuse não estará disponível.")
@@ -18,23 +41,11 @@ def init_langfuse():
 
     try:
         langfuse_client = get_client()
-        
-        # Tentativa de autenticação - não bloqueia se falhar
-        try:
-            if langfuse_client.auth_check():
-                print("✅ Cliente Langfuse está autenticado e pronto!")
-                return langfuse_client
-            else:
-                print("⚠️  Falha na autenticação do Langfuse. Verifique suas credenciais e host.")
-                print("   A aplicação continuará funcionando sem tracing.")
-                return None
-        except Exception as auth_error:
-            print(f"⚠️  Erro na autenticação do Langfuse: {auth_error}")
-            print("   A aplicação continuará funcionando sem tracing.")
-            print("   Acesse http://localhost:3000 para configurar o Langfuse e obter as chaves corretas.")
-            return None
-            
     except Exception as e:
         print(f"⚠️  Erro ao inicializar cliente Langfuse: {e}")
         print("   A aplicação continuará funcionando sem tracing.")
         return None
+
+    if verify and os.getenv("LANGFUSE_AUTH_CHECK", "1") != "0":
+        threading.Thread(target=check_auth, args=(langfuse_client,), name="langfuse-auth", daemon=True).start()
+    return langfuse_client
@@ -23,26 +23,31 @@ except ImportError:
     # de ambiente devem estar configuradas por outros meios.
     load_dotenv = lambda *args, **kwargs: None  # type: ignore
 
-# A importação do SDK do Google Gen AI pode falhar se a biblioteca não
-# estiver instalada ou se não houver conectividade.  Certifique‑se de
-# incluir `google-generativeai` em requirements.txt.
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+# O SDK do Google Gen AI é pesado para importar; ele é carregado apenas na
+# primeira chamada (ver `_configure`).  A importação pode falhar se a
+# biblioteca não estiver instalada.  Certifique‑se de incluir
+# `google-generativeai` em requirements.txt.
+genai = None
+
+from utils.telemetry import timed
 
 load_dotenv()
 
 
 def _configure() -> None:
     """Configura a biblioteca genai com a chave do .env se ainda não foi feita."""
+    global genai
     # Modo fake para bootcamp/testes offline
     if os.getenv("FAKE_LLM") == "1":
         return
     if genai is None:
-        raise ImportError(
-            "O pacote google-generativeai não está instalado. Adicione-o ao requirements.txt."
-        )
+        try:
+            import google.generativeai as _genai
+        except ImportError:
+            raise ImportError(
+                "O pacote google-generativeai não está instalado. Adicione-o ao requirements.txt."
+            )
+        genai = _genai
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise EnvironmentError(
@@ -71,8 +76,9 @@ def generate_content(prompt: str, model_name: Optional[str] = None) -> str:
         return f"[FAKE_LLM] Resposta gerada a partir do prompt:\n{prompt[:400]}..."
     model_name = model_name or "gemini-2.5-flash"
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
+        with timed("llm_call", provider="gemini-sdk"):
+            model = genai.GenerativeModel(model_name)
+            response = model.generate_content(prompt)
         return response.text
     except Exception as exc:
         raise RuntimeError(f"Erro ao chamar o modelo Gemini: {exc}") from exc
@@ -97,8 +103,9 @@ def chat_with_history(messages: List[dict], model_name: Optional[str] = None) ->
         return "[FAKE_LLM] Chat simulado com histórico (mensagens truncadas)."
     model_name = model_name or "gemini-2.5-flash"
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(messages)
+        with timed("llm_call", provider="gemini-sdk"):
+            model = genai.GenerativeModel(model_name)
+            response = model.generate_content(messages)
         return response.text
     except Exception as exc:
         raise RuntimeError(f"Erro no chat com o modelo Gemini: {exc}") from exc
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+Roteador de LLMs com failover e hedging orientado a latência.
+
+Até aqui cada Crew usava um único provedor escolhido por `get_llm(provider)`:
+se o Gemini (ou a OpenAI) ficasse lento ou começasse a devolver erros, o
+`crew.kickoff()` inteiro falhava.  Este módulo mantém estatísticas por
+provedor (latência p50/p95 e taxa de erro numa janela deslizante) e as usa
+para decidir, a cada chamada:
+
+* **Roteamento**: envia a chamada ao provedor saudável mais rápido.  O
+  `llm_provider` escolhido pelo usuário continua sendo a *preferência*: ele
+  recebe um desconto na comparação de latência e só é preterido quando outro
+  provedor está claramente mais rápido ou quando está fora do ar.
+* **Hedging**: se o provedor principal não responder até o prazo (p95
+  observado ou `LLM_ROUTER_HEDGE_AFTER`), dispara a mesma chamada no próximo
+  provedor e usa a primeira resposta que chegar.
+* **Failover**: erros passam imediatamente para o próximo provedor; um
+  provedor com taxa de erro alta fica em *cooldown* por alguns segundos.
+
+Configuração via variáveis de ambiente:
+
+    LLM_ROUTER=0                    desativa o roteador (usa só o preferido)
+    LLM_ROUTER_HEDGE_AFTER=20       prazo (s) para hedge sem histórico
+    LLM_ROUTER_ERROR_THRESHOLD=0.5  taxa de erro que marca o provedor como doente
+    LLM_ROUTER_COOLDOWN=30          tempo (s) de quarentena após falhas seguidas
+    LLM_ROUTER_PREFERENCE=0.67      peso aplicado à latência do provedor preferido
+
+Observação: o hedge dobra o custo apenas das chamadas lentas; a chamada
+perdedora não é cancelada no provedor (threads não são interrompíveis), mas
+seu resultado é descartado e contabilizado nas estatísticas.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.telemetry import observe
+
+try:
+    from crewai import BaseLLM
+except Exception:  # pragma: no cover - fallback em ambientes sem crewai
+    BaseLLM = None  # type: ignore
+
+try:
+    from crewai.llms.base_llm import call_stop_override
+except Exception:  # pragma: no cover - versões antigas da crewai
+    call_stop_override = None  # type: ignore
+
+
+# Quantidade mínima de amostras para confiar no p95 como prazo de hedge
+_MIN_SAMPLES = 5
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por vizinho mais próximo (suficiente para janelas pequenas)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class ProviderStats:
+    """Janela deslizante de latências e resultados de um provedor."""
+
+    def __init__(self, window: int = 100) -> None:
+        self._latencies: deque = deque(maxlen=window)
+        self._outcomes: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(True)
+            self.consecutive_failures = 0
+
+    def record_failure(self, latency: float, cooldown: float, max_failures: int = 3) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= max_failures:
+                self.cooldown_until = time.time() + cooldown
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def p50(self) -> Optional[float]:
+        with self._lock:
+            return _percentile(list(self._latencies), 50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            return _percentile(list(self._latencies), 95)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1.0 - (sum(self._outcomes) / len(self._outcomes))
+
+    def is_healthy(self, error_threshold: float) -> bool:
+        if time.time() < self.cooldown_until:
+            return False
+        # Só julga pela taxa de erro quando há amostras suficientes
+        return len(self._outcomes) < _MIN_SAMPLES or self.error_rate < error_threshold
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "p50": self.p50,
+            "p95": self.p95,
+            "error_rate": round(self.error_rate, 3),
+            "samples": self.samples,
+            "cooldown": max(0.0, round(self.cooldown_until - time.time(), 1)),
+        }
+
+
+class LLMRouter:
+    """Escolhe provedores por latência/saúde e executa chamadas com hedge e failover."""
+
+    def __init__(
+        self,
+        hedge_after: Optional[float] = None,
+        error_threshold: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        preference_weight: Optional[float] = None,
+        max_workers: int = 16,
+    ) -> None:
+        self.hedge_after = hedge_after if hedge_after is not None else float(os.getenv("LLM_ROUTER_HEDGE_AFTER", "20"))
+        self.error_threshold = (
+            error_threshold if error_threshold is not None else float(os.getenv("LLM_ROUTER_ERROR_THRESHOLD", "0.5"))
+        )
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+        self.preference_weight = (
+            preference_weight if preference_weight is not None else float(os.getenv("LLM_ROUTER_PREFERENCE", "0.67"))
+        )
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    def stats(self, provider: str) -> ProviderStats:
+        with self._lock:
+            if provider not in self._stats:
+                self._stats[provider] = ProviderStats()
+            return self._stats[provider]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Retorna as estatísticas atuais de todos os provedores conhecidos."""
+        with self._lock:
+            names = list(self._stats)
+        return {name: self.stats(name).snapshot() for name in names}
+
+    def rank(self, providers: List[str], preferred: Optional[str] = None) -> List[str]:
+        """Ordena os provedores: saudáveis primeiro, depois por p50 ponderado.
+
+        Provedores sem histórico ficam atrás dos medidos, exceto o preferido,
+        que sempre é tentado primeiro enquanto não houver dados contra ele.
+        """
+        def key(item):
+            position, name = item
+            st = self.stats(name)
+            p50 = st.p50
+            if p50 is None:
+                latency = 0.0 if name == preferred else float("inf")
+            else:
+                latency = p50 * (self.preference_weight if name == preferred else 1.0)
+            return (not st.is_healthy(self.error_threshold), latency, name != preferred, position)
+
+        return [name for _, name in sorted(enumerate(providers), key=key)]
+
+    def deadline_for(self, provider: str) -> float:
+        """Prazo de hedge: p95 observado do provedor ou o valor configurado."""
+        st = self.stats(provider)
+        p95 = st.p95
+        if p95 is not None and st.samples >= _MIN_SAMPLES:
+            return min(p95, self.hedge_after)
+        return self.hedge_after
+
+    def _timed(self, provider: str, fn: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            elapsed = time.perf_counter() - start
+            self.stats(provider).record_failure(elapsed, self.cooldown)
+            observe("llm_call", elapsed, provider=provider, status="error")
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats(provider).record_success(elapsed)
+        observe("llm_call", elapsed, provider=provider, status="ok")
+        return result
+
+    def call(self, calls: Dict[str, Callable[[], Any]], preferred: Optional[str] = None) -> Any:
+        """Executa a chamada no melhor provedor, com hedge e failover.
+
+        Args:
+            calls: mapeamento provedor -> função sem argumentos que faz a chamada.
+            preferred: provedor preferido pelo usuário.
+
+        Returns:
+            Any: o resultado da primeira chamada bem-sucedida.
+
+        Raises:
+            Exception: o último erro, se todos os provedores falharem.
+        """
+        order = self.rank(list(calls), preferred)
+        pending: Dict[Any, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def submit(name: str) -> None:
+            ctx = contextvars.copy_context()
+            future = self._executor.submit(ctx.run, self._timed, name, calls[name])
+            pending[future] = name
+
+        submit(order.pop(0))
+        while pending:
+            # Só aplica prazo de hedge enquanto houver alternativa disponível
+            timeout = self.deadline_for(next(iter(pending.values()))) if order else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                name = order.pop(0)
+                logging.info(f"LLM router: hedge para '{name}' após {timeout:.1f}s sem resposta")
+                submit(name)
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as exc:
+                    last_error = exc
+                    logging.warning(f"LLM router: provedor '{name}' falhou: {exc}")
+            if not pending and order:
+                submit(order.pop(0))
+        raise last_error if last_error else RuntimeError("Nenhum provedor de LLM disponível")
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Retorna o roteador compartilhado do processo (estatísticas globais)."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter()
+        return _router
+
+
+def router_enabled() -> bool:
+    return os.getenv("LLM_ROUTER", "1") != "0"
+
+
+def _call_with_stop(llm: Any, stop: List[str], fn: Callable[[], Any]) -> Any:
+    """Propaga as stop words do roteador para o LLM interno."""
+    if call_stop_override is not None and stop:
+        with call_stop_override(llm, stop):
+            return fn()
+    return fn()
+
+
+if BaseLLM is not None:
+
+    class RoutedLLM(BaseLLM):  # type: ignore[misc, valid-type]
+        """LLM da CrewAI que delega cada chamada ao `LLMRouter`.
+
+        Recebe os LLMs concretos de cada provedor (na ordem de fallback) e o
+        provedor preferido.  É aceito em `Agent(llm=...)` como qualquer LLM.
+        """
+
+        llm_type: str = "router"
+        preferred: str = "gemini"
+        candidates: Dict[str, Any] = {}
+
+        def call(self, messages, *args, **kwargs):  # type: ignore[override]
+            stop = list(self.stop_sequences)
+            calls = {
+                name: (lambda llm=llm: _call_with_stop(llm, stop, lambda: llm.call(messages, *args, **kwargs)))
+                for name, llm in self.candidates.items()
+            }
+            return get_router().call(calls, preferred=self.preferred)
+
+        def supports_function_calling(self) -> bool:
+            return all(llm.supports_function_calling() for llm in self.candidates.values())
+
+        def supports_stop_words(self) -> bool:
+            return all(llm.supports_stop_words() for llm in self.candidates.values())
+
+        def get_context_window_size(self) -> int:
+            return min(llm.get_context_window_size() for llm in self.candidates.values())
+
+else:  # pragma: no cover - fallback em ambientes sem crewai
+    RoutedLLM = None  # type: ignore
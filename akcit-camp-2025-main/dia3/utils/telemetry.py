@@ -0,0 +1,276 @@
+"""
+Instrumentação de latência por etapa do pipeline (sem dependências externas).
+
+O Langfuse só enxerga o pipeline quando há um servidor configurado; sem ele
+a única pista de desempenho era o `print(...)` do orquestrador.  Este módulo
+mantém histogramas em memória para cada etapa (rate limit, brapi, cache,
+cálculo de métricas, chamadas de LLM, geração de PDF) e os exporta em dois
+formatos:
+
+* **Prometheus (texto)**: `render_prometheus()` ou o endpoint HTTP
+  `GET /metrics` iniciado por `start_metrics_server()`;
+* **JSON**: `snapshot()`, `GET /metrics.json` ou `dump_json(path)`.
+
+Uso típico::
+
+    from utils.telemetry import timed
+
+    with timed("brapi_fetch", ticker="PETR4"):
+        data = fetch_brapi_data("PETR4", "1y")
+
+Variáveis de ambiente:
+
+    METRICS_PORT=9464            porta do endpoint HTTP (desativado se ausente)
+    METRICS_JSON_PATH=metrics.json  arquivo atualizado ao fim de cada análise
+    TELEMETRY=0                  desativa a coleta
+"""
+import atexit
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, suppress
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+METRIC_NAME = "finance_stage_duration_seconds"
+
+# Limites (em segundos) cobrindo de acessos ao Redis a rodadas longas de LLM
+BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+# Ganchos chamados a cada observação (ex.: exportador de traces)
+_listeners: list = []
+
+
+def telemetry_enabled() -> bool:
+    return os.getenv("TELEMETRY", "1") != "0"
+
+
+class Histogram:
+    """Histograma cumulativo no estilo Prometheus para uma série de labels."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, limit in enumerate(self.buckets):
+            if value <= limit:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimativa do quantil pelo limite superior do bucket."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for limit, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return limit
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+_histograms: Dict[Tuple[Tuple[str, str], ...], Histogram] = {}
+_lock = threading.Lock()
+
+
+def observe(stage: str, seconds: float, **labels: Any) -> None:
+    """Registra a duração de uma etapa."""
+    if not telemetry_enabled():
+        return
+    key = tuple(sorted({"stage": stage, **{k: str(v) for k, v in labels.items()}}.items()))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(seconds)
+    for listener in list(_listeners):
+        try:
+            listener(stage, seconds, labels)
+        except Exception:
+            # Um exportador com problema nunca deve afetar o pipeline
+            pass
+
+
+def add_listener(listener: Callable[[str, float, Dict[str, Any]], None]) -> None:
+    """Registra uma função chamada a cada observação (stage, seconds, labels)."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+@contextmanager
+def timed(stage: str, **labels: Any) -> Iterator[None]:
+    """Mede o bloco e registra com `status=ok` ou `status=error`."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, status=status, **labels)
+
+
+def timed_fn(stage: str, **labels: Any) -> Callable:
+    """Decorador equivalente a `timed` para funções inteiras."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset() -> None:
+    """Zera todos os histogramas (útil em benchmarks)."""
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    """Retorna um resumo JSON-serializável de todas as séries."""
+    with _lock:
+        items = [(dict(key), hist.to_dict()) for key, hist in _histograms.items()]
+    return {
+        "generated_at": time.time(),
+        "series": [{"labels": labels, **stats} for labels, stats in sorted(items, key=lambda i: sorted(i[0].items()))],
+    }
+
+
+def _fmt_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    merged = {**labels, **(extra or {})}
+    body = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in merged.items())
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    """Renderiza os histogramas no formato de exposição de texto do Prometheus."""
+    lines = [
+        f"# HELP {METRIC_NAME} Duração de cada etapa do pipeline Finance Advisor.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _lock:
+        items = [(dict(key), hist) for key, hist in _histograms.items()]
+        for labels, hist in items:
+            cumulative = 0
+            for limit, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f"{METRIC_NAME}_bucket{_fmt_labels(labels, {'le': repr(limit)})} {cumulative}")
+            lines.append(f"{METRIC_NAME}_bucket{_fmt_labels(labels, {'le': '+Inf'})} {hist.count}")
+            lines.append(f"{METRIC_NAME}_sum{_fmt_labels(labels)} {hist.sum:.6f}")
+            lines.append(f"{METRIC_NAME}_count{_fmt_labels(labels)} {hist.count}")
+    return "\n".join(lines) + "\n"
+
+
+_dump_lock = threading.Lock()
+
+
+def dump_json(path: Optional[str] = None) -> Optional[str]:
+    """Grava o `snapshot()` em arquivo (padrão: METRICS_JSON_PATH)."""
+    path = path or os.getenv("METRICS_JSON_PATH")
+    if not path:
+        return None
+    # Arquivo temporário único por chamada e gravações serializadas: análises
+    # simultâneas não disputam o mesmo `.tmp` e o arquivo final está sempre completo
+    with _dump_lock:
+        fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                   dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(snapshot(), fh, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(tmp)
+            raise
+    return path
+
+
+def _make_handler():
+    """Cria a classe do handler HTTP (http.server só é importado se usado)."""
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - nome exigido pela stdlib
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(snapshot(), ensure_ascii=False).encode("utf-8")
+                content_type = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            # Silencia o log de acesso padrão do http.server
+            return
+
+    return _MetricsHandler
+
+
+_server = None
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[int]:
+    """Inicia (uma única vez) o endpoint HTTP de métricas em thread daemon.
+
+    Returns:
+        int ou None: a porta em uso, ou None se nenhuma porta foi configurada.
+    """
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server.server_address[1]
+        if port is None:
+            env_port = os.getenv("METRICS_PORT")
+            if not env_port:
+                return None
+            port = int(env_port)
+        from http.server import ThreadingHTTPServer
+
+        try:
+            _server = ThreadingHTTPServer((host, port), _make_handler())
+        except OSError:
+            # Porta ocupada (ex.: outro worker já expõe as métricas)
+            return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server.server_address[1]
+
+
+@atexit.register
+def _dump_on_exit() -> None:
+    try:
+        dump_json()
+    except Exception:
+        pass
@@ -0,0 +1,251 @@
+"""
+Exportação de traces em lote, em segundo plano, com sink local em arquivo.
+
+Antes, `analyze` e `analyze_multi_tickers` chamavam `langfuse_client.flush()`
+de forma síncrona no fim de cada requisição, somando a latência de
+exportação ao tempo de espera do usuário.  Aqui os spans são apenas
+enfileirados no caminho da requisição (`put_nowait`, nunca bloqueia; se a
+fila encher, o span é descartado e contado).  Uma thread daemon agrupa os
+spans em lotes e os entrega aos *sinks* configurados:
+
+* `JsonlFileSink`: grava cada span em uma linha JSON no formato de span
+  OTLP (traceId, spanId, parentSpanId, startTimeUnixNano, attributes...).
+  Útil quando não há servidor Langfuse disponível;
+* `LangfuseFlushSink`: o SDK do Langfuse (v3, baseado em OpenTelemetry) já
+  exporta em lote; este sink apenas aciona o `flush()` do cliente a partir
+  da thread de exportação, fora do caminho da requisição.
+
+Cada etapa medida por `utils.telemetry.timed` vira automaticamente um span
+filho do span corrente (ver `span()`), então um trace de `analyze` mostra
+rate limit, brapi, cache, métricas, LLM e PDF.
+
+Variáveis de ambiente:
+
+    TRACE_FILE=traces.jsonl     ativa o sink em arquivo
+    TRACE_BATCH_SIZE=256        spans por lote
+    TRACE_FLUSH_INTERVAL=2      intervalo máximo (s) entre exportações
+    TRACE_QUEUE_SIZE=10000      capacidade da fila em memória
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.telemetry import add_listener
+
+
+# (trace_id, span_id) do span corrente na thread/tarefa atual
+_current: contextvars.ContextVar = contextvars.ContextVar("finance_trace_ctx", default=None)
+
+
+def _attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _make_span(name: str, start_ns: int, end_ns: int, attributes: Dict[str, Any],
+               error: bool = False, span_id: Optional[str] = None, parent: Optional[tuple] = None) -> Dict[str, Any]:
+    parent = parent if parent is not None else _current.get()
+    trace_id, parent_id = parent if parent else (secrets.token_hex(16), "")
+    return {
+        "traceId": trace_id,
+        "spanId": span_id or secrets.token_hex(8),
+        "parentSpanId": parent_id,
+        "name": name,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attr(k, v) for k, v in attributes.items()],
+        "status": {"code": 2 if error else 1},
+    }
+
+
+class JsonlFileSink:
+    """Anexa spans (um JSON por linha) a um arquivo local."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, batch: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for item in batch:
+                fh.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        return None
+
+
+class LangfuseFlushSink:
+    """Aciona o flush do cliente Langfuse a partir da thread de exportação."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    def export(self, batch: List[Dict[str, Any]]) -> None:
+        # Os spans do Langfuse são produzidos pela instrumentação OTel do SDK
+        return None
+
+    def flush(self) -> None:
+        self.client.flush()
+
+
+class BatchExporter:
+    """Fila não bloqueante + thread daemon que exporta spans em lotes."""
+
+    def __init__(self, sinks: List[Any], batch_size: Optional[int] = None,
+                 interval: Optional[float] = None, max_queue: Optional[int] = None) -> None:
+        self.sinks = sinks
+        self.batch_size = batch_size or int(os.getenv("TRACE_BATCH_SIZE", "256"))
+        self.interval = interval or float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue or int(os.getenv("TRACE_QUEUE_SIZE", "10000")))
+        self._flush_requested = threading.Event()
+        self._stopped = threading.Event()
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def record(self, item: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def request_flush(self) -> None:
+        """Pede uma exportação imediata sem esperar por ela."""
+        self._flush_requested.set()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Dict[str, Any]], flush: bool) -> None:
+        for sink in self.sinks:
+            try:
+                if batch:
+                    sink.export(batch)
+                if flush:
+                    sink.flush()
+            except Exception as exc:
+                logging.warning(f"Falha ao exportar traces para {type(sink).__name__}: {exc}")
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            flush = self._flush_requested.wait(self.interval)
+            self._flush_requested.clear()
+            batch = self._drain()
+            while batch:
+                self._export(batch, flush=False)
+                batch = self._drain()
+            if flush:
+                self._export([], flush=True)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Exporta o que restou na fila (usado no encerramento do processo)."""
+        self._stopped.set()
+        self._flush_requested.set()
+        self._thread.join(timeout)
+        batch = self._drain()
+        while batch:
+            self._export(batch, flush=False)
+            batch = self._drain()
+        self._export([], flush=True)
+
+
+_exporter: Optional[BatchExporter] = None
+_lock = threading.Lock()
+
+
+def configure(langfuse_client: Any = None, trace_file: Optional[str] = None) -> Optional[BatchExporter]:
+    """Configura (uma vez por processo) os sinks de exportação.
+
+    Args:
+        langfuse_client: cliente Langfuse já inicializado, se houver.
+        trace_file: caminho JSONL; padrão `TRACE_FILE`.
+
+    Returns:
+        BatchExporter ou None se nenhum sink estiver configurado.
+    """
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            return _exporter
+        sinks: List[Any] = []
+        trace_file = trace_file or os.getenv("TRACE_FILE")
+        if trace_file:
+            sinks.append(JsonlFileSink(trace_file))
+        if langfuse_client is not None:
+            sinks.append(LangfuseFlushSink(langfuse_client))
+        if not sinks:
+            return None
+        _exporter = BatchExporter(sinks)
+        return _exporter
+
+
+def _record(item: Dict[str, Any]) -> None:
+    if _exporter is not None:
+        _exporter.record(item)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Abre um span; etapas medidas dentro dele viram spans filhos."""
+    if _exporter is None:
+        yield
+        return
+    parent = _current.get()
+    trace_id = parent[0] if parent else secrets.token_hex(16)
+    parent_id = parent[1] if parent else ""
+    span_id = secrets.token_hex(8)
+    token = _current.set((trace_id, span_id))
+    start = time.time_ns()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _current.reset(token)
+        _record(_make_span(name, start, time.time_ns(), attributes, error=error,
+                           span_id=span_id, parent=(trace_id, parent_id)))
+
+
+def flush_async() -> None:
+    """Solicita exportação imediata em segundo plano (nunca bloqueia)."""
+    if _exporter is not None:
+        _exporter.request_flush()
+
+
+def _on_observation(stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+    if _exporter is None:
+        return
+    end = time.time_ns()
+    attributes = {k: v for k, v in labels.items() if k != "status"}
+    _record(_make_span(stage, end - int(seconds * 1e9), end, attributes, error=labels.get("status") == "error"))
+
+
+add_listener(_on_observation)
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _exporter is not None:
+        _exporter.shutdown()
@@ -4,8 +4,10 @@
 #                              └── cancelar_pedido → END
 
 import os
+import random
 import re
 import ssl
+from functools import lru_cache
 from time import struct_time
 from dotenv import load_dotenv
 from langchain.prompts import PromptTemplate
@@ -54,6 +56,46 @@ prompt = PromptTemplate(
 qa_chain = prompt | llm | StrOutputParser()
 
 
+# Respostas prontas para as ações do carrinho
+# Confirmar um produto que o código já identificou não precisa do LLM: as
+# frases vêm destes modelos, com variações para não soar repetitivo. O LLM
+# fica só para mensagens livres que as regras não entendem.
+CARDAPIO = ["pizza", "hambúrguer", "pastel", "refrigerante", "suco"]
+EMOJIS = {"pizza": "🍕", "hambúrguer": "🍔", "pastel": "🥟", "refrigerante": "🥤", "suco": "🍹"}
+
+MODELOS_RESPOSTA = {
+    "escolher": [
+        "Ótima escolha, {nome}! {emoji} {produto} anotado no seu pedido. Obrigado!",
+        "Anotado, {nome}: {produto} {emoji}. Obrigado pela preferência!",
+        "Perfeito, {nome}! Já incluí {produto} {emoji} no seu pedido. Valeu!",
+    ],
+    "adicionar": [
+        "Pronto, {nome}! Mais {produto} {emoji} registrado no carrinho.",
+        "Registrado: {produto} {emoji}. Obrigado, {nome}!",
+        "Feito, {nome}! {produto} {emoji} adicionado ao carrinho.",
+    ],
+}
+
+
+@lru_cache(maxsize=None)
+def variacoes(acao: str, produto: str) -> tuple:
+    """Frases da ação já com o produto (geradas uma vez); falta só o `{nome}`."""
+    return tuple(
+        modelo.replace("{produto}", produto).replace("{emoji}", EMOJIS.get(produto, ""))
+        for modelo in MODELOS_RESPOSTA[acao]
+    )
+
+
+def resposta_pronta(acao: str, produto: str, nome: str) -> str:
+    return random.choice(variacoes(acao, produto)).replace("{nome}", nome)
+
+
+def encontrar_produtos(mensagem: str) -> list:
+    """Produtos do cardápio citados na mensagem, na ordem do cardápio."""
+    mensagem = mensagem.lower()
+    return [item for item in CARDAPIO if item in mensagem]
+
+
 def extrair_nome(texto: str) -> str:
     """Heurística simples: usa a frase inteira como nome, limpando espaços e pontuação leve."""
     if not texto:
@@ -113,7 +155,7 @@ def escolher_produtos_node(state: State) -> State:
     mensagem = (state.get("mensagem_usuario") or "").strip().lower()
 
     # Simula um cardápio (poderia vir de um banco de dados)
-    cardapio = ["pizza", "hambúrguer", "pastel", "refrigerante", "suco"]
+    cardapio = CARDAPIO
 
     # Se não há mensagem do cliente, mostra o cardápio
     if not mensagem:
@@ -138,17 +180,12 @@ def escolher_produtos_node(state: State) -> State:
         return state
 
     # Verifica se o produto faz parte do cardápio
-    produto_encontrado = None
-    for item in cardapio:
-        if item in mensagem:
-            produto_encontrado = item
-            break
+    produtos = encontrar_produtos(mensagem)
+    produto_encontrado = produtos[0] if produtos else None
 
     if produto_encontrado:
-        resposta = qa_chain.invoke({
-            "nome": nome,
-            "pergunta": f"O cliente deseja adicionar {produto_encontrado} ao pedido. Confirme e agradeça."
-        })
+        # Confirmação com resposta pronta: sem chamada ao LLM
+        resposta = resposta_pronta("escolher", produto_encontrado, nome)
         state["resposta"] = (
             f"{resposta}\nDeseja adicionar mais itens ao carrinho ou finalizar o pedido?"
         )
@@ -170,7 +207,8 @@ def escolher_produtos_node(state: State) -> State:
 def adicionar_itens_carrinho_node(state: State) -> State:
     """
     Adiciona os itens escolhidos pelo cliente ao carrinho.
-    Usa a LLM para responder confirmações e solicitações.
+    Produtos do cardápio são confirmados com respostas prontas;
+    a LLM só responde mensagens livres que as regras não entendem.
     """
     mensagem = (state.get("mensagem_usuario") or "").strip()
     nome = state.get("nome", "cliente")
@@ -197,10 +235,15 @@ def adicionar_itens_carrinho_node(state: State) -> State:
     carrinho = []
     carrinho.append(mensagem)
 
-    resposta = qa_chain.invoke({
-        "nome": nome,
-        "pergunta": f"O cliente deseja adicionar {mensagem}. Confirme o registro."
-    })
+    produtos = encontrar_produtos(mensagem)
+    if produtos:
+        resposta = "\n".join(resposta_pronta("adicionar", produto, nome) for produto in produtos)
+        state["produto_escolhido"] = produtos[-1]
+    else:
+        resposta = qa_chain.invoke({
+            "nome": nome,
+            "pergunta": mensagem
+        })
 
     state["resposta"] = resposta + "\nDeseja adicionar mais itens ou finalizar o pedido?"
     state["etapa"] = "adicionar_itens_carrinho"